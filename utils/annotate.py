@@ -5,27 +5,49 @@ This script allows the user to annotate a diagram.
 
 Usage:
     python annotate.py -a annotation.pkl -i images/ -o output.pkl
+    python annotate.py -a annotation.pkl -i images/ -o output.db
     
 Arguments:
     -a/--annotation: Path to a pandas DataFrame with the original annotation
                      extracted from the AI2D dataset.
     -i/--images: Path to the directory with the AI2D diagram images.
     -o/--output: Path to the output file, in which the resulting annotation is
-                 stored.
+                 stored. If the file is an SQLite database, e.g. output.db,
+                 the annotation is stored in the database.
     -r/--review: Optional argument that activates review mode. This mode opens
                  each Diagram object marked as complete for editing.
     -dr/--disable_rst: Optional argument for disabling RST annotation.
     -e/--edit: Optional argument that activates editing mode. This mode opens a
                single Diagram object for editing. Provide the diagram identifier
                using this flag.
+    -p/--prefetch: Number of upcoming diagrams rendered in the background while
+                   the current diagram is being annotated (default 2). Set to
+                   0 to disable prefetching.
+    -pm/--prefetch_memory: Maximum memory in megabytes used for the prefetched
+                           images (default 256).
+    -t/--thumbnails: Optional path to a directory of resized images created using
+                     make_thumbnails.py.
 
 Returns:
-    A pandas DataFrame containing a Diagram object for each diagram.
+    A pandas DataFrame containing a Diagram object for each diagram. Diagrams
+    are saved into an append-only journal (output.pkl.journal) as the annotation
+    proceeds. The journal is folded into the DataFrame once all diagrams have
+    been processed or by running compact_annotation.py.
+
+    If the output file is an SQLite database, each diagram is saved into the
+    database in a transaction of its own, which allows several annotators to
+    work on the same database at the same time. Each diagram is claimed and
+    read again from the database before it is opened, so that annotators do
+    not open the same diagram, and saving fails if another annotator has
+    saved the diagram in the meantime.
 """
 
 # Import packages
 from core.interface import *
 from core import Diagram
+from core.prefetch import Prefetcher
+from core.database import AnnotationDatabase, is_database
+from core.store import Journal
 from pathlib import Path
 import argparse
 import os
@@ -48,10 +70,23 @@ ap.add_argument("-dr", "--disable_rst", required=False, action='store_true',
                 help="Disables RST annotation.")
 ap.add_argument("-e", "--edit", required=False, type=int,
                 help="Activates editing mode for modifying a single diagram.")
+ap.add_argument("-p", "--prefetch", required=False, type=int, default=2,
+                help="Number of upcoming diagrams rendered in the background.")
+ap.add_argument("-pm", "--prefetch_memory", required=False, type=int,
+                default=256,
+                help="Maximum memory in megabytes used for prefetched images.")
+ap.add_argument("-t", "--thumbnails", required=False,
+                help="Path to a directory of resized images created using "
+                     "make_thumbnails.py.")
 
 # Parse arguments
 args = vars(ap.parse_args())
 
+# Use the resized images stored on disk if requested
+if args['thumbnails']:
+
+    image_cache.thumbnail_dir = args['thumbnails']
+
 # Assign arguments to variables
 ann_path = args['annotation']
 images_path = args['images']
@@ -108,16 +143,38 @@ if not args['edit']:
 
 # Check if the output file exists already, or whether to continue with previous
 # annotation.
-if os.path.isfile(output_path):
+output_exists = os.path.isfile(output_path)
+
+# Check if the output file is an SQLite database
+database = is_database(output_path)
+
+# Set up a database or a journal next to the output file for saving individual
+# diagrams. Both provide the same functions for saving diagrams.
+journal = AnnotationDatabase(output_path) if database else Journal(output_path)
+
+# Read the existing database, into which the diagrams have been saved
+if output_exists and database:
+
+    annotation_df = journal.read()
+
+    # Print status message
+    print("[INFO] Continuing existing annotation in {}.".format(output_path))
+
+# Or read the existing file
+elif output_exists:
 
     # Read existing file
     annotation_df = pd.read_pickle(output_path)
 
+    # Replay the diagrams saved into the journal after the file was written
+    replayed = journal.replay(annotation_df)
+
     # Print status message
-    print("[INFO] Continuing existing annotation in {}.".format(output_path))
+    print("[INFO] Continuing existing annotation in {} ({} diagrams restored "
+          "from journal).".format(output_path, replayed))
 
 # Otherwise, read the annotation from the input DataFrame
-if not os.path.isfile(output_path):
+if not output_exists:
 
     # Make a copy of the input DataFrame
     annotation_df = pd.read_pickle(ann_path).copy()
@@ -128,6 +185,22 @@ if not os.path.isfile(output_path):
 
         annotation_df['diagram'] = None
 
+    # Write the initial DataFrame to disk once: all subsequent changes are
+    # appended to the journal or saved into the database.
+    journal.compact(annotation_df)
+
+# Set up a prefetcher for rendering upcoming diagrams in the background
+prefetcher = Prefetcher(depth=args['prefetch'],
+                        max_bytes=args['prefetch_memory'] * 1024 ** 2)
+
+# Collect the rows that will be opened for annotation, which are prefetched in
+# this order. In editing mode, only a single diagram is opened.
+upcoming = [] if edit else [ix for ix, d in annotation_df['diagram'].items()
+                            if d is None or review or not d.complete]
+
+# Map the rows to their position in the list of upcoming rows
+positions = {ix: p for p, ix in enumerate(upcoming)}
+
 # Begin looping over the rows of the input DataFrame. Enumerate the result to
 # show annotation progress to the user.
 for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
@@ -152,6 +225,63 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
     # Assign diagram to variable
     diagram = row['diagram']
 
+    # Retrieve the diagram and its renders if they have been prefetched
+    prefetched = prefetcher.pop(ix)
+
+    if prefetched is not None:
+
+        diagram, renders = prefetched
+
+    else:
+
+        renders = None
+
+    # Start rendering the next diagrams in the background
+    if ix in positions:
+
+        position = positions[ix]
+
+        for n in upcoming[position + 1:position + 1 + args['prefetch']]:
+
+            prefetcher.schedule(n, annotation_df.at[n, 'diagram'],
+                                annotation_df.at[n, 'annotation'],
+                                os.path.join(images_path,
+                                             annotation_df.at[n, 'image_name']),
+                                review=review)
+
+    # Check whether the diagram will be opened for annotation
+    opening = ix in positions or (edit and
+                                  int(image_fname.split('.')[0]) == edit_id)
+
+    # Claim the diagram in the database before opening it and use the diagram
+    # stored in the database, which other annotators may have saved since the
+    # database was read
+    if database and opening:
+
+        claimed = journal.claim(image_fname)
+
+        # Skip diagrams that are being annotated by other annotators
+        if claimed is None:
+
+            # Print status message
+            print("[INFO] Skipping {}, which is being annotated by another "
+                  "annotator.".format(image_fname))
+
+            continue
+
+        diagram = claimed['diagram']
+
+        # Skip diagrams completed by other annotators in the meantime
+        if diagram is not None and diagram.complete and not (review or edit):
+
+            # Store the diagram into the column 'diagram'
+            annotation_df.at[ix, 'diagram'] = diagram
+
+            # Release the claim on the diagram
+            journal.release(image_fname)
+
+            continue
+
     # Check if a Diagram object has been initialized
     if diagram is not None:
 
@@ -197,9 +327,15 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
     # Set grouping as initial annotation task
     task = 'group'
 
+    # Set up a flag for tracking whether the diagram was opened for annotation
+    opened = False
+
     # If the diagram has not been marked as complete, annotate
     while not diagram.complete:
 
+        # Flag the diagram as opened
+        opened = True
+
         # If the user has requested next diagram, break from while loop
         if task == 'next':
 
@@ -211,8 +347,14 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
             # Store the diagram into the column 'diagram'
             annotation_df.at[ix, 'diagram'] = diagram
 
-            # Write the DataFrame to disk at each step
-            annotation_df.to_pickle(output_path)
+            # Append the diagram to the journal, printing an error message if
+            # another annotator has saved the diagram in the meantime
+            if not journal.append(image_fname, diagram):
+
+                print(messages['save_conflict'].format(image_fname))
+
+            # Stop rendering in the background
+            prefetcher.shutdown()
 
             # Print status message
             exit("[INFO] Saving current graph and quitting.")
@@ -221,7 +363,10 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
         while not diagram.group_complete and task == 'group':
 
             # Annotate layout, use variable 'task' to track switches
-            task = diagram.annotate_layout(review)
+            task = diagram.annotate_layout(review, prefetched=renders)
+
+            # Use the prefetched images only once
+            renders = None
 
             # If grouping is marked as complete, annotate connectivity
             if diagram.group_complete:
@@ -233,7 +378,10 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
         while not diagram.connectivity_complete and task == 'conn':
 
             # Annotate connectivity, use variable 'task' to track switches
-            task = diagram.annotate_connectivity(review)
+            task = diagram.annotate_connectivity(review, prefetched=renders)
+
+            # Use the prefetched images only once
+            renders = None
 
             # If connectivity is marked as complete, annotate RST
             if diagram.connectivity_complete:
@@ -245,7 +393,10 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
         while not diagram.rst_complete and task == 'rst':
 
             # Annotate RST, use variable 'task' to track switches
-            task = diagram.annotate_rst(review)
+            task = diagram.annotate_rst(review, prefetched=renders)
+
+            # Use the prefetched images only once
+            renders = None
 
             # If RST is marked as complete, break from the loop
             if diagram.rst_complete:
@@ -338,5 +489,22 @@ for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
     # Store the diagram into the column 'diagram'
     annotation_df.at[ix, 'diagram'] = diagram
 
-    # Write the DataFrame to disk at each step
-    annotation_df.to_pickle(output_path)
+    # Append the diagram to the journal only if it was opened, leaving out the
+    # diagrams completed earlier. Print an error message if another annotator
+    # has saved the diagram in the meantime.
+    if opened and not journal.append(image_fname, diagram):
+
+        print(messages['save_conflict'].format(image_fname))
+
+        # Wait for the annotator to read the message
+        input("Press Enter to continue.")
+
+# Stop rendering in the background
+prefetcher.shutdown()
+
+# Fold the journal into the output file once all diagrams have been processed.
+# Diagrams saved into a database by other annotators are not replaced.
+journal.compact(annotation_df)
+
+# Print status message
+print("[INFO] Saved the annotation to {}.".format(output_path))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script compares the Graphviz neato layout with the built-in stress layout
+on the graphs stored in AI2D-RST Diagram objects.
+
+Usage:
+    python benchmark_layout.py -a annotation.pkl
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame containing AI2D-RST Diagram
+                     objects.
+    -n/--number: Number of diagrams to process (default 50).
+
+Returns:
+    Prints the mean time needed to compute a layout for each annotation layer
+    and the mean normalized stress of the layouts (lower is better).
+"""
+
+# Import packages
+from core.layout import *
+from core.store import read_annotation
+from pathlib import Path
+import argparse
+import numpy as np
+import time
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation.")
+ap.add_argument("-n", "--number", required=False, type=int, default=50,
+                help="Number of diagrams to process.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+
+def normalized_stress(graph, pos):
+    """
+    Calculates the stress of a layout after scaling it optimally to the shortest
+    path distances in the graph, which allows comparing layouts drawn at
+    different scales.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        pos: A dictionary mapping nodes to (x, y) positions.
+
+    Returns:
+        The normalized stress of the layout as a float.
+    """
+    # Get the nodes and their shortest path distances
+    nodes = list(graph.nodes)
+    dist = shortest_path_matrix(graph, nodes)
+
+    # Consider only connected pairs of nodes
+    mask = np.isfinite(dist) & (dist > 0)
+
+    if not mask.any():
+
+        return 0.0
+
+    # Calculate the distances in the layout
+    xy = np.array([pos[n] for n in nodes], dtype=float)
+    current = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=-1))
+
+    # Get the distances and weights for connected pairs
+    d, c = dist[mask], current[mask]
+    w = d ** -2.0
+
+    # Find the scale that minimizes stress and apply
+    scale = (w * c * d).sum() / (w * c * c).sum()
+
+    return float((w * (scale * c - d) ** 2).sum() / (w * d * d).sum())
+
+
+# Read the DataFrame and keep the requested number of annotated diagrams
+df = read_annotation(ann_path)
+df = df.loc[df['diagram'].notnull()].head(args['number'])
+
+# Define the annotation layers and the layout engines
+layers = ['layout_graph', 'connectivity_graph', 'rst_graph']
+engines = ['neato', 'stress']
+
+# Print header
+print("{:>20} {:>8} {:>8} {:>12} {:>10}".format('layer', 'engine', 'graphs',
+                                                'time (ms)', 'stress'))
+
+# Loop over the annotation layers
+for layer in layers:
+
+    # Collect the graphs for this layer
+    graphs = [getattr(d, layer) for d in df['diagram']
+              if getattr(d, layer, None) is not None
+              and len(getattr(d, layer)) > 1]
+
+    # Loop over the layout engines
+    for engine in engines:
+
+        # Set up placeholder lists for results
+        times, stresses = [], []
+
+        # Loop over the graphs
+        for graph in graphs:
+
+            # Time the layout without using a cache
+            start = time.perf_counter()
+
+            pos = get_layout(graph, cache=None, engine=engine)
+
+            times.append(time.perf_counter() - start)
+
+            # Calculate the stress of the layout
+            stresses.append(normalized_stress(graph, pos))
+
+        # Skip layers without graphs
+        if len(graphs) == 0:
+
+            continue
+
+        # Print the results
+        print("{:>20} {:>8} {:>8} {:>12.1f} {:>10.3f}".format(
+            layer, engine, len(graphs), np.mean(times) * 1000,
+            np.mean(stresses)))
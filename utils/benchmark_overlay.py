@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script measures the time needed to draw the layout segmentation on the
+densest AI2D diagrams, comparing the polygon collections used by draw_layout()
+with the earlier approach of adding a separate patch and annotation for each
+element. The script also checks that both approaches produce identical images
+and measures the time needed by the OpenCV backend of draw_layout().
+
+Usage:
+    python benchmark_overlay.py -j ai2d/annotations/ -i ai2d/images/
+
+Arguments:
+    -j/--json: Path to the directory containing the AI2D annotation in JSON.
+    -i/--images: Path to the directory containing the AI2D diagram images.
+    -n/--number: Number of diagrams with the most elements to draw (default
+                 20).
+    -r/--repeat: Number of times each diagram is drawn (default 3).
+
+Returns:
+    Prints the mean time needed to draw a diagram using each approach and the
+    resulting speed-up.
+"""
+
+# Import packages
+from core.draw import *
+from pathlib import Path
+import argparse
+import glob
+import matplotlib.patches as patches
+import time
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-j", "--json", required=True,
+                help="Path to the directory with AI2D annotation.")
+ap.add_argument("-i", "--images", required=True,
+                help="Path to the directory with AI2D images.")
+ap.add_argument("-n", "--number", required=False, type=int, default=20,
+                help="Number of diagrams to draw.")
+ap.add_argument("-r", "--repeat", required=False, type=int, default=3,
+                help="Number of times each diagram is drawn.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+json_path = args['json']
+images_path = args['images']
+
+# Verify the input paths, print error and exit if not found
+if not Path(json_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -j!".format(json_path))
+
+if not Path(images_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -i!".format(images_path))
+
+
+def draw_layout_patches(path_to_image, annotation, height, **kwargs):
+    """
+    Draws the layout segmentation by adding a separate patch and annotation for
+    each element, as draw_layout() did before using polygon collections.
+
+    Parameters:
+        path_to_image: Path to the original AI2D diagram image.
+        annotation: A dictionary containing AI2D annotation.
+        height: Target height of the image.
+
+    Returns:
+        An image with the AI2D annotation overlaid.
+    """
+    # Load the diagram image and change from BGR to RGB colourspace
+    img, r = resize_img(path_to_image, height)
+    img = img[:, :, ::-1]
+
+    # Create a matplotlib Figure
+    fig = Figure()
+    ax = fig.add_subplot(1, 1, 1)
+    fig.tight_layout(pad=0)
+
+    # Add the image to the axis and hide grid and axes
+    ax.imshow(img)
+    ax.axis('off')
+
+    # Collect the outlines and labels of the layout elements
+    outlines, labels = collect_overlays(annotation, r, **kwargs)
+
+    # Add a patch for each outline, both as a patch and as an artist
+    for points, color in outlines:
+
+        outline = patches.Polygon(points, closed=True, fill=False, alpha=1,
+                                  color=color)
+
+        ax.add_patch(outline)
+        ax.add_artist(outline)
+
+    # Annotate each element
+    for label, cx, cy, color in labels:
+
+        ann = ax.annotate(label, (cx, cy), color='white', fontsize=10,
+                          ha='center', va='center')
+
+        ann.set_bbox(dict(alpha=1, color=color, pad=0))
+
+    # Render the figure into an image
+    return render_figure(fig, dpi=kwargs.get('dpi', None))
+
+
+def count_elements(annotation):
+    """
+    Counts the elements drawn for a diagram.
+    """
+    return sum(len(annotation.get(c, {})) for c in
+               ['blobs', 'arrows', 'text', 'arrowHeads'])
+
+
+# Load all annotation files
+annotations = {}
+
+for f in glob.glob(os.path.join(json_path, '*.json')):
+
+    annotation = load_annotation(f)
+
+    # Get the path to the diagram image, e.g. 1132.png for 1132.png.json
+    image_path = os.path.join(images_path, os.path.basename(f)[:-5])
+
+    annotations[image_path] = annotation
+
+# Sort the diagrams by the number of elements and keep the densest diagrams
+densest = sorted(annotations, key=lambda x: count_elements(annotations[x]),
+                 reverse=True)[:args['number']]
+
+# Print status
+print("[INFO] Drawing {} diagrams with {} to {} elements.".format(
+    len(densest), min(count_elements(annotations[x]) for x in densest),
+    max(count_elements(annotations[x]) for x in densest)))
+
+# Set up placeholders for the timings and mismatches
+times = {'patches': [], 'collections': [], 'opencv': []}
+mismatches = 0
+
+# Loop over the diagrams
+for image_path in densest:
+
+    # Load the image into the cache before timing
+    resize_img(image_path, 720)
+
+    # Time both approaches
+    for _ in range(args['repeat']):
+
+        start = time.perf_counter()
+
+        legacy = draw_layout_patches(image_path, annotations[image_path], 720,
+                                     arrowheads=True)
+
+        times['patches'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+
+        current = draw_layout(image_path, annotations[image_path], 720,
+                              arrowheads=True)
+
+        times['collections'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+
+        draw_layout(image_path, annotations[image_path], 720, arrowheads=True,
+                    backend='opencv')
+
+        times['opencv'].append(time.perf_counter() - start)
+
+    # Check that the images are identical
+    if legacy.shape != current.shape or (legacy != current).any():
+
+        mismatches += 1
+
+# Print the results
+if mismatches > 0:
+
+    print("[WARNING] The images differ for {} diagrams.".format(mismatches))
+
+print("[INFO] Patches: {:.1f} ms per diagram".format(
+    np.mean(times['patches']) * 1000))
+print("[INFO] Collections: {:.1f} ms per diagram ({:.1f}x)".format(
+    np.mean(times['collections']) * 1000,
+    np.mean(times['patches']) / np.mean(times['collections'])))
+print("[INFO] OpenCV: {:.1f} ms per diagram ({:.1f}x)".format(
+    np.mean(times['opencv']) * 1000,
+    np.mean(times['patches']) / np.mean(times['opencv'])))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script measures the time needed to extract the types of diagram elements
+from the original AI2D annotation, comparing the index of element types with
+the earlier approach of scanning every category for every element.
+
+Usage:
+    python benchmark_parse.py -j ai2d/annotations/
+
+Arguments:
+    -j/--json: Path to the directory containing the AI2D annotation in JSON.
+    -r/--repeat: Number of passes over the directory (default 5).
+
+Returns:
+    Prints the total time needed for a pass over the directory and the
+    resulting speed-up.
+"""
+
+# Import packages
+from core.parse import *
+from pathlib import Path
+import argparse
+import glob
+import os
+import time
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-j", "--json", required=True,
+                help="Path to the directory with AI2D annotation.")
+ap.add_argument("-r", "--repeat", required=False, type=int, default=5,
+                help="Number of passes over the directory.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+json_path = args['json']
+
+# Verify the input path, print error and exit if not found
+if not Path(json_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -j!".format(json_path))
+
+
+def extract_types_scan(elements, annotation):
+    """
+    Extracts the types of diagram elements by scanning each category for each
+    element, as extract_types() did before the index was introduced.
+
+    Parameters:
+        elements: A list of diagram elements.
+        annotation: A dictionary of AI2D annotation.
+
+    Returns:
+         A dictionary with element identifiers as keys and types as values.
+    """
+    # Create a dictionary for holding element types
+    element_types = {}
+
+    # Loop over the diagram elements
+    for e in elements:
+
+        try:
+            # Search for matches in the target categories
+            for t in element_categories:
+
+                # Get the identifiers for each element category
+                ids = [i for i in annotation[t].keys()]
+
+                # If the element is found among the identifiers, add the
+                # type to the dictionary
+                if e in ids:
+                    element_types[e] = t
+
+        # Skip if the category is not found
+        except KeyError:
+            continue
+
+    return element_types
+
+
+# Load all annotation files into memory before timing
+annotations = [load_annotation(f) for f in
+               sorted(glob.glob(os.path.join(json_path, '*.json')))]
+
+# Parse the diagram elements for each annotation
+elements = [parse_annotation(a, mode='layout')[0] for a in annotations]
+
+# Print status
+print("[INFO] Loaded {} annotation files.".format(len(annotations)))
+
+# Check that both approaches produce the same result
+mismatches = sum(extract_types(e, a) != extract_types_scan(e, a)
+                 for e, a in zip(elements, annotations))
+
+if mismatches > 0:
+
+    print("[WARNING] Element types differ for {} annotation files.".format(
+        mismatches))
+
+# Time the scan over categories
+start = time.perf_counter()
+
+for _ in range(args['repeat']):
+
+    for e, a in zip(elements, annotations):
+
+        extract_types_scan(e, a)
+
+scan_time = (time.perf_counter() - start) / args['repeat']
+
+# Time the index, building the index for each call
+start = time.perf_counter()
+
+for _ in range(args['repeat']):
+
+    for e, a in zip(elements, annotations):
+
+        extract_types(e, a)
+
+index_time = (time.perf_counter() - start) / args['repeat']
+
+# Build the index once per annotation, as Diagram objects do
+indices = [index_types(a) for a in annotations]
+
+# Time the lookups using a prebuilt index
+start = time.perf_counter()
+
+for _ in range(args['repeat']):
+
+    for e, a, i in zip(elements, annotations, indices):
+
+        extract_types(e, a, index=i)
+
+lookup_time = (time.perf_counter() - start) / args['repeat']
+
+# Print the results
+print("[INFO] Scan over categories: {:.1f} ms per pass".format(
+    scan_time * 1000))
+print("[INFO] Index built per call: {:.1f} ms per pass ({:.1f}x)".format(
+    index_time * 1000, scan_time / index_time))
+print("[INFO] Prebuilt index: {:.1f} ms per pass ({:.1f}x)".format(
+    lookup_time * 1000, scan_time / lookup_time))
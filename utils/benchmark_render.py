@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script measures the time needed to render the layout segmentation and the
+layout graph of AI2D-RST diagrams, comparing the in-memory rendering with the
+earlier approach of writing each frame into a temporary PNG file.
+
+Usage:
+    python benchmark_render.py -a annotation.pkl -i images/
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame containing AI2D-RST Diagram
+                     objects.
+    -i/--images: Path to the directory containing the AI2D diagram images.
+    -n/--number: Number of diagrams to render (default 20).
+    -r/--repeat: Number of times each diagram is rendered (default 3).
+
+Returns:
+    Prints the mean latency per frame for each rendering mode and resolution.
+"""
+
+# Import packages
+from core.draw import *
+from core.store import read_annotation
+from pathlib import Path
+import argparse
+import numpy as np
+import os
+import time
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation.")
+ap.add_argument("-i", "--images", required=True,
+                help="Path to the directory with AI2D images.")
+ap.add_argument("-n", "--number", required=False, type=int, default=20,
+                help="Number of diagrams to render.")
+ap.add_argument("-r", "--repeat", required=False, type=int, default=3,
+                help="Number of times each diagram is rendered.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+images_path = args['images']
+
+# Verify the input paths, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+if not Path(images_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -i!".format(images_path))
+
+# Read the DataFrame and keep the requested number of annotated diagrams
+df = read_annotation(ann_path)
+df = df.loc[df['diagram'].notnull()].head(args['number'])
+
+# Define the resolutions used by the annotation tools and the rendering modes
+resolutions = [80, 100, 200]
+modes = ['file', 'memory']
+
+# Print header
+print("{:>5} {:>8} {:>14} {:>14}".format('dpi', 'mode', 'layout (ms)',
+                                         'graph (ms)'))
+
+# Loop over the resolutions
+for dpi in resolutions:
+
+    # Set up a dictionary for holding the mean latencies for each mode
+    results = {}
+
+    # Loop over the rendering modes
+    for mode in modes:
+
+        # Set up placeholder lists for the latencies
+        layout_times, graph_times = [], []
+
+        # Loop over the diagrams
+        for ix, row in df.iterrows():
+
+            # Join with path to image directory with current filename
+            image_path = os.path.join(images_path, row['image_name'])
+
+            # Assign diagram to variable
+            diagram = row['diagram']
+
+            # Render each diagram the requested number of times
+            for _ in range(args['repeat']):
+
+                # Time the layout segmentation
+                start = time.perf_counter()
+
+                draw_layout(image_path, diagram.annotation, height=720,
+                            dpi=dpi, render=mode)
+
+                layout_times.append(time.perf_counter() - start)
+
+                # Time the layout graph
+                start = time.perf_counter()
+
+                draw_graph(diagram.layout_graph, dpi=dpi, mode='layout',
+                           render=mode)
+
+                graph_times.append(time.perf_counter() - start)
+
+        # Store the mean latencies in milliseconds
+        results[mode] = (np.mean(layout_times) * 1000,
+                         np.mean(graph_times) * 1000)
+
+        # Print the result
+        print("{:>5} {:>8} {:>14.1f} {:>14.1f}".format(dpi, mode,
+                                                       *results[mode]))
+
+    # Print the speed-up provided by rendering in memory
+    print("{:>5} {:>8} {:>13.2f}x {:>13.2f}x".format(
+        dpi, 'speed-up',
+        results['file'][0] / results['memory'][0],
+        results['file'][1] / results['memory'][1]))
@@ -8,7 +8,10 @@ Usage:
     python examine_annotation.py -a annotation.pkl
     
 Arguments:
-    -a/--annotation: Path to the pandas DataFrame containing the annotation.
+    -a/--annotation: Path to the pandas DataFrame containing the annotation, or
+                     a record file created using convert_annotation.py. The
+                     status of diagrams in a record file is read from its
+                     index without loading the diagrams.
     
 Returns:
     Prints the contents of the DataFrame on the standard output.
@@ -16,8 +19,8 @@ Returns:
 
 # Import packages
 from colorama import Fore, Style, init
+from core.store import AnnotationIndex
 import argparse
-import pandas as pd
 
 # Initialize colorama
 init()
@@ -34,113 +37,83 @@ args = vars(ap.parse_args())
 # Assign arguments to variables
 ann_path = args['annotation']
 
-# Read the DataFrame
-annotation_df = pd.read_pickle(ann_path)
+# Index the annotation by image name. For record files, the status of each
+# diagram is read from the index and the diagrams are not loaded into memory.
+annotation_index = AnnotationIndex(ann_path, maxsize=1)
 
-# Begin looping over the rows of the input DataFrame. Enumerate the result to
+# Begin looping over the diagrams in the annotation. Enumerate the result to
 # show annotation progress to the user.
-for i, (ix, row) in enumerate(annotation_df.iterrows(), start=1):
-
-    # Fetch the filename of current diagram image
-    image_fname = row['image_name']
+for i, image_fname in enumerate(annotation_index, start=1):
 
     # Print status message
-    print("[INFO] Now processing row {}/{} ({}) ...".format(i,
-                                                            len(annotation_df),
-                                                            image_fname))
-
-    # Assign the Diagram object to a variable
-    try:
-        diagram = row['diagram']
-
-        # Check if diagram is marked as complete
-        try:
-            complete = diagram.complete
-
-            if complete:
-
-                print(Fore.GREEN + "- Diagram annotation is marked as complete."
-                      + Style.RESET_ALL)
-
-            if not complete:
-
-                print(Fore.RED + "- Diagram annotation is marked as incomplete."
-                      + Style.RESET_ALL)
-
-                try:
-
-                    group_complete = diagram.group_complete
-
-                    if group_complete:
-
-                        print(Fore.GREEN + " * Grouping annotation is marked"
-                                           " as complete." + Style.RESET_ALL)
+    print("[INFO] Now processing row {}/{} ({}) ...".format(
+        i, len(annotation_index), image_fname))
 
-                    if not group_complete:
+    # Get the status of the Diagram object
+    status = annotation_index.status(image_fname)
 
-                        print(Fore.RED + " * Grouping annotation is marked"
-                                         " as incomplete." + Style.RESET_ALL)
+    # Check if the Diagram object exists
+    if status is None:
 
-                except AttributeError:
+        print("[ERROR] Diagram object does not exist.")
 
-                    pass
+        continue
 
-                try:
+    # Check if diagram is marked as complete
+    if status.get('complete'):
 
-                    conn_complete = diagram.connectivity_complete
+        print(Fore.GREEN + "- Diagram annotation is marked as complete."
+              + Style.RESET_ALL)
 
-                    if conn_complete:
+        continue
 
-                        print(Fore.GREEN + " * Connectivity annotation is "
-                                           "marked as complete." +
-                              Style.RESET_ALL)
+    print(Fore.RED + "- Diagram annotation is marked as incomplete."
+          + Style.RESET_ALL)
 
-                    if not conn_complete:
+    # Check the status of grouping annotation, if available
+    if 'group_complete' in status:
 
-                        print(Fore.RED + " * Connectivity annotation is "
-                                         "marked as incomplete." +
-                              Style.RESET_ALL)
+        if status['group_complete']:
 
-                except AttributeError:
+            print(Fore.GREEN + " * Grouping annotation is marked"
+                               " as complete." + Style.RESET_ALL)
 
-                    pass
+        if not status['group_complete']:
 
-                try:
+            print(Fore.RED + " * Grouping annotation is marked"
+                             " as incomplete." + Style.RESET_ALL)
 
-                    rst_complete = diagram.rst_complete
+    # Check the status of connectivity annotation, if available
+    if 'connectivity_complete' in status:
 
-                    if rst_complete:
+        if status['connectivity_complete']:
 
-                        print(Fore.GREEN + " * RST annotation is marked "
-                                           "as complete." +
-                              Style.RESET_ALL)
+            print(Fore.GREEN + " * Connectivity annotation is "
+                               "marked as complete." +
+                  Style.RESET_ALL)
 
-                    if not rst_complete:
+        if not status['connectivity_complete']:
 
-                        print(Fore.RED + " * RST annotation is marked as "
-                                         "incomplete." +
-                              Style.RESET_ALL)
+            print(Fore.RED + " * Connectivity annotation is "
+                             "marked as incomplete." +
+                  Style.RESET_ALL)
 
-                except AttributeError:
+    # Check the status of RST annotation, if available
+    if 'rst_complete' in status:
 
-                    pass
+        if status['rst_complete']:
 
-                try:
-                
-                    if len(diagram.comments) > 0:
-                
-                        for comment in diagram.comments:
-                
-                            print(Fore.YELLOW + " - {}".format(comment) + Style.RESET_ALL)
-                        
-                except AttributeError:
-                
-                    pass
+            print(Fore.GREEN + " * RST annotation is marked "
+                               "as complete." +
+                  Style.RESET_ALL)
 
-        except AttributeError:
+        if not status['rst_complete']:
 
-            print("[ERROR] Diagram object does not exist.")
+            print(Fore.RED + " * RST annotation is marked as "
+                             "incomplete." +
+                  Style.RESET_ALL)
 
-    except KeyError:
+    # Print any comments
+    for comment in status.get('comments', []):
 
-        print("[ERROR] Diagram does not exist.")
+        print(Fore.YELLOW + " - {}".format(comment) + Style.RESET_ALL)
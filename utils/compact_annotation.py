@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script folds the journal created by annotate.py back into the pandas
+DataFrame containing the annotation.
+
+Usage:
+    python compact_annotation.py -a annotation.pkl
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame containing the annotation. The
+                     journal is read from annotation.pkl.journal.
+
+Returns:
+    An updated pandas DataFrame containing a Diagram object for each diagram.
+    The journal is removed after compaction.
+"""
+
+# Import packages
+from core.store import Journal
+from pathlib import Path
+import argparse
+import pandas as pd
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Set up the journal
+journal = Journal(ann_path)
+
+# Check that the journal exists
+if not Path(journal.path).exists():
+
+    exit("[INFO] No journal found for {}, nothing to compact.".format(ann_path))
+
+# Read the DataFrame
+annotation_df = pd.read_pickle(ann_path)
+
+# Replay the journal on top of the DataFrame
+replayed = journal.replay(annotation_df)
+
+# Write the DataFrame to disk and remove the journal
+journal.compact(annotation_df)
+
+# Print status
+print("[DONE] Folded {} journal records into {}.".format(replayed, ann_path))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script converts a pandas DataFrame containing AI2D-RST annotation into a
+file of keyed records, from which individual diagrams can be loaded by their
+image name without reading the entire DataFrame.
+
+If the output file is an SQLite database, e.g. annotation.db, the annotation is
+imported into the database instead. If the input is a database, the diagrams
+can be exported back into a pandas DataFrame by giving an output file with the
+extension .pkl.
+
+Usage:
+    python convert_annotation.py -a annotation.pkl -o annotation.rec
+    python convert_annotation.py -a annotation.pkl -o annotation.db
+    python convert_annotation.py -a annotation.db -o annotation.pkl
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame or SQLite database containing
+                     the annotation. Any changes recorded in the journal are
+                     included.
+    -o/--output: Path to the output file.
+
+Returns:
+    A file containing one record for each row of the DataFrame, an SQLite
+    database or a pandas DataFrame.
+"""
+
+# Import packages
+from core.database import AnnotationDatabase, is_database
+from core.store import read_annotation, write_records
+from pathlib import Path
+import argparse
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame or SQLite database with "
+                     "AI2D-RST annotation.")
+ap.add_argument("-o", "--output", required=True,
+                help="Path to the output file.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+output_path = args['output']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Read the DataFrame and apply the journal
+annotation_df = read_annotation(ann_path)
+
+# Import the rows into the database, replacing any existing diagrams
+if is_database(output_path):
+
+    written = AnnotationDatabase(output_path).write(annotation_df)
+
+    # Print status
+    print("[DONE] Imported {} diagrams into {}.".format(written, output_path))
+
+# Export the rows into a pandas DataFrame
+elif output_path.endswith('.pkl'):
+
+    annotation_df.to_pickle(output_path)
+
+    # Print status
+    print("[DONE] Exported {} diagrams into {}.".format(len(annotation_df),
+                                                        output_path))
+
+# Otherwise write the rows into the record file
+else:
+
+    written = write_records(annotation_df, output_path)
+
+    # Print status
+    print("[DONE] Wrote {} records into {}.".format(written, output_path))
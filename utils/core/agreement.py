@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+from .interface import connection_categories, gestalt_principles, \
+    macro_groups, rst_relations
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+import pandas as pd
+
+
+def encode_labels(samples, categories):
+    """
+    Encodes the labels assigned by several annotators into an array of integer
+    codes. The rows of the samples are aligned using the index of the sample
+    DataFrames, which is preserved by the evaluate_agreement_*.py scripts.
+
+    Parameters:
+        samples: A list of pandas DataFrames, one for each annotator, with the
+                 labels in the column 'annotation'.
+        categories: A list of valid labels.
+
+    Returns:
+        A tuple of a NumPy array of shape (items, annotators) and the number of
+        labels not found among the categories. Missing and unknown labels are
+        coded as -1.
+    """
+    # Map the labels to integer codes
+    codes = {c: i for i, c in enumerate(categories)}
+
+    # Align the labels of each annotator by the index of the samples. Samples
+    # without any annotation yet have no column for the labels.
+    labels = pd.concat([s['annotation'] if 'annotation' in s.columns
+                        else pd.Series(None, index=s.index, dtype=object)
+                        for s in samples], axis=1, join='outer')
+
+    # Encode the labels, using -1 for missing and unknown labels
+    coded = labels.apply(lambda x: x.map(codes)).fillna(-1).to_numpy(
+        dtype=np.int64)
+
+    # Count the labels that are not among the categories
+    unknown = int((labels.notna().to_numpy() & (coded < 0)).sum())
+
+    return coded, unknown
+
+
+def one_hot(codes, n_categories):
+    """
+    Converts an array of integer codes into counts of each category per item.
+
+    Parameters:
+        codes: A NumPy array of shape (items, annotators) with missing labels
+               coded as -1.
+        n_categories: The number of categories.
+
+    Returns:
+        A NumPy array of shape (items, categories) with the number of
+        annotators who assigned each category to each item.
+    """
+    counts = np.zeros((codes.shape[0], n_categories), dtype=np.int64)
+
+    # Add one to the category chosen by each annotator, skipping missing labels
+    rows, cols = np.nonzero(codes >= 0)
+    np.add.at(counts, (rows, codes[rows, cols]), 1)
+
+    return counts
+
+
+def confusion_matrix(a, b, n_categories):
+    """
+    Calculates a confusion matrix between the labels of two annotators.
+
+    Parameters:
+        a: A NumPy array of integer codes assigned by the first annotator.
+        b: A NumPy array of integer codes assigned by the second annotator.
+        n_categories: The number of categories.
+
+    Returns:
+        A NumPy array of shape (categories, categories), in which the rows
+        correspond to the first and the columns to the second annotator. Items
+        with missing labels are left out.
+    """
+    # Keep the items labelled by both annotators
+    valid = (a >= 0) & (b >= 0)
+
+    return np.bincount(a[valid] * n_categories + b[valid],
+                       minlength=n_categories ** 2).reshape(n_categories,
+                                                            n_categories)
+
+
+def cohen_kappa(codes, n_categories, weights=None):
+    """
+    Calculates Cohen's kappa between two annotators.
+
+    Parameters:
+        codes: A NumPy array of shape (items, 2) with missing labels coded as
+               -1. Items with missing labels are left out.
+        n_categories: The number of categories.
+
+    Optional parameters:
+        weights: A NumPy array of shape (items,) or (batches, items) with the
+                 number of times each item is counted, e.g. in a bootstrap
+                 sample. By default, each item is counted once.
+
+    Returns:
+        Cohen's kappa as a float, or a NumPy array of shape (batches,) if the
+        weights are given for several batches.
+    """
+    # Keep the items labelled by both annotators
+    valid = (codes >= 0).all(axis=1)
+    codes = codes[valid]
+
+    weights = np.ones(len(codes)) if weights is None \
+        else np.asarray(weights, dtype=np.float64)[..., valid]
+
+    # Calculate the observed agreement
+    total = weights.sum(axis=-1)
+    observed = weights @ (codes[:, 0] == codes[:, 1]) / total
+
+    # Calculate the agreement expected by chance from the marginals of each
+    # annotator
+    first = weights @ one_hot(codes[:, :1], n_categories) / total[..., None]
+    second = weights @ one_hot(codes[:, 1:], n_categories) / total[..., None]
+    expected = (first * second).sum(axis=-1)
+
+    return (observed - expected) / (1 - expected)
+
+
+def fleiss_kappa(codes, n_categories, weights=None):
+    """
+    Calculates Fleiss' kappa between any number of annotators.
+
+    Parameters:
+        codes: A NumPy array of shape (items, annotators) with missing labels
+               coded as -1. Items with missing labels are left out.
+        n_categories: The number of categories.
+
+    Optional parameters:
+        weights: A NumPy array of shape (items,) or (batches, items) with the
+                 number of times each item is counted.
+
+    Returns:
+        Fleiss' kappa as a float, or a NumPy array of shape (batches,) if the
+        weights are given for several batches.
+    """
+    # Keep the items labelled by all annotators
+    valid = (codes >= 0).all(axis=1)
+    counts = one_hot(codes[valid], n_categories)
+    raters = codes.shape[1]
+
+    weights = np.ones(len(counts)) if weights is None \
+        else np.asarray(weights, dtype=np.float64)[..., valid]
+
+    # Calculate the agreement between pairs of annotators for each item
+    agreement = ((counts ** 2).sum(axis=1) - raters) / (raters * (raters - 1))
+
+    # Calculate the mean agreement and the proportion of each category
+    total = weights.sum(axis=-1)
+    observed = weights @ agreement / total
+    proportions = weights @ counts / (total[..., None] * raters)
+    expected = (proportions ** 2).sum(axis=-1)
+
+    return (observed - expected) / (1 - expected)
+
+
+def krippendorff_alpha(codes, n_categories, weights=None):
+    """
+    Calculates Krippendorff's alpha for nominal data between any number of
+    annotators. Unlike the kappa statistics, alpha allows missing labels.
+
+    Parameters:
+        codes: A NumPy array of shape (items, annotators) with missing labels
+               coded as -1.
+        n_categories: The number of categories.
+
+    Optional parameters:
+        weights: A NumPy array of shape (items,) or (batches, items) with the
+                 number of times each item is counted.
+
+    Returns:
+        Krippendorff's alpha as a float, or a NumPy array of shape (batches,)
+        if the weights are given for several batches.
+    """
+    counts = one_hot(codes, n_categories)
+    labels = counts.sum(axis=1)
+
+    # Keep the items with at least two labels, which can be paired
+    valid = labels >= 2
+    counts, labels = counts[valid], labels[valid]
+
+    weights = np.ones(len(counts)) if weights is None \
+        else np.asarray(weights, dtype=np.float64)[..., valid]
+
+    # Calculate the diagonal of the coincidence matrix for each item, that
+    # is, the number of pairs of matching labels within the item
+    matches = (counts * (counts - 1)).sum(axis=1) / (labels - 1)
+
+    # Sum up the coincidences: the rows of the coincidence matrix sum up to the
+    # number of labels assigned to each category
+    pairable = weights @ labels
+    observed = pairable - weights @ matches
+    marginals = weights @ counts
+    expected = (pairable ** 2 - (marginals ** 2).sum(axis=-1)) / (pairable - 1)
+
+    return 1 - observed / expected
+
+
+def bootstrap(metric, codes, n_categories, n_samples=1000, confidence=0.95,
+              batch_size=250, seed=None):
+    """
+    Estimates a confidence interval for an agreement metric by resampling the
+    items. The bootstrap samples are represented as the number of times each
+    item is drawn, which allows calculating the metric for a batch of samples
+    at once.
+
+    Parameters:
+        metric: A function for calculating the metric, e.g. cohen_kappa().
+        codes: A NumPy array of shape (items, annotators).
+        n_categories: The number of categories.
+
+    Optional parameters:
+        n_samples: The number of bootstrap samples.
+        confidence: The level of confidence of the interval.
+        batch_size: The number of bootstrap samples calculated at once.
+        seed: A seed for the random number generator.
+
+    Returns:
+        A tuple of the lower and upper bound of the confidence interval, which
+        are NaN if there are no items or the metric is undefined for all
+        samples.
+    """
+    # The interval is undefined if there are no items to resample
+    if len(codes) == 0:
+
+        return np.nan, np.nan
+
+    rng = np.random.default_rng(seed)
+
+    # Set up a placeholder for the values of the metric
+    values = []
+
+    # Draw the samples in batches to keep memory use bounded
+    for start in range(0, n_samples, batch_size):
+
+        size = min(batch_size, n_samples - start)
+
+        # Count how many times each item is drawn in each sample
+        weights = rng.multinomial(len(codes), np.full(len(codes),
+                                                      1 / len(codes)),
+                                  size=size)
+
+        values.append(metric(codes, n_categories, weights=weights))
+
+    # Leave out samples for which the metric is undefined, e.g. when all items
+    # drawn received the same label
+    values = np.concatenate(values)
+    values = values[np.isfinite(values)]
+
+    # The interval is undefined if the metric is undefined for all samples
+    if len(values) == 0:
+
+        return np.nan, np.nan
+
+    # Get the percentiles for the interval
+    tail = (1 - confidence) / 2 * 100
+
+    return tuple(float(x) for x in np.percentile(values, [tail, 100 - tail]))
+
+
+def measure_agreement(metric, codes, n_categories, n_samples=1000,
+                      confidence=0.95, seed=None):
+    """
+    Calculates an agreement metric together with its bootstrap confidence
+    interval.
+
+    Parameters:
+        metric: A function for calculating the metric, e.g. cohen_kappa().
+        codes: A NumPy array of shape (items, annotators).
+        n_categories: The number of categories.
+
+    Optional parameters:
+        n_samples: The number of bootstrap samples. If 0, the confidence
+                   interval is not estimated.
+        confidence: The level of confidence of the interval.
+        seed: A seed for the random number generator.
+
+    Returns:
+        A tuple of the value of the metric and the lower and upper bound of the
+        confidence interval, which are None if the interval is not estimated.
+        The value and the bounds are NaN if the metric is undefined, e.g. when
+        all items received the same label.
+    """
+    # Ignore warnings about dividing by zero, as undefined values are returned
+    # as NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        value = float(metric(codes, n_categories))
+
+        # Return the value only if no bootstrap samples are requested
+        if n_samples == 0:
+
+            return value, None, None
+
+        return (value,) + bootstrap(metric, codes, n_categories,
+                                    n_samples=n_samples, confidence=confidence,
+                                    seed=seed)
+
+
+def plot_confusion_matrix(matrix, categories, path, names=('A', 'B')):
+    """
+    Draws a confusion matrix as a heatmap and saves the image.
+
+    Parameters:
+        matrix: A NumPy array returned by confusion_matrix().
+        categories: A list of labels for the categories.
+        path: Path to the output image.
+
+    Optional parameters:
+        names: A tuple with the names of the annotators shown on the axes.
+
+    Returns:
+        None
+    """
+    # Leave out categories not used by either annotator
+    used = (matrix.sum(axis=0) + matrix.sum(axis=1)) > 0
+    matrix = matrix[used][:, used]
+    categories = [c for c, u in zip(categories, used) if u]
+
+    # Set up the figure, scaling the size with the number of categories
+    size = max(4, 0.5 * len(categories) + 2)
+    fig = Figure(figsize=(size, size), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+
+    ax.imshow(matrix, cmap='Blues')
+
+    # Add the labels and the counts
+    ax.set_xticks(range(len(categories)))
+    ax.set_yticks(range(len(categories)))
+    ax.set_xticklabels(categories, rotation=90)
+    ax.set_yticklabels(categories)
+    ax.set_xlabel(names[1])
+    ax.set_ylabel(names[0])
+
+    for (i, j), count in np.ndenumerate(matrix):
+
+        if count > 0:
+
+            ax.text(j, i, count, ha='center', va='center',
+                    color='white' if count > matrix.max() / 2 else 'black')
+
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+# Define the categories available for each agreement task
+agreement_categories = {
+    'rst': [v['name'] for v in rst_relations.values()],
+    'connectivity': [v['cat'] for v in connection_categories.values()],
+    'grouping': [v['cat'] for v in gestalt_principles.values()] + ['no-group'],
+    'macro': list(macro_groups.values())
+}
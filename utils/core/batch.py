@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import Future, ProcessPoolExecutor, wait, \
+    FIRST_COMPLETED
+import os
+import pandas as pd
+
+
+def map_diagrams(function, items, jobs=None, initializer=None, **kwargs):
+    """
+    Applies a function to multiple diagrams in parallel using a pool of
+    processes. The number of diagrams waiting in the pool is limited, which
+    keeps memory use bounded.
+
+    Parameters:
+        function: A function defined at the top level of a module, which takes
+                  a diagram as its first argument.
+        items: An iterable of (key, diagram) tuples, e.g. the index and the
+               diagram of each row in a pandas DataFrame. The iterable is
+               consumed as the processing progresses, which allows loading the
+               diagrams on demand.
+
+    Optional parameters:
+        jobs: The number of processes to use. By default, the number of CPUs
+              is used. If jobs is 1, the diagrams are processed in the current
+              process.
+        initializer: A function called at the start of each worker process.
+        Any other keyword arguments are passed to the function.
+
+    Returns:
+        Yields tuples of (key, task) in the order in which the diagrams are
+        processed. The result of each task is retrieved using task.result(),
+        which raises any error raised by the function.
+    """
+    # Use all CPUs by default
+    jobs = jobs or os.cpu_count() or 1
+
+    # Process the diagrams in the current process if requested
+    if jobs == 1:
+
+        for key, diagram in items:
+
+            task = Future()
+
+            # Store the result or the error in the task
+            try:
+                task.set_result(function(diagram, **kwargs))
+
+            except Exception as error:
+
+                task.set_exception(error)
+
+            yield key, task
+
+        return
+
+    # Set up an iterator over the diagrams
+    items = iter(items)
+
+    # Limit the number of diagrams waiting in the pool to keep memory use
+    # bounded.
+    limit = 4 * jobs
+
+    with ProcessPoolExecutor(max_workers=jobs,
+                             initializer=initializer) as executor:
+
+        # Set up a dictionary mapping pending tasks to keys
+        pending = {}
+
+        while True:
+
+            # Submit diagrams until the limit has been reached
+            for key, diagram in items:
+
+                pending[executor.submit(function, diagram, **kwargs)] = key
+
+                if len(pending) >= limit:
+
+                    break
+
+            # Stop when all tasks have been completed
+            if not pending:
+
+                break
+
+            # Wait for any of the tasks to finish
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for task in finished:
+
+                yield pending.pop(task), task
+
+
+def write_report(report, path, columns):
+    """
+    Writes a report into a file in the JSON format if the extension is .json
+    and as comma-separated values otherwise.
+
+    Parameters:
+        report: A list of dictionaries, one for each row of the report.
+        path: Path to the output file.
+        columns: A list of the keys written as columns.
+
+    Returns:
+        None
+    """
+    report_df = pd.DataFrame(report, columns=columns)
+
+    # Write the report in the JSON format or as comma-separated values
+    if path.endswith('.json'):
+
+        report_df.to_json(path, orient='records', indent=2)
+
+    else:
+
+        report_df.to_csv(path, index=False)
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+import cv2
+import hashlib
+import os
+import pickle
+import threading
+
+
+class LRUCache:
+    """
+    This class holds a mapping with a maximum size, which discards the least
+    recently used items when full.
+    """
+    def __init__(self, maxsize=128):
+        """
+        This function initializes the LRUCache class.
+
+        Parameters:
+            maxsize: The maximum number of items held in the cache.
+
+        Returns:
+            An empty LRUCache object.
+        """
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+
+    def __contains__(self, key):
+
+        return key in self.items
+
+    def __len__(self):
+
+        return len(self.items)
+
+    def get(self, key, default=None):
+        """
+        Retrieves an item from the cache and marks it as recently used.
+
+        Parameters:
+            key: The key of the item.
+            default: The value to return if the key is not found.
+
+        Returns:
+            The cached item or the default value.
+        """
+        # Return the default value if the key is not found
+        if key not in self.items:
+
+            return default
+
+        # Mark the item as most recently used
+        self.items.move_to_end(key)
+
+        return self.items[key]
+
+    def put(self, key, value):
+        """
+        Adds an item to the cache, discarding the least recently used items if
+        the cache is full.
+
+        Parameters:
+            key: The key of the item.
+            value: The item to be cached.
+
+        Returns:
+            None
+        """
+        # Add the item and mark it as most recently used
+        self.items[key] = value
+        self.items.move_to_end(key)
+
+        # Discard the least recently used items
+        while len(self.items) > self.maxsize:
+
+            self.items.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all items from the cache.
+        """
+        self.items.clear()
+
+
+class LayoutCache(LRUCache):
+    """
+    This class holds node positions computed for NetworkX graphs, keyed by the
+    structure of the graph.
+    """
+    def __init__(self, maxsize=32, persist=False):
+        """
+        This function initializes the LayoutCache class.
+
+        Parameters:
+            maxsize: The maximum number of layouts held in the cache.
+            persist: A Boolean defining whether the cached layouts are included
+                     when the cache is pickled, e.g. as part of a Diagram. By
+                     default, only the most recent layout for each slot is
+                     included, which is used to seed incremental layouts.
+
+        Returns:
+            An empty LayoutCache object.
+        """
+        super().__init__(maxsize=maxsize)
+
+        self.persist = persist
+
+        # Set up a dictionary for the most recent layout drawn for each slot,
+        # e.g. for each annotation layer. These are used to seed incremental
+        # layouts.
+        self.latest = {}
+
+    def __getstate__(self):
+
+        # Copy the attributes of the object
+        state = self.__dict__.copy()
+
+        # Drop the cached layouts if they should not be persisted, keeping the
+        # most recent layout for each slot
+        if not self.persist:
+
+            state['items'] = OrderedDict()
+
+        return state
+
+
+class ImageCache(LRUCache):
+    """
+    This class holds diagram images that have been decoded and resized, keyed
+    by the path to the image, the requested height and the modification time
+    of the image file. The cache is bounded by the number of bytes held.
+    """
+    def __init__(self, max_bytes=256 * 1024 ** 2, thumbnail_dir=None):
+        """
+        This function initializes the ImageCache class.
+
+        Parameters:
+            max_bytes: The maximum number of bytes held by cached images.
+            thumbnail_dir: Path to a directory for storing resized images on
+                           disk, which are then reused by other processes and
+                           sessions. If None, images are cached in memory only.
+
+        Returns:
+            An empty ImageCache object.
+        """
+        super().__init__(maxsize=None)
+
+        self.max_bytes = max_bytes
+        self.thumbnail_dir = thumbnail_dir
+
+        # Set up a counter for the bytes held
+        self.nbytes = 0
+
+        # Set up a lock, as images may be loaded in background threads
+        self.lock = threading.Lock()
+
+    def put(self, key, value):
+        """
+        Adds an image to the cache, discarding the least recently used images
+        if the cache is full.
+
+        Parameters:
+            key: A tuple of (path, height, modification time).
+            value: A tuple of (image, ratio) returned by load().
+
+        Returns:
+            None
+        """
+        # Remove any previous image for the key
+        if key in self.items:
+
+            self.nbytes -= self.items.pop(key)[0].nbytes
+
+        # Add the image and mark it as most recently used
+        self.items[key] = value
+        self.nbytes += value[0].nbytes
+
+        # Discard the least recently used images, but keep the latest image
+        while self.nbytes > self.max_bytes and len(self.items) > 1:
+
+            self.nbytes -= self.items.popitem(last=False)[1][0].nbytes
+
+    def clear(self):
+        """
+        Removes all images from the cache.
+        """
+        self.items.clear()
+
+        self.nbytes = 0
+
+    def thumbnail_path(self, key):
+        """
+        Returns the path to the resized image stored on disk for a key.
+        """
+        # Hash the absolute path, height and modification time
+        digest = hashlib.sha1(repr((os.path.abspath(key[0]), key[1], key[2]))
+                              .encode('utf-8')).hexdigest()
+
+        return os.path.join(self.thumbnail_dir, '{}_{}.pkl'.format(
+            os.path.basename(key[0]).split('.')[0], digest))
+
+    def load(self, path, height):
+        """
+        Loads an image resized to the requested height, using the cache or the
+        resized images on disk if possible.
+
+        Parameters:
+            path: Path to the image.
+            height: Requested height of the resized image.
+
+        Returns:
+            A copy of the resized image and the ratio used for resizing.
+        """
+        # Set up the key using the modification time, which ensures that
+        # images changed on disk are loaded again.
+        key = (path, height, os.path.getmtime(path))
+
+        # Check if the image has been cached
+        with self.lock:
+
+            value = self.get(key)
+
+        # Check if a resized image has been stored on disk
+        if value is None and self.thumbnail_dir is not None \
+                and os.path.isfile(self.thumbnail_path(key)):
+
+            with open(self.thumbnail_path(key), 'rb') as file:
+
+                r, encoded = pickle.load(file)
+
+            value = (cv2.imdecode(encoded, cv2.IMREAD_COLOR), r)
+
+        # Otherwise decode and resize the image
+        if value is None:
+
+            value = resize_image(path, height)
+
+            # Store the resized image on disk if requested. Write into a
+            # temporary file first to avoid partial files.
+            if self.thumbnail_dir is not None:
+
+                os.makedirs(self.thumbnail_dir, exist_ok=True)
+
+                temp_path = self.thumbnail_path(key) + '.{}.tmp'.format(
+                    os.getpid())
+
+                with open(temp_path, 'wb') as file:
+
+                    pickle.dump((value[1], cv2.imencode('.png', value[0])[1]),
+                                file, protocol=pickle.HIGHEST_PROTOCOL)
+
+                os.replace(temp_path, self.thumbnail_path(key))
+
+        # Add the image to the cache
+        with self.lock:
+
+            self.put(key, value)
+
+        # Return a copy, so that the cached image is not modified
+        return value[0].copy(), value[1]
+
+
+class RenderCache:
+    """
+    This class holds images of graphs drawn by draw_graph(), which are stored
+    on disk and keyed by a hash of the contents of the graph and the parameters
+    used for drawing. The images are reused by other processes and sessions.
+    """
+    def __init__(self, cache_dir=None):
+        """
+        This function initializes the RenderCache class.
+
+        Parameters:
+            cache_dir: Path to a directory for storing the images. If None, the
+                       cache is disabled.
+
+        Returns:
+            A RenderCache object.
+        """
+        self.cache_dir = cache_dir
+
+    @property
+    def enabled(self):
+        """
+        Returns True if a directory has been set for storing the images.
+        """
+        return self.cache_dir is not None
+
+    def key(self, graph, **params):
+        """
+        Calculates the key for an image of a graph.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            params: The parameters used for drawing the graph, e.g. the mode
+                    and resolution.
+
+        Returns:
+            A string containing a hexadecimal SHA-1 digest.
+        """
+        # Sort the parameters, including dictionaries such as highlights
+        params = sorted((k, sorted(v.items()) if isinstance(v, dict) else v)
+                        for k, v in params.items())
+
+        # Combine the hash of the graph with the parameters
+        content = repr((graph_content_hash(graph), params))
+
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        """
+        Returns the path to the image stored on disk for a key.
+        """
+        return os.path.join(self.cache_dir, '{}.png'.format(key))
+
+    def get(self, key):
+        """
+        Retrieves an image from the cache.
+
+        Parameters:
+            key: A key returned by key().
+
+        Returns:
+            The image in the BGR colour space or None if the image is not found.
+        """
+        # Return None if the cache is disabled or the image is not found
+        if not self.enabled or not os.path.isfile(self.path(key)):
+
+            return None
+
+        return cv2.imread(self.path(key), cv2.IMREAD_COLOR)
+
+    def put(self, key, img):
+        """
+        Stores an image in the cache.
+
+        Parameters:
+            key: A key returned by key().
+            img: The image in the BGR colour space.
+
+        Returns:
+            None
+        """
+        # Do nothing if the cache is disabled
+        if not self.enabled:
+
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # Write into a temporary file first to avoid partial files
+        temp_path = self.path(key) + '.{}.tmp'.format(os.getpid())
+
+        with open(temp_path, 'wb') as file:
+
+            file.write(cv2.imencode('.png', img)[1].tobytes())
+
+        os.replace(temp_path, self.path(key))
+
+
+def resize_image(path, height):
+    """
+    Reads an image from disk and resizes it to the requested height.
+
+    Parameters:
+        path: Path to the image.
+        height: Requested height of the resized image.
+
+    Returns:
+        The resized image and the ratio used for resizing.
+    """
+    # Load the image
+    img = cv2.imread(path)
+
+    # Calculate the ratio based on image height and the new width
+    (h, w) = img.shape[:2]
+
+    r = height / h
+    dim = (int(w * r), height)
+
+    # Resize the image
+    img = cv2.resize(img, dim, interpolation=cv2.INTER_AREA)
+
+    return img, r
+
+
+def graph_hash(graph):
+    """
+    Calculates a hash of the structure of a NetworkX graph, that is, its nodes
+    and edges. Node and edge attributes are ignored.
+
+    Parameters:
+        graph: A NetworkX Graph.
+
+    Returns:
+        A string containing a hexadecimal SHA-1 digest.
+    """
+    # Sort the nodes
+    nodes = sorted(str(n) for n in graph.nodes)
+
+    # Sort the edges, ignoring their direction in undirected graphs
+    if graph.is_directed():
+
+        edges = sorted((str(u), str(v)) for u, v in graph.edges())
+
+    else:
+
+        edges = sorted(tuple(sorted((str(u), str(v))))
+                       for u, v in graph.edges())
+
+    # Combine the graph type, nodes and edges into a single string
+    structure = repr((type(graph).__name__, nodes, edges))
+
+    return hashlib.sha1(structure.encode('utf-8')).hexdigest()
+
+
+def graph_content_hash(graph):
+    """
+    Calculates a hash of the contents of a NetworkX graph, that is, its nodes
+    and edges together with their attributes. Unlike graph_hash(), the order
+    of nodes and edges is preserved, as it affects how the graph is drawn,
+    e.g. the numbering of groups and relations.
+
+    Parameters:
+        graph: A NetworkX Graph.
+
+    Returns:
+        A string containing a hexadecimal SHA-1 digest.
+    """
+    # Get the nodes and their attributes
+    nodes = [(str(n), sorted((str(k), repr(v)) for k, v in d.items()))
+             for n, d in graph.nodes(data=True)]
+
+    # Get the edges and their attributes
+    edges = [(str(u), str(v), sorted((str(k), repr(v)) for k, v in d.items()))
+             for u, v, d in graph.edges(data=True)]
+
+    # Combine the graph type, nodes and edges into a single string
+    content = repr((type(graph).__name__, nodes, edges))
+
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
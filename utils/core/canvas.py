@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+
+from .draw import *
+
+from matplotlib.collections import LineCollection
+
+
+class GraphCanvas:
+    """
+    This class holds a matplotlib Figure for drawing a single annotation layer,
+    which keeps the artists for nodes, edges and their labels between redraws.
+    When the graph changes, only the affected artists are added, removed,
+    restyled or moved.
+    """
+    def __init__(self, mode='layout', dpi=100, **kwargs):
+        """
+        This function initializes the GraphCanvas class.
+
+        Parameters:
+            mode: String indicating the diagram structure to be drawn, valid
+                  options include 'layout' (default), 'connectivity' and 'rst'.
+            dpi: The resolution of the image as dots per inch.
+
+        Optional parameters:
+            cache: A LayoutCache object for reusing node positions. By default,
+                   a cache shared by the entire process is used. The most
+                   recent layout is always used as initial positions for the
+                   next layout. See draw_graph().
+            layout_engine: A string defining the layout engine, either 'neato'
+                           (default) or 'stress'. See get_layout().
+
+        Returns:
+            A GraphCanvas object.
+        """
+        self.mode = mode
+        self.dpi = dpi
+        self.cache = kwargs.get('cache', layout_cache)
+        self.layout_engine = kwargs.get('layout_engine', 'neato')
+
+        # Set up the matplotlib Figure and Axis, remove margins and axes
+        self.fig = Figure(dpi=dpi)
+        self.ax = self.fig.add_subplot(1, 1, 1)
+        self.fig.tight_layout(pad=0)
+        self.ax.axis('off')
+
+        # Set up dictionaries mapping nodes and edges to their style and artists
+        self.nodes = {}
+        self.labels = {}
+        self.edges = {}
+        self.edge_labels = {}
+
+        # Set up placeholders for current node positions and axis limits
+        self.pos = {}
+        self.limits = None
+
+    def draw(self, graph, highlight=None):
+        """
+        Updates the Figure to match a NetworkX Graph and renders the Figure.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            highlight: A dictionary of identifier/colour pairs to emphasise.
+
+        Returns:
+            An image showing the NetworkX Graph.
+        """
+        # Get the layout for the graph, using the previous layout as initial
+        # positions to keep the layout stable.
+        pos = get_layout(graph, cache=self.cache, incremental=True,
+                         slot=self.mode, engine=self.layout_engine)
+
+        pos = {n: tuple(p) for n, p in pos.items()}
+
+        # Find the nodes that have moved since the previous redraw
+        moved = {n for n, p in pos.items() if self.pos.get(n) != p}
+
+        self.pos = pos
+
+        # Fix the axis limits to fit the layout. Limits set manually also stop
+        # the artists added below from rescaling the axis.
+        limits = get_limits(pos)
+
+        self.ax.set_xlim(limits[0])
+        self.ax.set_ylim(limits[1])
+
+        # Update the nodes and their labels
+        self.update_nodes(graph, moved, highlight)
+
+        # Update the edges
+        self.update_edges(graph, moved)
+
+        # Update the edge labels, which are rotated along the edges. All labels
+        # are redrawn if the axis limits have changed.
+        if limits != self.limits:
+
+            moved = set(graph.nodes)
+
+        self.limits = limits
+
+        self.update_edge_labels(graph, moved)
+
+        # Render the figure into an image
+        return render_figure(self.fig)
+
+    def update_nodes(self, graph, moved, highlight=None):
+        """
+        Adds, removes, restyles and moves the artists for nodes and their
+        labels. Nodes with the same style are drawn using a single collection.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            moved: A set of nodes whose position has changed.
+            highlight: A dictionary of identifier/colour pairs to emphasise.
+
+        Returns:
+            None
+        """
+        # Set up a placeholder for highlighted nodes
+        highlight = highlight or {}
+
+        # Group the nodes that should be drawn by their style
+        groups = {}
+
+        for node, kind in nx.get_node_attributes(graph, 'kind').items():
+
+            style = node_style(kind, self.mode, highlight.get(node))
+
+            if style is not None:
+
+                groups.setdefault(style, []).append(node)
+
+        # Remove the collections for styles that are no longer used
+        for style in list(self.nodes):
+
+            if style not in groups:
+
+                self.nodes.pop(style)[1].remove()
+
+        # Add collections for new styles and update the existing collections
+        # if nodes have been added, removed or moved.
+        for style, nodelist in groups.items():
+
+            if style not in self.nodes:
+
+                color, shape, linewidths = style
+
+                artist = nx.draw_networkx_nodes(graph, self.pos,
+                                                nodelist=nodelist, alpha=1,
+                                                linewidths=linewidths,
+                                                node_color=color,
+                                                node_shape=shape, ax=self.ax)
+
+                self.nodes[style] = (nodelist, artist)
+
+                continue
+
+            previous, artist = self.nodes[style]
+
+            if nodelist != previous or moved.intersection(nodelist):
+
+                artist.set_offsets([self.pos[n] for n in nodelist])
+
+                self.nodes[style] = (nodelist, artist)
+
+        # Get the labels
+        labels = get_labels(graph, self.mode)
+
+        # Remove labels for deleted nodes
+        for node in list(self.labels):
+
+            if node not in labels:
+
+                self.labels.pop(node).remove()
+
+        # Add new labels, update the text and position of existing labels
+        for node, label in labels.items():
+
+            if node not in self.labels:
+
+                self.labels.update(nx.draw_networkx_labels(
+                    graph, self.pos, labels={node: label}, font_size=10,
+                    ax=self.ax))
+
+                continue
+
+            text = self.labels[node]
+
+            if text.get_text() != label:
+
+                text.set_text(label)
+
+            if node in moved:
+
+                text.set_position(self.pos[node])
+
+    def update_edges(self, graph, moved):
+        """
+        Adds, removes, restyles and moves the artists for edges. Edges without
+        arrows are drawn using a single collection for each style, whereas
+        edges with arrows are drawn as separate patches.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            moved: A set of nodes whose position has changed.
+
+        Returns:
+            None
+        """
+        # Get the edges, including keys for multigraphs to tell parallel edges
+        # apart.
+        edges = graph.edges(keys=True, data=True) if graph.is_multigraph() \
+            else graph.edges(data=True)
+
+        # Group the edges that should be drawn by their style
+        groups = {}
+
+        for *edge, d in edges:
+
+            style = edge_style(d.get('kind'), self.mode)
+
+            if style is not None:
+
+                groups.setdefault(style, []).append(tuple(edge))
+
+        # Loop over current and previous styles
+        for style in set(groups) | set(self.edges):
+
+            edgelist = groups.get(style, [])
+
+            # Draw the edges if the style has not been drawn before
+            if style not in self.edges:
+
+                self.edges[style] = (edgelist,
+                                     self.add_edges(graph, edgelist, style))
+
+                continue
+
+            previous, artists = self.edges[style]
+
+            # Update the collection if edges have been added, removed or moved
+            if isinstance(artists, LineCollection):
+
+                if not edgelist:
+
+                    self.edges.pop(style)[1].remove()
+
+                elif edgelist != previous or \
+                        moved.intersection(n for e in edgelist for n in e[:2]):
+
+                    artists.set_segments([(self.pos[e[0]], self.pos[e[1]])
+                                          for e in edgelist])
+
+                    self.edges[style] = (edgelist, artists)
+
+                continue
+
+            # Otherwise, remove the patches for deleted edges
+            for edge in set(artists).difference(edgelist):
+
+                artists.pop(edge).remove()
+
+            # Move the patches for existing edges
+            for edge, patch in artists.items():
+
+                if edge[0] in moved or edge[1] in moved:
+
+                    patch.set_positions(self.pos[edge[0]], self.pos[edge[1]])
+
+            # Add patches for new edges
+            new = [e for e in edgelist if e not in artists]
+
+            if new:
+
+                artists.update(self.add_edges(graph, new, style))
+
+            # Remove the style if no edges remain
+            if not artists:
+
+                self.edges.pop(style)
+
+                continue
+
+            self.edges[style] = (edgelist, artists)
+
+    def add_edges(self, graph, edgelist, style):
+        """
+        Draws a list of edges with a given style.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            edgelist: A list of edge tuples, which include keys for multigraphs.
+            style: A tuple of alpha, arrows and line style. See edge_style().
+
+        Returns:
+            A LineCollection or a dictionary mapping edges to FancyArrowPatches,
+            depending on whether the edges are drawn with arrows.
+        """
+        alpha, arrows, linestyle = style
+
+        artists = nx.draw_networkx_edges(graph, self.pos, edgelist,
+                                         alpha=alpha, arrows=arrows,
+                                         style=linestyle, ax=self.ax)
+
+        # Map edges to patches if the edges are drawn with arrows
+        if isinstance(artists, list):
+
+            return dict(zip(edgelist, artists))
+
+        return artists
+
+    def update_edge_labels(self, graph, moved):
+        """
+        Adds, removes and moves the labels for nuclei and satellites in RST
+        graphs.
+
+        Parameters:
+            graph: A NetworkX Graph.
+            moved: A set of nodes whose position has changed.
+
+        Returns:
+            None
+        """
+        # Edge labels are only drawn for RST graphs
+        if self.mode != 'rst':
+
+            return
+
+        # Get the label for each edge that is not a grouping edge
+        labels = {(u, v): rst_edge_labels.get(d.get('kind'), d.get('kind'))
+                  for u, v, d in graph.edges(data=True)
+                  if d.get('kind') != 'grouping'}
+
+        # Remove labels that have been deleted, changed or moved. The labels
+        # are rotated along the edge, so they are drawn again if moved.
+        for edge in list(self.edge_labels):
+
+            if labels.get(edge) != self.edge_labels[edge][0] or \
+                    edge[0] in moved or edge[1] in moved:
+
+                self.edge_labels.pop(edge)[1].remove()
+
+        # Draw new labels
+        new = {e: l for e, l in labels.items() if e not in self.edge_labels}
+
+        if new:
+
+            texts = nx.draw_networkx_edge_labels(graph, self.pos,
+                                                 edge_labels=new, ax=self.ax)
+
+            self.edge_labels.update({e: (new[e], t) for e, t in texts.items()})
+
+
+def node_style(kind, mode, highlight=None):
+    """
+    Gets the style used for drawing a node in a given annotation layer, which
+    follows draw_nodes().
+
+    Parameters:
+        kind: The kind of the node, e.g. 'text' or 'group'.
+        mode: A string indicating the drawing mode.
+        highlight: A colour used for highlighting the node, if any.
+
+    Returns:
+        A tuple of the colour, shape and line width of the node, or None if the
+        node is not drawn.
+    """
+    # Draw RST relations as squares in the RST layer only
+    if kind == 'relation':
+
+        if mode != 'rst':
+
+            return None
+
+        return highlight or 'peru', 's', 4
+
+    # Return None for unknown kinds of nodes
+    if kind not in node_colors:
+
+        return None
+
+    return node_colors[kind], 'o', None
+
+
+def edge_style(kind, mode):
+    """
+    Gets the style used for drawing an edge in a given annotation layer, which
+    follows draw_nodes().
+
+    Parameters:
+        kind: The kind of the edge, e.g. 'grouping' or 'nucleus'.
+        mode: A string indicating the drawing mode.
+
+    Returns:
+        A tuple of alpha, arrows and line style passed to
+        nx.draw_networkx_edges(), or None if the edge is not drawn.
+    """
+    # Draw all edges in the layout layer, using arrows for directed graphs
+    if mode == 'layout':
+
+        return 0.75, None, 'solid'
+
+    # Draw grouping edges as dotted lines in the other layers
+    if kind == 'grouping':
+
+        return 0.5, False, 'dotted'
+
+    # Draw the remaining edges with or without arrows
+    if kind in edge_arrows.get(mode, {}):
+
+        return 0.75, edge_arrows[mode][kind], 'solid'
+
+    return None
+
+
+def get_labels(graph, mode):
+    """
+    Gets the labels for nodes, which follow draw_graph(): groups and RST
+    relations are enumerated for clarity.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        mode: A string indicating the drawing mode.
+
+    Returns:
+        A dictionary mapping nodes to labels.
+    """
+    # Get the labels for nodes
+    labels = get_node_dict(graph, kind='node')
+
+    # Enumerate groups
+    labels.update({k: "G{}".format(i) for i, k in
+                   enumerate(get_node_dict(graph, kind='group'), start=1)})
+
+    # Enumerate RST relations
+    if mode == 'rst':
+
+        labels.update({k: "R{}".format(i) for i, k in
+                       enumerate(get_node_dict(graph, kind='relation'),
+                                 start=1)})
+
+    return labels
+
+
+def get_limits(pos, margin=0.05):
+    """
+    Calculates axis limits that fit node positions, adding the same margins as
+    matplotlib does when scaling the axis automatically.
+
+    Parameters:
+        pos: A dictionary mapping nodes to (x, y) positions.
+        margin: The margin as a fraction of the data interval.
+
+    Returns:
+        A tuple of the limits for x and y axes.
+    """
+    # Use unit limits for empty graphs
+    if not pos:
+
+        return (0.0, 1.0), (0.0, 1.0)
+
+    limits = []
+
+    # Calculate the limits for each axis
+    for values in zip(*pos.values()):
+
+        # Expand the interval if all nodes are placed on the same line
+        low, high = mpl.transforms.nonsingular(min(values), max(values))
+
+        delta = (high - low) * margin
+
+        limits.append((low - delta, high + delta))
+
+    return tuple(limits)
+
+
+# Define the colours of nodes, following draw_nodes()
+node_colors = {'text': 'dodgerblue', 'blobs': 'orangered',
+               'arrowHeads': 'darkorange', 'arrows': 'mediumseagreen',
+               'imageConsts': 'palegoldenrod', 'group': 'navajowhite'}
+
+# Define which kinds of edges are drawn with arrows in each layer
+edge_arrows = {'connectivity': {'undirectional': False, 'directional': True,
+                                'bidirectional': True},
+               'rst': {'satellite': False, 'nucleus': True}}
+
+# Define the labels for edges in the RST layer
+rst_edge_labels = {'satellite': 's', 'nucleus': 'n'}
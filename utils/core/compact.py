@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+
+import networkx as nx
+import numpy as np
+import sys
+
+
+class CompactGraph:
+    """
+    This class holds a frozen, compact copy of a NetworkX graph, which is used
+    for storing the graphs of annotation layers that have been marked as
+    complete.
+
+    The nodes are identified by their position in a tuple of node identifiers
+    and the neighbours of each node are stored in compressed sparse row (CSR)
+    form, that is, as the degree of each node followed by the positions of
+    its neighbours. The values of the most common attributes (see
+    interned_attributes) are stored as integer codes to a vocabulary of
+    interned strings. Any other attributes are kept in dictionaries for the
+    nodes and edges that have them. The integer arrays are packed into a single
+    NumPy array of the smallest integer type that holds their values.
+
+    The order of the nodes, the neighbours of each node and the keys of each
+    multigraph edge are preserved, so that the graph returned by to_networkx()
+    iterates over its nodes and edges in the same order as the original graph.
+    """
+    __slots__ = ('graph_class', 'frozen', 'graph', 'nodes', 'vocabulary',
+                 'n_edges', 'node_fields', 'edge_fields', 'node_data',
+                 'edge_data', 'keys', 'arrays')
+
+    def __init__(self):
+        """
+        This function initializes the CompactGraph class. Use from_networkx()
+        to create a CompactGraph for an existing graph.
+
+        Returns:
+            An empty CompactGraph object.
+        """
+        self.graph_class = nx.Graph
+        self.frozen = False
+        self.graph = None
+        self.nodes = ()
+        self.vocabulary = ()
+        self.n_edges = 0
+        self.node_fields = ()
+        self.edge_fields = ()
+        self.node_data = None
+        self.edge_data = None
+        self.keys = None
+        self.arrays = np.zeros(0, dtype=np.int8)
+
+    def __getstate__(self):
+
+        # Store the attributes as a tuple and the arrays as raw bytes, which
+        # take up less space than a pickled dictionary and NumPy array
+        return (self.graph_class, self.frozen, self.graph, self.nodes,
+                self.vocabulary, self.n_edges, self.node_fields,
+                self.edge_fields, self.node_data, self.edge_data, self.keys,
+                self.arrays.dtype.char, self.arrays.tobytes())
+
+    def __setstate__(self, state):
+
+        (self.graph_class, self.frozen, self.graph, nodes, vocabulary,
+         self.n_edges, self.node_fields, self.edge_fields, self.node_data,
+         self.edge_data, self.keys, dtype, arrays) = state
+
+        # Restore the arrays, which are read-only as the graph is frozen
+        self.arrays = np.frombuffer(arrays, dtype=dtype)
+
+        # Intern the node identifiers and the vocabulary, so that the strings
+        # are shared between all graphs in memory
+        self.nodes = intern_values(nodes)
+        self.vocabulary = intern_values(vocabulary)
+
+    def __len__(self):
+
+        return len(self.nodes)
+
+    def __repr__(self):
+
+        return "CompactGraph({}, {} nodes, {} edges)".format(
+            self.graph_class.__name__, self.number_of_nodes(),
+            self.number_of_edges())
+
+    def number_of_nodes(self):
+        """
+        Returns the number of nodes in the graph.
+        """
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        """
+        Returns the number of edges in the graph.
+        """
+        return self.n_edges
+
+    def is_directed(self):
+        """
+        Returns True if the graph is directed.
+        """
+        return issubclass(self.graph_class, nx.DiGraph)
+
+    def is_multigraph(self):
+        """
+        Returns True if the graph is a multigraph.
+        """
+        return issubclass(self.graph_class, (nx.MultiGraph, nx.MultiDiGraph))
+
+    def unpack(self):
+        """
+        Unpacks the integer arrays of the graph.
+
+        Returns:
+            A dictionary mapping the names of the arrays to lists: 'node_codes'
+            and 'edge_codes' hold a tuple of attribute codes for each node and
+            edge, while 'indptr' and 'indices' hold the adjacency of each node
+            in CSR form. The adjacency of node i is found in indices between
+            indptr[i] and indptr[i + 1]. Directed graphs also have the arrays
+            'pred_indptr' and 'pred_indices' for the predecessors of each node.
+        """
+        arrays = self.arrays.tolist()
+        n = len(self.nodes)
+
+        # Set up a placeholder for the unpacked arrays
+        unpacked = {}
+
+        # Get the codes of interned attributes
+        for name, size, width in [('node_codes', n, len(self.node_fields)),
+                                  ('edge_codes', self.n_edges,
+                                   len(self.edge_fields))]:
+
+            unpacked[name] = [tuple(arrays[i:i + width])
+                              for i in range(0, size * width, width)] \
+                if width > 0 else [()] * size
+
+            arrays = arrays[size * width:]
+
+        # Get the adjacency arrays by summing up the degrees of the nodes
+        for name in ['', 'pred_'] if self.is_directed() else ['']:
+
+            indptr = [0]
+
+            for degree in arrays[:n]:
+
+                indptr.append(indptr[-1] + degree)
+
+            unpacked[name + 'indptr'] = indptr
+            unpacked[name + 'indices'] = arrays[n:n + indptr[-1]]
+
+            arrays = arrays[n + indptr[-1]:]
+
+        return unpacked
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """
+        Creates a compact copy of a NetworkX graph.
+
+        Parameters:
+            graph: A NetworkX Graph, DiGraph, MultiGraph or MultiDiGraph.
+
+        Returns:
+            A CompactGraph object.
+        """
+        compact = cls()
+
+        compact.graph_class = type(graph)
+        compact.frozen = nx.is_frozen(graph)
+        compact.graph = dict(graph.graph) if graph.graph else None
+        compact.nodes = intern_values(graph)
+
+        # Map the nodes to their positions
+        positions = {n: i for i, n in enumerate(compact.nodes)}
+
+        # Set up a vocabulary for the values of interned attributes
+        vocabulary = {}
+
+        # Encode the attributes of the nodes
+        node_codes, compact.node_fields, compact.node_data = \
+            encode_attributes([d for n, d in graph.nodes(data=True)],
+                              vocabulary)
+
+        # Get the edges in the order in which NetworkX iterates over them,
+        # which is used for restoring the edges from the adjacency of the nodes
+        if graph.is_multigraph():
+
+            edges = list(graph.edges(keys=True, data=True))
+
+            compact.keys = tuple(k for u, v, k, d in edges)
+
+        else:
+
+            edges = list(graph.edges(data=True))
+
+        compact.n_edges = len(edges)
+
+        # Encode the attributes of the edges
+        edge_codes, compact.edge_fields, compact.edge_data = \
+            encode_attributes([e[-1] for e in edges], vocabulary)
+
+        compact.vocabulary = tuple(vocabulary)
+
+        # Collect the arrays to be packed, starting with the attribute codes
+        # and continuing with the adjacency of the nodes
+        arrays = [node_codes, edge_codes]
+        arrays.extend(build_adjacency(graph, graph.adj, positions))
+
+        # Directed graphs also need the predecessors of the nodes
+        if graph.is_directed():
+
+            arrays.extend(build_adjacency(graph, graph.pred, positions))
+
+        # Pack the arrays using the smallest integer type for their values
+        arrays = np.concatenate([np.asarray(a, dtype=np.int64).ravel()
+                                 for a in arrays])
+
+        compact.arrays = arrays.astype(np.result_type(
+            np.int8, np.min_scalar_type(arrays.max(initial=0))))
+
+        return compact
+
+    def to_networkx(self):
+        """
+        Converts the CompactGraph back into a NetworkX graph.
+
+        Returns:
+            A NetworkX graph of the original type, which is frozen if the
+            original graph was frozen.
+        """
+        graph = self.graph_class()
+
+        # Restore the graph attributes
+        if self.graph:
+
+            graph.graph.update(self.graph)
+
+        arrays = self.unpack()
+
+        # Add the nodes with their attributes
+        for i, node in enumerate(self.nodes):
+
+            graph.add_node(node, **decode_attributes(
+                i, arrays['node_codes'], self.node_fields, self.node_data,
+                self.vocabulary))
+
+        # Set up the attributes of each edge, which are shared by both ends of
+        # the edge. In multigraphs, the edges between a pair of nodes are held
+        # in a dictionary keyed by the keys of the edges.
+        links = {}
+
+        for e, (u, v) in enumerate(iter_edges(arrays['indptr'],
+                                              arrays['indices'],
+                                              self.is_directed())):
+
+            data = decode_attributes(e, arrays['edge_codes'],
+                                     self.edge_fields, self.edge_data,
+                                     self.vocabulary)
+
+            if self.keys is None:
+
+                links[u, v] = data
+
+            else:
+
+                links.setdefault((u, v), {})[self.keys[e]] = data
+
+            # Edges in undirected graphs can be reached from both ends
+            if not self.is_directed():
+
+                links[v, u] = links[u, v]
+
+        # Fill in the adjacency of each node. The adjacency dictionaries are
+        # filled directly, as adding the edges one by one would not preserve
+        # the order of neighbours at both ends of the edges.
+        for i, node in enumerate(self.nodes):
+
+            neighbours = graph._adj[node]
+
+            for j in arrays['indices'][arrays['indptr'][i]:
+                                       arrays['indptr'][i + 1]]:
+
+                neighbours[self.nodes[j]] = links[i, j]
+
+            # Fill in the predecessors of the nodes in directed graphs
+            if self.is_directed():
+
+                predecessors = graph._pred[node]
+
+                for j in arrays['pred_indices'][arrays['pred_indptr'][i]:
+                                                arrays['pred_indptr'][i + 1]]:
+
+                    predecessors[self.nodes[j]] = links[j, i]
+
+        # Freeze the graph if needed
+        if self.frozen:
+
+            nx.freeze(graph)
+
+        return graph
+
+
+class CompactLayer:
+    """
+    This class holds an annotation layer of a Diagram object, e.g. the layout
+    graph. The graph of a layer may be stored as a CompactGraph, which is
+    converted back into a NetworkX graph once the layer is accessed, so that
+    the layer is always available as a NetworkX graph. The NetworkX graph is
+    kept until the layer is compacted again using Diagram.compact() or the
+    Diagram object is pickled, so the memory saved only holds for layers that
+    have not been read.
+    """
+    def __set_name__(self, owner, name):
+
+        self.name = name
+
+    def __get__(self, instance, owner):
+
+        # Return the descriptor itself if accessed through the class
+        if instance is None:
+
+            return self
+
+        try:
+            graph = instance.__dict__[self.name]
+
+        except KeyError:
+
+            raise AttributeError(self.name)
+
+        # Convert a compact graph back into a NetworkX graph and keep the graph
+        # for subsequent access, so that any changes to its attributes persist
+        if isinstance(graph, CompactGraph):
+
+            graph = graph.to_networkx()
+
+            instance.__dict__[self.name] = graph
+
+        return graph
+
+    def __set__(self, instance, value):
+
+        instance.__dict__[self.name] = value
+
+
+def build_adjacency(graph, adjacency, positions):
+    """
+    Builds CSR arrays for the adjacency of a NetworkX graph.
+
+    Parameters:
+        graph: A NetworkX graph.
+        adjacency: An adjacency view of the graph, e.g. graph.adj or
+                   graph.pred.
+        positions: A dictionary mapping nodes to their positions.
+
+    Returns:
+        A tuple of lists with the degree of each node and the positions of the
+        neighbours of each node. In multigraphs, a neighbour is repeated for
+        each edge between the nodes.
+    """
+    degrees, indices = [], []
+
+    for node in graph:
+
+        start = len(indices)
+
+        for neighbour, data in adjacency[node].items():
+
+            indices.extend([positions[neighbour]] * (len(data) if
+                                                     graph.is_multigraph()
+                                                     else 1))
+
+        degrees.append(len(indices) - start)
+
+    return degrees, indices
+
+
+def iter_edges(indptr, indices, directed):
+    """
+    Iterates over the edges of a graph in CSR form in the order in which
+    NetworkX iterates over the edges of the graph.
+
+    Parameters:
+        indptr: A list with the positions in indices at which the neighbours
+                of each node start.
+        indices: A list with the positions of the neighbours of each node.
+        directed: A Boolean defining whether the graph is directed.
+
+    Returns:
+        Yields tuples with the positions of the nodes at both ends of each
+        edge.
+    """
+    # Set up a placeholder for the nodes whose edges have been visited
+    seen = set()
+
+    for i in range(len(indptr) - 1):
+
+        for j in indices[indptr[i]:indptr[i + 1]]:
+
+            # Each edge in an undirected graph is only visited from one end
+            if directed or j not in seen:
+
+                yield i, j
+
+        seen.add(i)
+
+
+def encode_attributes(attributes, vocabulary):
+    """
+    Encodes the attributes of nodes or edges into integer codes.
+
+    Parameters:
+        attributes: A list of dictionaries holding the attributes.
+        vocabulary: A dictionary mapping the string values of interned
+                    attributes to their codes, which is updated in place.
+
+    Returns:
+        A tuple of a list with the codes of each node or edge, which are -1 for
+        missing values, a tuple of the interned attributes that are present,
+        which defines the columns of the codes, and a dictionary mapping the
+        positions of nodes or edges to any other attributes, or None if there
+        are none.
+    """
+    codes = []
+
+    # Set up a placeholder for other attributes
+    other = {}
+
+    for i, data in enumerate(attributes):
+
+        item_codes = [-1] * len(interned_attributes)
+        rest = {}
+
+        for key, value in data.items():
+
+            # Only string values are interned, others are kept as they are
+            if key in interned_attributes and type(value) == str:
+
+                item_codes[interned_attributes.index(key)] = \
+                    vocabulary.setdefault(sys.intern(value), len(vocabulary))
+
+            else:
+
+                rest[key] = value
+
+        codes.append(item_codes)
+
+        if rest:
+
+            other[i] = rest
+
+    # Leave out the interned attributes that are not present
+    present = [c for c in range(len(interned_attributes))
+               if any(item_codes[c] >= 0 for item_codes in codes)]
+
+    codes = [[item_codes[c] for c in present] for item_codes in codes]
+
+    return codes, tuple(interned_attributes[c] for c in present), other or None
+
+
+def decode_attributes(i, codes, fields, other, vocabulary):
+    """
+    Decodes the attributes of a single node or edge.
+
+    Parameters:
+        i: The position of the node or edge.
+        codes: A list with the codes of interned attributes for each node or
+               edge.
+        fields: A tuple of the interned attributes present in the codes.
+        other: A dictionary mapping positions to any other attributes, or None.
+        vocabulary: A tuple of interned strings.
+
+    Returns:
+        A dictionary holding the attributes.
+    """
+    data = {key: vocabulary[code] for key, code in zip(fields, codes[i])
+            if code >= 0}
+
+    # Add any other attributes
+    if other and i in other:
+
+        data.update(other[i])
+
+    return data
+
+
+def compact_graph(graph):
+    """
+    Stores a graph in a compact form if it has been frozen.
+
+    Parameters:
+        graph: A NetworkX graph, a CompactGraph or None.
+
+    Returns:
+        A CompactGraph if the input is a frozen NetworkX graph, otherwise the
+        input as it is.
+    """
+    if isinstance(graph, nx.Graph) and nx.is_frozen(graph):
+
+        return CompactGraph.from_networkx(graph)
+
+    return graph
+
+
+def intern_values(values):
+    """
+    Interns any strings among the values.
+
+    Parameters:
+        values: An iterable of values.
+
+    Returns:
+        A tuple of the values, in which strings have been interned.
+    """
+    return tuple(sys.intern(v) if type(v) == str else v for v in values)
+
+
+# Define the attributes whose values are stored as codes to a vocabulary
+interned_attributes = ('kind', 'rel_name', 'macro_group')
@@ -0,0 +1,598 @@
+# -*- coding: utf-8 -*-
+
+from .tables import flatten_diagram, status_columns
+
+import contextlib
+import getpass
+import json
+import os
+import pandas as pd
+import pickle
+import socket
+import sqlite3
+import time
+
+
+def is_database(path):
+    """
+    Checks whether a path points to an SQLite database. Existing files are
+    identified by their header, whereas new files are identified by their
+    extension, e.g. annotation.db.
+
+    Parameters:
+        path: Path to the file.
+
+    Returns:
+        True or False.
+    """
+    # Identify existing files by the header of the database file
+    if os.path.isfile(path):
+
+        with open(path, 'rb') as file:
+
+            return file.read(len(database_signature)) == database_signature
+
+    # Otherwise check the extension
+    return os.path.splitext(path)[1].lower() in database_extensions
+
+
+class AnnotationDatabase:
+    """
+    This class holds AI2D-RST annotation in an SQLite database. The database
+    contains a row for each diagram, which stores the original AI2D annotation,
+    the status of annotation and the pickled Diagram object, and normalized
+    tables of the nodes and edges in each annotation layer, which allow querying
+    the annotation without unpickling the diagrams.
+
+    Each diagram is saved in a transaction of its own, which replaces the row
+    of the diagram together with its nodes and edges. The database uses a
+    write-ahead log, so that several annotators can save diagrams into the same
+    database while others are reading it.
+
+    To prevent annotators from overwriting each other's work, a diagram is
+    claimed before it is opened for annotation, which also reads its current
+    row. Other annotators skip diagrams with a valid claim. Each row also holds
+    a version, which is incremented whenever the diagram is saved, and saving a
+    diagram fails if another annotator has saved it since it was claimed.
+    """
+    def __init__(self, path, timeout=30, owner=None, claim_timeout=3600):
+        """
+        This function initializes the AnnotationDatabase class.
+
+        Parameters:
+            path: Path to the database file, which is created if it does not
+                  exist.
+
+        Optional parameters:
+            timeout: The number of seconds to wait for other annotators to
+                     finish their transactions before raising an error.
+            owner: A string identifying the annotator in claims. By default,
+                   the user and the host name are used, e.g. user@host.
+            claim_timeout: The number of seconds after which a claim expires,
+                           e.g. if the annotator was interrupted.
+
+        Returns:
+            An AnnotationDatabase object.
+        """
+        self.path = path
+        self.owner = owner or '{}@{}'.format(getpass.getuser(),
+                                             socket.gethostname())
+        self.claim_timeout = claim_timeout
+
+        # Set up a dictionary for the versions of the diagrams claimed
+        self.versions = {}
+
+        # Open the database, managing the transactions explicitly
+        self.connection = sqlite3.connect(path, timeout=timeout,
+                                          isolation_level=None)
+
+        # Use a write-ahead log, which allows reading the database while
+        # another annotator is writing to it
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+
+        # Create the tables and indices if needed
+        self.connection.executescript(database_schema)
+
+        # Add the columns for claims and versions to databases created by
+        # earlier versions
+        with self.transaction() as connection:
+
+            columns = [r[1] for r in connection.execute(
+                'PRAGMA table_info(diagrams)')]
+
+            for column, definition in claim_columns.items():
+
+                if column not in columns:
+
+                    connection.execute('ALTER TABLE diagrams ADD COLUMN {} {}'
+                                       .format(column, definition))
+
+    def __contains__(self, image_name):
+
+        return self.connection.execute(
+            'SELECT 1 FROM diagrams WHERE image_name = ?',
+            (image_name,)).fetchone() is not None
+
+    def __getitem__(self, image_name):
+        """
+        Retrieves the row for a diagram.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Returns:
+            A dictionary with the keys 'image_name', 'annotation' and 'diagram'.
+        """
+        row = self.connection.execute(
+            'SELECT image_name, annotation, diagram FROM diagrams '
+            'WHERE image_name = ?', (image_name,)).fetchone()
+
+        # Raise an error for unknown diagrams
+        if row is None:
+
+            raise KeyError(image_name)
+
+        return load_row(row)
+
+    def __iter__(self):
+
+        # Return the image names in the order in which they were added
+        return iter([r[0] for r in self.connection.execute(
+            'SELECT image_name FROM diagrams ORDER BY position')])
+
+    def __len__(self):
+
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM diagrams').fetchone()[0]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Runs the statements within the context in a single transaction, which
+        is committed if no errors occur and rolled back otherwise. The lock for
+        writing is acquired at the beginning of the transaction, waiting for
+        other annotators if needed.
+
+        Returns:
+            The connection to the database.
+        """
+        self.connection.execute('BEGIN IMMEDIATE')
+
+        try:
+            yield self.connection
+
+        # Roll back the changes on any error, including keyboard interrupts
+        except BaseException:
+
+            self.connection.execute('ROLLBACK')
+
+            raise
+
+        self.connection.execute('COMMIT')
+
+    def claim(self, image_name):
+        """
+        Claims a diagram for annotation and reads its current row in a single
+        transaction, so that other annotators do not open the diagram at the
+        same time.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Returns:
+            A dictionary with the keys 'image_name', 'annotation' and
+            'diagram', or None if the diagram has been claimed by another
+            annotator.
+        """
+        with self.transaction() as connection:
+
+            row = connection.execute(
+                'SELECT image_name, annotation, diagram, version, claimed_by, '
+                'claimed_at FROM diagrams WHERE image_name = ?',
+                (image_name,)).fetchone()
+
+            # Raise an error for unknown diagrams
+            if row is None:
+
+                raise KeyError(image_name)
+
+            *row, version, claimed_by, claimed_at = row
+
+            # Check for a valid claim by another annotator
+            if claimed_by not in [None, self.owner] and \
+                    time.time() - claimed_at < self.claim_timeout:
+
+                return None
+
+            connection.execute(
+                'UPDATE diagrams SET claimed_by = ?, claimed_at = ? '
+                'WHERE image_name = ?', (self.owner, time.time(), image_name))
+
+        # Record the version of the diagram read
+        self.versions[image_name] = version
+
+        return load_row(row)
+
+    def release(self, image_name):
+        """
+        Releases the claim on a diagram without saving it.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Returns:
+            None
+        """
+        with self.transaction() as connection:
+
+            connection.execute(
+                'UPDATE diagrams SET claimed_by = NULL, claimed_at = NULL '
+                'WHERE image_name = ? AND claimed_by = ?',
+                (image_name, self.owner))
+
+        self.versions.pop(image_name, None)
+
+    def append(self, image_name, diagram):
+        """
+        Saves a Diagram object into the database in a single transaction and
+        releases the claim on the diagram. This function replaces the append()
+        function of a Journal object.
+
+        The diagram is not saved if another annotator has saved it since it
+        was claimed using claim(), in which case the claim is released.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+            diagram: A Diagram object.
+
+        Returns:
+            True if the diagram was saved, False otherwise.
+        """
+        with self.transaction() as connection:
+
+            row = connection.execute(
+                'SELECT version FROM diagrams WHERE image_name = ?',
+                (image_name,)).fetchone()
+
+            # Check the version against the version claimed, releasing the
+            # claim if the diagram cannot be saved
+            if row is not None and row[0] != self.versions.get(image_name,
+                                                               row[0]):
+
+                connection.execute(
+                    'UPDATE diagrams SET claimed_by = NULL, claimed_at = NULL '
+                    'WHERE image_name = ? AND claimed_by = ?',
+                    (image_name, self.owner))
+
+                return False
+
+            self.write_row(image_name, diagram.annotation, diagram)
+
+            connection.execute(
+                'UPDATE diagrams SET claimed_by = NULL, claimed_at = NULL '
+                'WHERE image_name = ?', (image_name,))
+
+        # Record the version saved
+        self.versions[image_name] = row[0] + 1 if row is not None else 0
+
+        return True
+
+    def write(self, annotation_df, overwrite=True):
+        """
+        Writes the rows of a pandas DataFrame into the database in a single
+        transaction.
+
+        Parameters:
+            annotation_df: A pandas DataFrame with the columns 'image_name',
+                           'annotation' and optionally 'diagram', or an
+                           iterable of rows as dictionaries, which are written
+                           one at a time.
+
+        Optional parameters:
+            overwrite: A Boolean defining whether diagrams already stored in the
+                       database are replaced.
+
+        Returns:
+            The number of rows written.
+        """
+        # Get the rows of the DataFrame
+        rows = annotation_df.to_dict('records') \
+            if isinstance(annotation_df, pd.DataFrame) else annotation_df
+
+        # Set up a counter for rows written
+        written = 0
+
+        with self.transaction():
+
+            for row in rows:
+
+                written += self.write_row(row['image_name'], row['annotation'],
+                                          row.get('diagram'),
+                                          overwrite=overwrite)
+
+        return written
+
+    def write_row(self, image_name, annotation, diagram, overwrite=True):
+        """
+        Writes a row for a diagram together with its nodes and edges. This
+        function must be called within a transaction.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+            annotation: A dictionary containing the original AI2D annotation.
+            diagram: A Diagram object or None.
+
+        Optional parameters:
+            overwrite: A Boolean defining whether a diagram already stored in
+                       the database is replaced.
+
+        Returns:
+            The number of rows written, that is, 0 or 1.
+        """
+        # Collect the values for the row of the diagram
+        values = {'image_name': image_name,
+                  'annotation': json.dumps(annotation),
+                  'diagram': None, 'comments': None}
+
+        values.update(dict.fromkeys(status_columns))
+
+        # Add the status, comments and the pickled object if the diagram exists
+        if diagram is not None:
+
+            values.update({k: getattr(diagram, k) for k in status_columns})
+
+            values['comments'] = json.dumps(diagram.comments)
+            values['diagram'] = pickle.dumps(diagram,
+                                             protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Insert the row, or update the existing row if requested. New rows
+        # are placed after the existing rows to keep the order of diagrams.
+        cursor = self.connection.execute(
+            replace_diagram if overwrite else insert_diagram, values)
+
+        # Stop here if the existing row was kept
+        if cursor.rowcount == 0:
+
+            return 0
+
+        # Replace the nodes and edges of the diagram
+        for table in ['nodes', 'edges']:
+
+            self.connection.execute(
+                'DELETE FROM {} WHERE image_name = ?'.format(table),
+                (image_name,))
+
+        if diagram is not None:
+
+            nodes, edges = flatten_diagram(image_name, diagram)
+
+            self.connection.executemany(insert_node, nodes)
+            self.connection.executemany(insert_edge, edges)
+
+        return 1
+
+    def read(self, image_names=None):
+        """
+        Reads the diagrams into a pandas DataFrame.
+
+        Optional parameters:
+            image_names: A list of diagrams to read. By default, all diagrams
+                         are read.
+
+        Returns:
+            A pandas DataFrame with the columns 'image_name', 'annotation' and
+            'diagram'.
+        """
+        query = 'SELECT image_name, annotation, diagram FROM diagrams'
+
+        # Pass the requested image names to the query as a JSON array
+        if image_names is not None:
+
+            rows = self.connection.execute(
+                query + ' WHERE image_name IN (SELECT value FROM json_each(?)) '
+                        'ORDER BY position', (json.dumps(list(image_names)),))
+
+        else:
+
+            rows = self.connection.execute(query + ' ORDER BY position')
+
+        return pd.DataFrame([load_row(r) for r in rows],
+                            columns=['image_name', 'annotation', 'diagram'])
+
+    def iterrows(self):
+        """
+        Iterates over the diagrams, loading one row at a time.
+
+        Returns:
+            Yields dictionaries with the keys 'image_name', 'annotation' and
+            'diagram'.
+        """
+        for row in self.connection.execute(
+                'SELECT image_name, annotation, diagram FROM diagrams '
+                'ORDER BY position'):
+
+            yield load_row(row)
+
+    def statuses(self):
+        """
+        Retrieves the status of annotation for all diagrams without loading the
+        Diagram objects.
+
+        Returns:
+            A dictionary mapping image names to dictionaries with the keys
+            defined in status_columns and the key 'comments', or to None if the
+            diagram has no Diagram object.
+        """
+        # Set up a placeholder for the status
+        statuses = {}
+
+        for image_name, comments, *status in self.connection.execute(
+                'SELECT image_name, comments, {} FROM diagrams ORDER BY '
+                'position'.format(', '.join(status_columns))):
+
+            # Diagrams without a Diagram object have no comments
+            if comments is None:
+
+                statuses[image_name] = None
+
+                continue
+
+            statuses[image_name] = dict(zip(status_columns,
+                                            [bool(s) for s in status]))
+            statuses[image_name]['comments'] = json.loads(comments)
+
+        return statuses
+
+    def relations(self, rel_name=None):
+        """
+        Retrieves the RST relations from the table of nodes.
+
+        Optional parameters:
+            rel_name: The name of the relation, e.g. 'elaboration'. By default,
+                      all relations are retrieved.
+
+        Returns:
+            A pandas DataFrame with the columns 'image_name', 'node_id' and
+            'rel_name'.
+        """
+        query = "SELECT image_name, node_id, rel_name FROM nodes " \
+                "WHERE rel_name IS NOT NULL AND layer = 'rst'"
+
+        # Limit the query to the requested relation
+        if rel_name is not None:
+
+            return pd.read_sql_query(query + ' AND rel_name = ?',
+                                     self.connection, params=(rel_name,))
+
+        return pd.read_sql_query(query, self.connection)
+
+    def compact(self, annotation_df):
+        """
+        Adds any rows of a pandas DataFrame missing from the database and folds
+        the write-ahead log into the database file. This function replaces the
+        compact() function of a Journal object. Diagrams already stored in the
+        database are not replaced, as they may have been saved by another
+        annotator.
+
+        Parameters:
+            annotation_df: A pandas DataFrame containing the annotation.
+
+        Returns:
+            None
+        """
+        # Add the missing rows
+        self.write(annotation_df, overwrite=False)
+
+        # Fold the write-ahead log into the database
+        self.connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        """
+        Closes the connection to the database.
+        """
+        self.connection.close()
+
+
+def load_row(row):
+    """
+    Converts a row fetched from the table of diagrams into a dictionary.
+
+    Parameters:
+        row: A tuple with the image name, the annotation and the pickled
+             Diagram object.
+
+    Returns:
+        A dictionary with the keys 'image_name', 'annotation' and 'diagram'.
+    """
+    image_name, annotation, diagram = row
+
+    return {'image_name': image_name,
+            'annotation': json.loads(annotation),
+            'diagram': pickle.loads(diagram) if diagram is not None else None}
+
+
+# Define the header of SQLite database files
+database_signature = b'SQLite format 3\x00'
+
+# Define the extensions used for new database files
+database_extensions = ['.db', '.sqlite', '.sqlite3']
+
+# Define the columns holding the claims and versions of diagrams
+claim_columns = {'version': 'INTEGER NOT NULL DEFAULT 0',
+                 'claimed_by': 'TEXT',
+                 'claimed_at': 'REAL'}
+
+# Define the tables and indices of the database. The primary keys of the tables
+# of nodes and edges begin with the image name, which allows fetching and
+# deleting the nodes and edges of a diagram using the index of the primary key.
+database_schema = """
+CREATE TABLE IF NOT EXISTS diagrams (
+    image_name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    annotation TEXT NOT NULL,
+    diagram BLOB,
+    comments TEXT,
+    {status},
+    {claims}
+);
+
+CREATE TABLE IF NOT EXISTS nodes (
+    image_name TEXT NOT NULL REFERENCES diagrams (image_name)
+        ON DELETE CASCADE,
+    layer TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    node_id TEXT NOT NULL,
+    kind TEXT,
+    macro_group TEXT,
+    rel_name TEXT,
+    attributes TEXT,
+    PRIMARY KEY (image_name, layer, position)
+);
+
+CREATE TABLE IF NOT EXISTS edges (
+    image_name TEXT NOT NULL REFERENCES diagrams (image_name)
+        ON DELETE CASCADE,
+    layer TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    key INTEGER,
+    kind TEXT,
+    attributes TEXT,
+    PRIMARY KEY (image_name, layer, position)
+);
+
+CREATE INDEX IF NOT EXISTS diagrams_status ON diagrams ({status_index});
+CREATE INDEX IF NOT EXISTS diagrams_position ON diagrams (position);
+CREATE INDEX IF NOT EXISTS nodes_rel_name ON nodes (rel_name)
+    WHERE rel_name IS NOT NULL;
+""".format(status=',\n    '.join('{} INTEGER'.format(c) for c in status_columns),
+           claims=',\n    '.join('{} {}'.format(c, d)
+                                 for c, d in claim_columns.items()),
+           status_index=', '.join(status_columns))
+
+# Define the statements for inserting rows. Rows for diagrams already in the
+# database are either kept as they are or replaced, keeping their position and
+# incrementing their version.
+insert_diagram = """
+INSERT INTO diagrams (image_name, position, annotation, diagram, comments, {0})
+VALUES (:image_name,
+        (SELECT COALESCE(MAX(position), -1) + 1 FROM diagrams),
+        :annotation, :diagram, :comments, {1})
+ON CONFLICT (image_name) DO
+""".format(', '.join(status_columns),
+           ', '.join(':{}'.format(c) for c in status_columns))
+
+replace_diagram = insert_diagram + 'UPDATE SET version = version + 1, ' + \
+    ', '.join('{0} = excluded.{0}'.format(c) for c in
+              ['annotation', 'diagram', 'comments'] + status_columns)
+
+insert_diagram += 'NOTHING'
+
+insert_node = 'INSERT INTO nodes VALUES (:image_name, :layer, :position, ' \
+              ':node_id, :kind, :macro_group, :rel_name, :attributes)'
+
+insert_edge = 'INSERT INTO edges VALUES (:image_name, :layer, :position, ' \
+              ':source, :target, :key, :kind, :attributes)'
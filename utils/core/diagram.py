@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
 from .annotate import *
+from .canvas import GraphCanvas
+from .compact import CompactLayer, compact_graph
 from .draw import *
 from .interface import *
 from .parse import *
+from .spatial import format_suggestions, index_elements, suggest_groups
 
 import cv2
 import numpy as np
@@ -14,6 +17,12 @@ class Diagram:
     """
     This class holds the annotation for a single AI2D-RST diagram.
     """
+    # Set up the graphs of the annotation layers, which are stored in a compact
+    # form once the layers have been completed and frozen
+    layout_graph = CompactLayer()
+    connectivity_graph = CompactLayer()
+    rst_graph = CompactLayer()
+
     def __init__(self, ai2d_ann, image):
         """
         This function initializes the Diagram class.
@@ -46,11 +55,15 @@ class Diagram:
             # Read the JSON annotation into a dictionary
             self.annotation = load_annotation(ai2d_ann)
 
+        # Build an index of element types in the annotation
+        self.element_types = index_types(self.annotation)
+
         # Create a graph for layout annotation (hierarchy and macro grouping)
         self.layout_graph = create_graph(self.annotation,
                                          edges=False,
                                          arrowheads=False,
-                                         mode='layout'
+                                         mode='layout',
+                                         index=self.element_types
                                          )
 
         # Set up placeholders for connectivity and RST layers
@@ -63,13 +76,89 @@ class Diagram:
         # Set up a flag for tracking updates to the graph (for drawing)
         self.update = False
 
-    def annotate_layout(self, review):
+        # Set up a cache for node positions used for drawing the graphs
+        self.layouts = LayoutCache()
+
+    def __getstate__(self):
+
+        # Copy the attributes of the object
+        state = self.__dict__.copy()
+
+        # Leave out the copy of the layout graph kept for resetting the
+        # annotation, which is created anew whenever the layout is annotated
+        state.pop('reset', None)
+
+        # Store the graphs of completed layers in a compact form
+        for attribute in diagram_layers:
+
+            if attribute in state:
+
+                state[attribute] = compact_graph(state[attribute])
+
+        return state
+
+    def __setstate__(self, state):
+        """
+        This function restores a pickled Diagram object and adds any attributes
+        missing from objects pickled by earlier versions of the class. The
+        graphs of completed layers in objects pickled by earlier versions are
+        stored in a compact form.
+
+        Parameters:
+            state: A dictionary containing the attributes of the object.
+
+        Returns:
+            None
+        """
+        # Restore the attributes, leaving out the copy of the layout graph
+        # pickled by earlier versions for resetting the annotation
+        self.__dict__.update(state)
+        self.__dict__.pop('reset', None)
+
+        # Store the graphs of completed layers in a compact form
+        self.compact()
+
+        # Add a cache for node positions if missing
+        if 'layouts' not in state:
+
+            self.layouts = LayoutCache()
+
+        # Only keep the most recent layouts in objects pickled by earlier
+        # versions, which stored every cached layout
+        self.layouts.persist = False
+
+        # Add an index of element types if missing
+        if 'element_types' not in state:
+
+            self.element_types = index_types(self.annotation)
+
+    def compact(self):
+        """
+        Stores the graphs of completed layers, which have been frozen, in a
+        compact form (see CompactGraph). The graphs are converted back into
+        NetworkX graphs once they are accessed, so scripts that read the graphs
+        of many diagrams should call this function once they are done with
+        each diagram.
+
+        Returns:
+            None
+        """
+        for attribute in diagram_layers:
+
+            if attribute in self.__dict__:
+
+                self.__dict__[attribute] = compact_graph(
+                    self.__dict__[attribute])
+
+    def annotate_layout(self, review, prefetched=None):
         """
         A function for annotating the logical / layout structure (DPG-L) of a
         diagram. This function covers both content hierarchy and macro-grouping.
         
         Parameters:
             review: A Boolean defining whether review mode is active or not.
+            prefetched: A dictionary of renders created by prefetch_diagram(),
+                        which are shown instead of drawing the diagram anew.
         
         Returns:
             Updates the graph contained in the Diagram object
@@ -85,26 +174,53 @@ class Diagram:
         # Freeze and save current graph for resetting annotation if required
         self.reset = nx.freeze(self.layout_graph.copy())
 
-        # Visualize the layout segmentation
-        segmentation = draw_layout(self.image_filename, self.annotation, 480)
+        # Visualize the layout segmentation, using a prefetched image if
+        # available
+        if prefetched is not None:
 
-        # Draw the graph
-        diagram = draw_graph(self.layout_graph, dpi=100, mode='layout')
+            segmentation = prefetched['segmentation']
+
+        else:
+
+            segmentation = draw_layout(self.image_filename, self.annotation,
+                                       480, backend='opencv')
+
+        # Use a prefetched image of the graph if the graph has not changed
+        if prefetched is not None and prefetched['mode'] == 'layout' and \
+                prefetched['key'] == graph_hash(self.layout_graph):
+
+            canvas = prefetched['canvas']
+            diagram = prefetched['graph']
+
+        # Otherwise set up a canvas, which keeps the elements of the graph
+        # between redraws, and draw the graph
+        else:
+
+            canvas = GraphCanvas(mode='layout', dpi=100, cache=self.layouts)
+            diagram = canvas.draw(self.layout_graph)
 
         # Set up flag a for tracking whether annotation is hidden
         hide = False
 
+        # Count any provisional groups added by pregroup_annotation.py
+        provisional = [n for n, p in self.layout_graph.nodes(data='provisional')
+                       if p]
+
+        # Print status message if provisional groups are found
+        if provisional and not self.group_complete:
+
+            print("[INFO] The graph contains {} provisional groups. Remove "
+                  "incorrect groups using the command rm.".format(
+                      len(provisional)))
+
         # Enter a while loop for the annotation procedure
         while not self.group_complete:
 
             # Check if the graph needs to be updated
             if self.update:
 
-                # Close previous plot
-                plt.close()
-
-                # Re-draw the graph
-                diagram = draw_graph(self.layout_graph, dpi=100, mode='layout')
+                # Re-draw the elements of the graph that have changed
+                diagram = canvas.draw(self.layout_graph)
 
                 # Mark update complete
                 self.update = False
@@ -156,7 +272,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=True)
+                                           480, hide=True, backend='opencv')
 
                 # Flag the annotation as hidden
                 hide = True
@@ -169,7 +285,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=False)
+                                           480, hide=False, backend='opencv')
 
                 # Flag the annotation as visible
                 hide = False
@@ -195,7 +311,8 @@ class Diagram:
                     segmentation = draw_layout(self.image_filename,
                                                self.annotation,
                                                480, hide=False,
-                                               point=user_input)
+                                               point=user_input,
+                                               backend='opencv')
 
                     continue
 
@@ -204,6 +321,63 @@ class Diagram:
 
                     continue
 
+            # Check if the user has requested suggestions for grouping
+            if user_input.split()[0] in commands['layout']:
+
+                # Prepare input for validation
+                user_input = prepare_input(user_input, 1)
+
+                # Check the input against the current graph
+                valid = validate_input(user_input, self.layout_graph)
+
+                # If the input is not valid, continue
+                if not valid:
+
+                    continue
+
+                # Get the diagram elements in the graph
+                elements = [n for n, k in self.layout_graph.nodes(data='kind')
+                            if k not in ['group', 'imageConsts']]
+
+                # Build a spatial index over the elements
+                index = index_elements(self.annotation, elements=elements)
+
+                # Convert input to uppercase. If no elements were given, make
+                # suggestions for all elements that have not been grouped.
+                user_input = [u.upper() for u in user_input] or \
+                    [e for e in index.elements
+                     if self.layout_graph.degree(e) == 0]
+
+                # Print the suggestions for each element
+                for element in user_input:
+
+                    # Check that the element has geometry
+                    if element not in index:
+
+                        print("[ERROR] Sorry, {} has no geometry to compare."
+                              .format(element))
+
+                        continue
+
+                    suggestions = suggest_groups(index, element)
+
+                    print("[INFO] {}".format(format_suggestions(element,
+                                                                suggestions)))
+
+                # Highlight the candidates if a single element was given
+                if len(user_input) == 1 and user_input[0] in index:
+
+                    candidates = [c for v in suggestions.values() for c in v]
+
+                    # Re-draw the layout
+                    segmentation = draw_layout(self.image_filename,
+                                               self.annotation,
+                                               480, hide=False,
+                                               point=user_input + candidates,
+                                               backend='opencv')
+
+                continue
+
             # Check if the user has requested to describe a macro-group
             if 'macro' == user_input.split()[0]:
 
@@ -291,12 +465,14 @@ class Diagram:
                 # Continue until the annotation process is complete
                 continue
 
-    def annotate_connectivity(self, review):
+    def annotate_connectivity(self, review, prefetched=None):
         """
         A function for annotating a diagram for its connectivity.
 
         Parameters:
             review: A Boolean defining whether review mode is active or not.
+            prefetched: A dictionary of renders created by prefetch_diagram(),
+                        which are shown instead of drawing the diagram anew.
 
         Returns:
             Updated the graph contained in the Diagram object
@@ -314,8 +490,16 @@ class Diagram:
 
                 pass
 
-        # Visualize the layout segmentation
-        segmentation = draw_layout(self.image_filename, self.annotation, 480)
+        # Visualize the layout segmentation, using a prefetched image if
+        # available
+        if prefetched is not None:
+
+            segmentation = prefetched['segmentation']
+
+        else:
+
+            segmentation = draw_layout(self.image_filename, self.annotation,
+                                       480, backend='opencv')
 
         # If the connectivity graph does not exist, create graph
         if self.connectivity_graph is None:
@@ -326,9 +510,20 @@ class Diagram:
         # Update grouping information using the grouping layer
         update_grouping(self, self.connectivity_graph)
 
-        # Draw the graph using the connectivity mode
-        diagram = draw_graph(self.connectivity_graph, dpi=100,
-                             mode='connectivity')
+        # Use a prefetched image of the graph if the graph has not changed
+        if prefetched is not None and prefetched['mode'] == 'connectivity' and \
+                prefetched['key'] == graph_hash(self.connectivity_graph):
+
+            canvas = prefetched['canvas']
+            diagram = prefetched['graph']
+
+        # Otherwise set up a canvas, which keeps the elements of the graph
+        # between redraws, and draw the graph
+        else:
+
+            canvas = GraphCanvas(mode='connectivity', dpi=100,
+                                 cache=self.layouts)
+            diagram = canvas.draw(self.connectivity_graph)
 
         # Set up flag a for tracking whether annotation is hidden
         hide = False
@@ -339,12 +534,8 @@ class Diagram:
             # Check if the graph needs to be updated
             if self.update:
 
-                # Close previous plot
-                plt.close()
-
-                # Re-draw the graph using the layout mode
-                diagram = draw_graph(self.connectivity_graph, dpi=100,
-                                     mode='connectivity')
+                # Re-draw the elements of the graph that have changed
+                diagram = canvas.draw(self.connectivity_graph)
 
                 # Mark update complete
                 self.update = False
@@ -399,7 +590,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=True)
+                                           480, hide=True, backend='opencv')
 
                 # Flag the annotation as hidden
                 hide = True
@@ -412,7 +603,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=False)
+                                           480, hide=False, backend='opencv')
 
                 # Flag the annotation as visible
                 hide = False
@@ -438,7 +629,8 @@ class Diagram:
                     segmentation = draw_layout(self.image_filename,
                                                self.annotation,
                                                480, hide=False,
-                                               point=user_input)
+                                               point=user_input,
+                                               backend='opencv')
 
                     continue
 
@@ -558,12 +750,14 @@ class Diagram:
             # Continue until the annotation process is complete
             continue
 
-    def annotate_rst(self, review):
+    def annotate_rst(self, review, prefetched=None):
         """
         A function for annotating the rhetorical structure (DPG-R) of a diagram.
         
         Parameters:
             review: A Boolean defining whether review mode is active or not.
+            prefetched: A dictionary of renders created by prefetch_diagram(),
+                        which are shown instead of drawing the diagram anew.
         
         Returns:
             Updates the RST graph in the Diagram object (self.rst_graph).
@@ -580,8 +774,16 @@ class Diagram:
 
                 pass
 
-        # Visualize the layout segmentation
-        segmentation = draw_layout(self.image_filename, self.annotation, 480)
+        # Visualize the layout segmentation, using a prefetched image if
+        # available
+        if prefetched is not None:
+
+            segmentation = prefetched['segmentation']
+
+        else:
+
+            segmentation = draw_layout(self.image_filename, self.annotation,
+                                       480, backend='opencv')
 
         # If the RST graph does not exist, populate graph
         if self.rst_graph is None:
@@ -592,8 +794,19 @@ class Diagram:
         # Update grouping information using the grouping layer
         update_grouping(self, self.rst_graph)
 
-        # Draw the graph using RST mode
-        diagram = draw_graph(self.rst_graph, dpi=100, mode='rst')
+        # Use a prefetched image of the graph if the graph has not changed
+        if prefetched is not None and prefetched['mode'] == 'rst' and \
+                prefetched['key'] == graph_hash(self.rst_graph):
+
+            canvas = prefetched['canvas']
+            diagram = prefetched['graph']
+
+        # Otherwise set up a canvas, which keeps the elements of the graph
+        # between redraws, and draw the graph
+        else:
+
+            canvas = GraphCanvas(mode='rst', dpi=100, cache=self.layouts)
+            diagram = canvas.draw(self.rst_graph)
 
         # Set up flag a for tracking whether annotation is hidden
         hide = False
@@ -604,11 +817,8 @@ class Diagram:
             # Check if the graph needs to be updated
             if self.update:
 
-                # Close previous plot
-                plt.close()
-
-                # Re-draw the graph
-                diagram = draw_graph(self.rst_graph, dpi=100, mode='rst')
+                # Re-draw the elements of the graph that have changed
+                diagram = canvas.draw(self.rst_graph)
 
                 # Mark update complete
                 self.update = False
@@ -661,7 +871,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=True)
+                                           480, hide=True, backend='opencv')
 
                 # Flag the annotation as hidden
                 hide = True
@@ -674,7 +884,7 @@ class Diagram:
                 # Re-draw the layout
                 segmentation = draw_layout(self.image_filename,
                                            self.annotation,
-                                           480, hide=False)
+                                           480, hide=False, backend='opencv')
 
                 # Flag the annotation as visible
                 hide = False
@@ -700,7 +910,8 @@ class Diagram:
                     segmentation = draw_layout(self.image_filename,
                                                self.annotation,
                                                480, hide=False,
-                                               point=user_input)
+                                               point=user_input,
+                                               backend='opencv')
 
                     continue
 
@@ -741,3 +952,7 @@ class Diagram:
 
             # Continue until the annotation process is complete
             continue
+
+
+# Define the attributes holding the graphs of the annotation layers
+diagram_layers = ['layout_graph', 'connectivity_graph', 'rst_graph']
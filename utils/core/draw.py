@@ -1,13 +1,29 @@
 # -*- coding: utf-8 -*-
 
+from .layout import *
 from .parse import *
 
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
 import cv2
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import functools
+import itertools
+import matplotlib as mpl
 import numpy as np
 import networkx as nx
 import os
+import tempfile
+
+
+# Set up a layout cache shared by the entire process
+layout_cache = LayoutCache(maxsize=256, persist=False)
+
+# Set up a cache for resized images shared by the entire process
+image_cache = ImageCache(max_bytes=256 * 1024 ** 2)
+
+# Set up a cache for images of graphs, which is enabled by setting a directory
+render_cache = RenderCache()
 
 
 def draw_graph(graph, dpi=100, mode='layout', **kwargs):
@@ -22,17 +38,54 @@ def draw_graph(graph, dpi=100, mode='layout', **kwargs):
 
     Optional parameters:
         highlight: A dictionary of identifier/colour pairs to emphasise.
+        render: A string defining how the figure is converted into an image,
+                either 'memory' (default) or 'file'. See render_figure().
+        cache: A LayoutCache object for reusing node positions. By default,
+               a cache shared by the entire process is used.
+        incremental: A Boolean defining whether the most recent layout drawn
+                     for this mode is used as initial positions for the new
+                     layout. Keeps the layout stable between redraws.
+        layout_engine: A string defining the layout engine, either 'neato'
+                       (default) or 'stress'. See get_layout().
+
+    If a directory has been set for the render cache (render_cache.cache_dir),
+    images of graphs are stored on disk and reused when a graph with the same
+    contents is drawn again using the same parameters. Graphs drawn using
+    incremental layouts are not cached, as their layout depends on previous
+    layouts.
         
     Returns:
          An image showing the NetworkX Graph.
     """
+    # Check if the render cache should be used for this graph
+    cache_render = render_cache.enabled and not kwargs.get('incremental')
+
+    # Check if an image of the graph has been stored in the render cache
+    if cache_render:
+
+        # Calculate a key from the contents of the graph and the parameters
+        # that affect the image
+        key = render_cache.key(graph, mode=mode, dpi=dpi,
+                               highlight=kwargs.get('highlight'),
+                               engine=kwargs.get('layout_engine', 'neato'))
+
+        img = render_cache.get(key)
+
+        if img is not None:
+
+            return img
 
-    # Set up the matplotlib Figure, its resolution and Axis
-    fig = plt.figure(dpi=dpi)
+    # Set up the matplotlib Figure, its resolution and Axis. The Figure is not
+    # managed by pyplot, which allows drawing in background threads.
+    fig = Figure(dpi=dpi)
     ax = fig.add_subplot(1, 1, 1)
 
-    # Initialize a neato layout for the graph
-    pos = nx.nx_pydot.graphviz_layout(graph, prog='neato')
+    # Initialize a neato layout for the graph or fetch the layout from cache
+    pos = get_layout(graph,
+                     cache=kwargs.get('cache', layout_cache),
+                     incremental=kwargs.get('incremental', False),
+                     slot=mode,
+                     engine=kwargs.get('layout_engine', 'neato'))
 
     # Generate a dictionary with nodes and their kind
     node_types = nx.get_node_attributes(graph, 'kind')
@@ -95,30 +148,32 @@ def draw_graph(graph, dpi=100, mode='layout', **kwargs):
         draw_nodes(graph, pos=pos, ax=ax, node_types=node_types, mode=mode)
 
     # Draw labels for each node in the graph
-    nx.draw_networkx_labels(graph, pos, font_size=10, labels=node_dict)
+    nx.draw_networkx_labels(graph, pos, font_size=10, labels=node_dict, ax=ax)
 
     # Draw labels for groups
-    nx.draw_networkx_labels(graph, pos, font_size=10, labels=group_dict)
+    nx.draw_networkx_labels(graph, pos, font_size=10, labels=group_dict,
+                            ax=ax)
 
     if mode == 'rst':
 
         # Draw labels for nodes representing for RST relations
-        nx.draw_networkx_labels(graph, pos, font_size=10, labels=rel_dict)
+        nx.draw_networkx_labels(graph, pos, font_size=10, labels=rel_dict,
+                                ax=ax)
 
         # Draw edge labels for nuclei and satellites
-        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_dict)
+        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_dict, ax=ax)
 
     # Remove margins from the graph and axes from the plot
     fig.tight_layout(pad=0)
-    plt.axis('off')
+    ax.axis('off')
 
-    # Save figure to file, read the file using OpenCV and remove the file
-    plt.savefig('temp.png')
-    img = cv2.imread('temp.png')
-    os.remove('temp.png')
+    # Render the figure into an image
+    img = render_figure(fig, render=kwargs.get('render', 'memory'))
 
-    # Close matplotlib figure
-    plt.close()
+    # Store the image in the render cache
+    if cache_render:
+
+        render_cache.put(key, img)
 
     return img
 
@@ -136,6 +191,15 @@ def draw_layout(path_to_image, annotation, height, hide=False, **kwargs):
     Optional parameters:
         dpi: An integer indicating the resolution to use.
         point: A list of layout elements to draw.
+        render: A string defining how the figure is converted into an image,
+                either 'memory' (default) or 'file'. See render_figure().
+        highlight: A dictionary of colour/element list pairs to emphasise.
+        arrowheads: If given, arrowheads are drawn as well.
+        geometry: The geometry of the diagram elements from a GeometryStore.
+                  See collect_overlays().
+        backend: A string defining how the annotation is drawn, either
+                 'matplotlib' (default) or 'opencv', which draws directly on
+                 the image and is much faster. See draw_layout_opencv().
 
     Returns:
         An image with the AI2D annotation overlaid.
@@ -144,378 +208,346 @@ def draw_layout(path_to_image, annotation, height, hide=False, **kwargs):
     # Load the diagram image and make a copy
     img, r = resize_img(path_to_image, height)
 
+    # Draw the annotation using OpenCV if requested
+    if kwargs.get('backend', 'matplotlib') == 'opencv':
+
+        return draw_layout_opencv(img, annotation, r, hide=hide, **kwargs)
+
     # Change from BGR to RGB colourspace
     img = img[:, :, ::-1]
 
-    # Create a matplotlib Figure
-    fig, ax = plt.subplots(1)
-    plt.tight_layout(pad=0)
+    # Create a matplotlib Figure, which is not managed by pyplot
+    fig = Figure()
+    ax = fig.add_subplot(1, 1, 1)
+    fig.tight_layout(pad=0)
 
     # Add the image to the axis
     ax.imshow(img)
 
     # Hide grid and axes
-    plt.axis('off')
+    ax.axis('off')
+
+    # Get the requested resolution and rendering mode
+    dpi = kwargs.get('dpi', None)
+    render = kwargs.get('render', 'memory')
 
     # Check if the annotation should be hidden
     if hide:
 
-        # Save figure to file, read the file using OpenCV and remove the file
-        plt.savefig('temp.png')
-        img = cv2.imread('temp.png')
-        os.remove('temp.png')
+        # Render the figure into an image
+        img = render_figure(fig, dpi=dpi, render=render)
 
         return img
 
-    # Draw blobs
-    try:
-        for b in annotation['blobs']:
-
-            # Define default colour for blobs
-            blob_color = 'orangered'
+    # Collect the outlines and labels of the layout elements to draw
+    outlines, labels = collect_overlays(annotation, r, **kwargs)
 
-            # Check if some annotation should be highlighted
-            if kwargs and 'point' in kwargs:
+    # Draw the outlines as polygon collections. Consecutive outlines of the
+    # same colour are drawn using a single collection, which preserves the
+    # order in which the outlines are drawn.
+    for color, group in itertools.groupby(outlines, key=lambda o: o[1]):
 
-                # Continue if the blob is not in the list of elements to draw
-                if b not in kwargs['point']:
-
-                    continue
-
-            # Check if some annotation should be highlighted in different colors
-            if kwargs and 'highlight' in kwargs:
-
-                # Check that kwargs['highlight'] is a dictionary
-                assert type(kwargs['highlight']) == dict
-
-                # Assign highlights to a dictionary
-                highlights = kwargs['highlight']
-
-                # Loop over colours and elements
-                for color, elements in highlights.items():
-
-                    # If match is found, set colour and highlight to True
-                    if b in elements:
+        # Create a collection of the outlines. Each outline is included twice,
+        # as the outlines have always been drawn twice (once as a patch and
+        # once as an artist), which makes the antialiased edges stronger.
+        collection = PolyCollection([o[0] for o in group for _ in range(2)],
+                                    closed=True,
+                                    facecolors='none',
+                                    edgecolors=color,
+                                    linewidths=mpl.rcParams['patch.linewidth'],
+                                    joinstyle='miter',
+                                    capstyle='butt')
 
-                        blob_color = color
-                        highlight = True
+        # Add the collection to the image
+        ax.add_collection(collection, autolim=False)
 
-                        break
+    # Get the limits of the axes for checking the positions of labels
+    x_min, x_max = sorted(ax.get_xlim())
+    y_min, y_max = sorted(ax.get_ylim())
 
-                    else:
-                        highlight = False
+    # Draw the labels, each with a box in the colour of the element
+    for label, cx, cy, color in labels:
 
-                # If no element is to be highlighted, continue to next item
-                if not highlight:
+        # Skip labels placed outside the axes, which were not drawn when the
+        # labels were added as annotations
+        if not (x_min <= cx <= x_max and y_min <= cy <= y_max):
 
-                    continue
+            continue
 
-            # Get blob ID
-            blob_id = annotation['blobs'][b]['id']
+        ax.text(cx, cy, label, color='white', fontsize=10, ha='center',
+                va='center', bbox=dict(alpha=1, color=color, pad=0))
 
-            # Assign the blob points into a variable and convert into numpy
-            # array
-            points = np.array(annotation['blobs'][b]['polygon'], np.int32)
+    # Render the figure into an image, using the requested resolution if given
+    img = render_figure(fig, dpi=dpi, render=render)
 
-            # Scale the coordinates according to the ratio; convert to int
-            points = np.round(points * r, decimals=0).astype('int')
+    # Return the annotated image
+    return img
 
-            # Creat arrow polygon
-            blob = patches.Polygon(points,
-                                   closed=True,
-                                   fill=False,
-                                   alpha=1,
-                                   color=blob_color)
 
-            # Add arrow to the image
-            ax.add_patch(blob)
+def draw_layout_opencv(img, annotation, r, hide=False, **kwargs):
+    """
+    Draws the AI2D layout annotation on a resized diagram image using OpenCV.
+    The image is placed on a canvas of the same size as the figures drawn by
+    draw_layout() using matplotlib.
 
-            # Add artist for patch
-            ax.add_artist(blob)
+    Parameters:
+        img: The resized diagram image in the BGR colour space.
+        annotation: A dictionary containing AI2D annotation.
+        r: The ratio used for resizing the image.
+        hide: A Boolean indicating whether to draw annotation or not.
 
-            # Get centroid
-            cx, cy = np.round(points.mean(axis=0), decimals=0).astype('int')[:2]
+    Optional parameters:
+        dpi: An integer indicating the resolution to use.
+        point: A list of layout elements to draw.
+        highlight: A dictionary of colour/element list pairs to emphasise.
+        arrowheads: If given, arrowheads are drawn as well.
+        geometry: The geometry of the diagram elements from a GeometryStore.
+                  See collect_overlays().
 
-            # If highlights have been requested, skip annotations and continue
-            if 'highlight' in kwargs:
+    Returns:
+        An image with the AI2D annotation overlaid.
+    """
+    # Get the size of the canvas and the box available for the image
+    dpi = kwargs.get('dpi', None) or mpl.rcParams['figure.dpi']
+    canvas_w, canvas_h, box_x, box_y, box_w, box_h = get_axes_box(dpi)
 
-                continue
+    # Calculate the scale for fitting the image into the box and the offsets
+    # for centering the image.
+    (h, w) = img.shape[:2]
+    scale = min(box_w / w, box_h / h)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    offset_x = int(round(box_x + (box_w - new_w) / 2))
+    offset_y = int(round(box_y + (box_h - new_h) / 2))
 
-            # Annotate the blob
-            ann = ax.annotate(blob_id, (cx, cy), color='white',
-                              fontsize=10, ha='center', va='center')
+    # Set up a white canvas and place the image in the middle
+    canvas = np.full((canvas_h, canvas_w, 3), 255, dtype=np.uint8)
 
-            # Add a box around the annotation
-            ann.set_bbox(dict(alpha=1, color=blob_color, pad=0))
+    if (new_w, new_h) != (w, h):
 
-    # Skip if there are no blobs to draw
-    except KeyError:
-        pass
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_AREA)
 
-    # Draw arrows
-    try:
-        for a in annotation['arrows']:
+    canvas[offset_y:offset_y + new_h, offset_x:offset_x + new_w] = img
 
-            # Define default colour for arrows
-            arrow_color = 'mediumseagreen'
+    # Return the image if the annotation should be hidden
+    if hide:
 
-            # Check if some annotation should be highlighted
-            if kwargs and 'point' in kwargs:
+        return canvas
 
-                # Continue if the blob is not in the list of elements to draw
-                if a not in kwargs['point']:
+    # Collect the outlines and labels of the layout elements to draw
+    outlines, labels = collect_overlays(annotation, r, **kwargs)
 
-                    continue
+    # Convert the colours of the elements into the BGR colour space
+    colors = {color: to_bgr(color) for color in
+              set(o[-1] for o in outlines) | set(l[-1] for l in labels)}
 
-            # Check if some annotation should be highlighted in different colors
-            if kwargs and 'highlight' in kwargs:
+    # Define the font, its scale and thickness. The scale matches the height of
+    # capital letters in the labels drawn by matplotlib (10 points), which
+    # is about 30 pixels at scale 1.
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 10 * dpi / 72 / 30
+    font_thickness = 1
 
-                # Check that kwargs['highlight'] is a dictionary
-                assert type(kwargs['highlight']) == dict
+    # Draw the outlines
+    for points, color in outlines:
 
-                # Assign highlights to a dictionary
-                highlights = kwargs['highlight']
+        # Map the points to the canvas; use fixed-point coordinates with four
+        # fractional bits for subpixel accuracy.
+        points = ((np.asarray(points, dtype=np.float64) + 0.5) * scale
+                  + (offset_x, offset_y)) * 16
 
-                # Loop over colours and elements
-                for color, elements in highlights.items():
+        cv2.polylines(canvas, [points.round().astype(np.int32)], isClosed=True,
+                      color=colors[color], thickness=1, lineType=cv2.LINE_AA,
+                      shift=4)
 
-                    # If match is found, set colour and highlight to True
-                    if a in elements:
+    # Draw the labels, each with a box in the colour of the element
+    for label, cx, cy, color in labels:
 
-                        arrow_color = color
-                        highlight = True
+        # Get the size of the label and the position of its box
+        (text_w, text_h), baseline = cv2.getTextSize(label, font, font_scale,
+                                                     font_thickness)
 
-                        break
+        cx, cy = offset_x + (cx + 0.5) * scale, offset_y + (cy + 0.5) * scale
+        x0, y0 = int(round(cx - text_w / 2)), int(round(cy - text_h / 2))
 
-                    else:
-                        highlight = False
+        # Draw the box and the label
+        cv2.rectangle(canvas, (x0, y0), (x0 + text_w, y0 + text_h),
+                      colors[color], thickness=cv2.FILLED)
 
-                # If no element is to be highlighted, continue to next item
-                if not highlight:
+        cv2.putText(canvas, label, (x0, y0 + text_h), font, font_scale,
+                    (255, 255, 255), font_thickness, cv2.LINE_AA)
 
-                    continue
+    return canvas
 
-            # Get arrow ID
-            arrow_id = annotation['arrows'][a]['id']
 
-            # Assign the points into a variable
-            points = np.array(annotation['arrows'][a]['polygon'], np.int32)
+@functools.lru_cache(maxsize=None)
+def get_axes_box(dpi):
+    """
+    Gets the size of the images rendered by draw_layout() using matplotlib and
+    the box in which the diagram image is placed.
 
-            # Scale the coordinates according to the ratio; convert to int
-            points = np.round(points * r, decimals=0).astype('int')
+    Parameters:
+        dpi: An integer indicating the resolution to use.
 
-            # Create an arrow polygon
-            arrow = patches.Polygon(points,
-                                    closed=True,
-                                    fill=False,
-                                    alpha=1,
-                                    color=arrow_color)
+    Returns:
+        A tuple of the width and height of the rendered image, followed by the
+        x and y coordinates of the upper left corner of the box and its width
+        and height in pixels.
+    """
+    # Set up a Figure in the same way as draw_layout()
+    fig = Figure(dpi=dpi)
+    fig.add_subplot(1, 1, 1)
+    fig.tight_layout(pad=0)
 
-            # Add arrow to the image
-            ax.add_patch(arrow)
+    # Get the size of the figure and the position of the axes in pixels
+    width, height = fig.canvas.get_width_height()
+    x0, y0, x1, y1 = fig.axes[0].get_position().extents
 
-            # Add artist for patch
-            ax.add_artist(arrow)
+    return (width, height, x0 * width, (1 - y1) * height, (x1 - x0) * width,
+            (y1 - y0) * height)
 
-            # Get centroid
-            cx, cy = np.round(points.mean(axis=0), decimals=0).astype('int')[:2]
 
-            # If highlights have been requested, skip annotations and continue
-            if 'highlight' in kwargs:
+def to_bgr(color):
+    """
+    Converts a matplotlib colour, e.g. 'orangered', into a BGR tuple.
 
-                continue
+    Parameters:
+        color: A colour name or any other colour accepted by matplotlib.
 
-            # Annotate the arrow
-            ann = ax.annotate(arrow_id, (cx, cy), color='white',
-                              fontsize=10, ha='center', va='center')
+    Returns:
+        A tuple of integers (blue, green, red) between 0 and 255.
+    """
+    return tuple(int(round(c * 255)) for c in mpl.colors.to_rgb(color)[::-1])
 
-            # Add a box around the annotation
-            ann.set_bbox(dict(alpha=1, color=arrow_color, pad=0))
 
-    # Skip if there are no arrows to draw
-    except KeyError:
-        pass
+def collect_overlays(annotation, r, **kwargs):
+    """
+    Collects the outlines and labels of layout elements to be drawn on top of
+    a diagram image.
 
-    # Draw text blocks
-    try:
-        for t in annotation['text']:
+    Parameters:
+        annotation: A dictionary containing AI2D annotation.
+        r: The ratio used for resizing the diagram image.
 
-            # Define default colour for text blocks
-            text_color = 'dodgerblue'
+    Optional parameters:
+        point: A list of layout elements to draw.
+        highlight: A dictionary of colour/element list pairs. If given, only
+                   the listed elements are drawn using the given colours and
+                   no labels are drawn.
+        arrowheads: If given, arrowheads are drawn as well.
+        geometry: The geometry of the diagram elements from a GeometryStore,
+                  e.g. store['1132.png'], which is used instead of the
+                  coordinates in the annotation.
 
-            # Check if some annotation should be highlighted
-            if kwargs and 'point' in kwargs:
+    Returns:
+        A list of (vertices, colour) tuples for outlines and a list of (label,
+        x, y, colour) tuples for labels, both in the order of drawing.
+    """
+    # Set up lists for outlines and labels
+    outlines, labels = [], []
 
-                # Continue if the blob is not in the list of elements to draw
-                if t not in kwargs['point']:
+    # Get the geometry of the elements, if available
+    geometry = kwargs.get('geometry') or {}
 
-                    continue
+    # Define the element categories to draw, their shapes and default colours
+    categories = [('blobs', 'polygon', 'orangered'),
+                  ('arrows', 'polygon', 'mediumseagreen'),
+                  ('text', 'rectangle', 'dodgerblue')]
 
-            # Check if some annotation should be highlighted in different colors
-            if kwargs and 'highlight' in kwargs:
+    # If requested, draw arrowheads
+    if kwargs and 'arrowheads' in kwargs:
 
-                # Check that kwargs['highlight'] is a dictionary
-                assert type(kwargs['highlight']) == dict
+        categories.append(('arrowHeads', 'rectangle', 'darkorange'))
 
-                # Assign highlights to a dictionary
-                highlights = kwargs['highlight']
+    # Loop over the element categories
+    for category, shape, default_color in categories:
 
-                # Loop over colours and elements
-                for color, elements in highlights.items():
+        # Skip if there are no elements to draw
+        if category not in annotation:
 
-                    # If match is found, set colour and highlight to True
-                    if t in elements:
+            continue
 
-                        text_color = color
-                        highlight = True
+        for e in annotation[category]:
 
-                        break
+            # Set the default colour for the category
+            color = default_color
 
-                    else:
-                        highlight = False
+            # Check if some annotation should be highlighted. Arrowheads are
+            # always drawn using the default colour.
+            if category != 'arrowHeads':
 
-                # If no element is to be highlighted, continue to next item
-                if not highlight:
+                # Continue if the element is not in the list of elements to
+                # draw
+                if kwargs and 'point' in kwargs and e not in kwargs['point']:
 
                     continue
 
-            # Get text ID
-            text_id = annotation['text'][t]['id']
+                # Check if some annotation should be highlighted in different
+                # colors
+                if kwargs and 'highlight' in kwargs:
 
-            # Get the start and end points of the rectangle and cast
-            # them into tuples for drawing.
-            rect = np.array(annotation['text'][t]['rectangle'], np.int32)
+                    # Check that kwargs['highlight'] is a dictionary
+                    assert type(kwargs['highlight']) == dict
 
-            # Get start and end coordinates, convert to int and cast into tuple
-            startx, starty = np.round(rect[0] * r, decimals=0).astype('int')
-            endx, endy = np.round(rect[1] * r, decimals=0).astype('int')
+                    # Find the first colour whose elements include the element
+                    color = next((c for c, elements in
+                                  kwargs['highlight'].items()
+                                  if e in elements), None)
 
-            # Calculate bounding box width and height
-            width = endx - startx
-            height = endy - starty
+                    # If the element is not to be highlighted, continue to
+                    # next item
+                    if color is None:
 
-            # Define a rectangle and add to batch
-            rectangle = patches.Rectangle((startx, starty),
-                                          width, height,
-                                          fill=False,
-                                          alpha=1,
-                                          color=text_color,
-                                          edgecolor=None)
+                        continue
 
-            # Add patch to the image
-            ax.add_patch(rectangle)
+            # Get element ID
+            element_id = annotation[category][e]['id']
 
-            # Add artist object for rectangle
-            ax.add_artist(rectangle)
+            # Get the outline of a polygon and its centroid
+            if shape == 'polygon':
 
-            # Get starting coordinates
-            x, y = rectangle.get_xy()
+                # Assign the points into a variable and convert into numpy
+                # array, unless a view of the points is available
+                points = geometry[e] if e in geometry else \
+                    np.array(annotation[category][e]['polygon'], np.int32)
 
-            # Get coordinates for the centre; adjust positioning
-            cx = (x + rectangle.get_width() / 2.0)
-            cy = (y + rectangle.get_height() / 2.0)
+                # Scale the coordinates according to the ratio; convert to int
+                points = np.round(points * r, decimals=0).astype('int')
 
-            # If highlights have been requested, skip annotations and continue
-            if 'highlight' in kwargs:
+                # Get centroid
+                cx, cy = np.round(points.mean(axis=0),
+                                  decimals=0).astype('int')[:2]
 
-                continue
+            # Get the outline of a rectangle and its centre
+            if shape == 'rectangle':
 
-            # Add annotation to the text box
-            ann = ax.annotate(text_id, (cx, cy), color='white',
-                              fontsize=10, ha='center', va='center')
-
-            # Add a box around the annotation
-            ann.set_bbox(dict(alpha=1, color=text_color, pad=0))
-
-    # Skip if there are no text boxes to draw
-    except KeyError:
-        pass
+                # Get the start and end points of the rectangle
+                rect = geometry[e] if e in geometry else \
+                    np.array(annotation[category][e]['rectangle'], np.int32)
 
-    # If requested, draw arrowheads
-    if kwargs and 'arrowheads' in kwargs:
-
-        # Define colour for arrowheads
-        arrowhead_color = 'darkorange'
-
-        try:
-            for ah in annotation['arrowHeads']:
-
-                # Get arrowhead ID
-                arrowhead_id = annotation['arrowHeads'][ah]['id']
-
-                # Get the start and end points of the rectangle and cast them
-                # into tuples for drawing.
-                rect = np.array(annotation['arrowHeads'][ah]['rectangle'],
-                                np.int32)
-
-                # Get start and end coordinates, convert to int and cast into
-                # tuple
+                # Get start and end coordinates and convert to int
                 startx, starty = np.round(rect[0] * r, decimals=0).astype('int')
                 endx, endy = np.round(rect[1] * r, decimals=0).astype('int')
 
-                # Calculate bounding box width and height
-                width = endx - startx
-                height = endy - starty
-
-                # Define a rectangle and add to batch
-                rectangle = patches.Rectangle((startx, starty),
-                                              width, height,
-                                              fill=False,
-                                              alpha=1,
-                                              color=arrowhead_color,
-                                              edgecolor=None)
-
-                # Add patch to the image
-                ax.add_patch(rectangle)
-
-                # Add artist object for rectangle
-                ax.add_artist(rectangle)
-
-                # Get starting coordinates
-                x, y = rectangle.get_xy()
-
-                # Get coordinates for the centre; adjust positioning
-                cx = (x + rectangle.get_width() / 2.0)
-                cy = (y + rectangle.get_height() / 2.0)
-
-                # If highlights have been requested, skip annotations and
-                # continue
-                if 'highlight' in kwargs:
-
-                    continue
-
-                # Add annotation to the text box
-                ann = ax.annotate(arrowhead_id, (cx, cy), color='white',
-                                  fontsize=10, ha='center', va='center')
+                # Define the corners of the rectangle
+                points = np.array([[startx, starty], [endx, starty],
+                                   [endx, endy], [startx, endy]])
 
-                # Add a box around the annotation
-                ann.set_bbox(dict(alpha=1, color=arrowhead_color, pad=0))
+                # Get coordinates for the centre
+                cx = startx + (endx - startx) / 2.0
+                cy = starty + (endy - starty) / 2.0
 
-        # Skip if there are no arrowheads to draw
-        except KeyError:
-            pass
-
-    # Check if a high-resolution image has been requested
-    if kwargs and 'dpi' in kwargs:
-
-        # Save figure to file in the requested resolution
-        plt.savefig('temp.png', dpi=kwargs['dpi'])
-
-        img = cv2.imread('temp.png')
-        os.remove('temp.png')
+            # Add the outline to the list
+            outlines.append((points, color))
 
-        return img
+            # If highlights have been requested, skip labels and continue
+            if 'highlight' in kwargs:
 
-    # Save figure to file, read the file using OpenCV and remove the file
-    plt.savefig('temp.png')
-    img = cv2.imread('temp.png')
-    os.remove('temp.png')
+                continue
 
-    # Close the plot
-    plt.close()
+            # Add the label to the list
+            labels.append((element_id, cx, cy, color))
 
-    # Return the annotated image
-    return img
+    return outlines, labels
 
 
 def draw_nodes(graph, pos, ax, node_types, draw_edges=True, mode='layout',
@@ -822,34 +854,67 @@ def draw_nodes(graph, pos, ax, node_types, draw_edges=True, mode='layout',
                                )
 
 
-def resize_img(path_to_image, height):
+def render_figure(fig, dpi=None, render='memory'):
     """
-    Resizes an image.
+    Rasterizes a matplotlib Figure into an image.
 
     Parameters:
-        path_to_image: Path to the image to resize.
-        height: Requested height of the resized image.
+        fig: A matplotlib Figure.
+        dpi: The resolution of the image as dots per inch. By default, the
+             resolution of the Figure is used.
+        render: A string defining how the figure is converted into an image.
+                'memory' (default) draws the figure on an Agg canvas and copies
+                the pixel buffer directly. 'file' saves the figure into a
+                temporary PNG file and reads the file using OpenCV.
 
     Returns:
-        The resized image and the ratio used for resizing.
+        An image in the BGR colour space used by OpenCV.
     """
+    # Save the figure into a temporary file if requested
+    if render == 'file':
 
-    # Load the diagram image and make a copy
-    img = cv2.imread(path_to_image).copy()
+        # Create a unique temporary file to avoid clashes between processes
+        fd, temp_path = tempfile.mkstemp(suffix='.png')
+        os.close(fd)
 
-    # Calculate aspect ratio (target width / current width) and new
-    # width of the preview image.
-    (h, w) = img.shape[:2]
+        # Save figure to file, read the file using OpenCV and remove the file
+        fig.savefig(temp_path, dpi=dpi)
+        img = cv2.imread(temp_path)
+        os.remove(temp_path)
 
-    # Calculate ratio based on image height
-    r = height / h
-    dim = (int(w * r), height)
+        return img
 
-    # Resize the preview image
-    img = cv2.resize(img, dim, interpolation=cv2.INTER_AREA)
+    # Set the requested resolution
+    if dpi is not None:
+
+        fig.set_dpi(dpi)
+
+    # Draw the figure on an Agg canvas regardless of the active backend
+    canvas = FigureCanvasAgg(fig)
+    canvas.draw()
+
+    # Get the RGBA pixel buffer and convert to BGR colour space
+    img = np.asarray(canvas.buffer_rgba())
+    img = cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+
+    return img
+
+
+def resize_img(path_to_image, height):
+    """
+    Resizes an image. Resized images are cached in memory and, if a directory
+    has been set for image_cache.thumbnail_dir, on disk.
+
+    Parameters:
+        path_to_image: Path to the image to resize.
+        height: Requested height of the resized image.
+
+    Returns:
+        The resized image and the ratio used for resizing.
+    """
 
-    # Return image
-    return img, r
+    # Load the resized image from the cache or from disk
+    return image_cache.load(path_to_image, height)
 
 
 def highlight(element, highlight):
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+from .batch import map_diagrams
+from .draw import *
+
+import matplotlib as mpl
+import sys
+
+
+def export_dot(graph, mode, path):
+    """
+    Writes a NetworkX graph into a Graphviz DOT file, leaving out grouping edges
+    from connectivity and RST graphs and nodes without any edges.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        mode: A string defining the annotation layer, either 'layout',
+              'connectivity' or 'rst'.
+        path: Path to the output file.
+
+    Returns:
+        None
+    """
+    # Make a copy of the graph to avoid modifying the input
+    graph = graph.copy()
+
+    # Remove grouping edges from RST and connectivity annotation
+    if mode == 'rst' or mode == 'connectivity':
+
+        # Retrieve a list of edges in the graph
+        edge_bunch = list(graph.edges(data=True))
+
+        # Collect grouping edges from the edge list
+        try:
+            edge_bunch = [(u, v) for (u, v, d) in edge_bunch
+                          if d['kind'] == 'grouping']
+
+        except KeyError:
+            pass
+
+        # Remove grouping edges from the graph
+        graph.remove_edges_from(edge_bunch)
+
+    # Find nodes without edges (isolates) and remove them
+    graph.remove_nodes_from(list(nx.isolates(graph)))
+
+    # Write DOT graph to disk
+    nx.nx_pydot.write_dot(graph, path)
+
+
+def export_diagram(diagram, output_dir, dpi=200, layout_engine='neato'):
+    """
+    Exports the annotation for a Diagram object into DOT files and images,
+    drawing the segmentation and each annotation layer once.
+
+    Parameters:
+        diagram: A Diagram object.
+        output_dir: Path to the directory in which the files are written.
+
+    Optional parameters:
+        dpi: The resolution of the images as dots per inch.
+        layout_engine: A string defining the layout engine used for drawing
+                       the graphs. See get_layout().
+
+    Returns:
+        A list of paths to the files written.
+    """
+    # Get filename of current image (without extension)
+    fname = os.path.basename(diagram.image_filename).split('.')[0]
+
+    # Set up a list for the files written
+    written = []
+
+    # Draw the segmentation and write the image on disk
+    segmentation = draw_layout(diagram.image_filename, diagram.annotation,
+                               height=720, dpi=dpi)
+
+    written.append(os.path.join(output_dir, "segmentation_{}.png"
+                                .format(fname)))
+
+    cv2.imwrite(written[-1], segmentation)
+
+    # Loop over the annotation layers
+    for mode, graph in [('layout', diagram.layout_graph),
+                        ('connectivity', diagram.connectivity_graph),
+                        ('rst', diagram.rst_graph)]:
+
+        # Skip layers that have not been annotated
+        if graph is None:
+
+            continue
+
+        # Write the DOT graph
+        written.append(os.path.join(output_dir, "{}_{}.dot"
+                                    .format(fname, mode)))
+
+        export_dot(graph, mode, written[-1])
+
+        # Draw the graph and write the image
+        image = draw_graph(graph, dpi=dpi, mode=mode, cache=diagram.layouts,
+                           layout_engine=layout_engine)
+
+        written.append(os.path.join(output_dir, "{}_{}.png"
+                                    .format(mode, fname)))
+
+        cv2.imwrite(written[-1], image)
+
+    return written
+
+
+def init_worker():
+    """
+    Prepares a worker process for exporting diagrams without a display.
+    """
+    # Switch to a non-interactive backend for matplotlib
+    mpl.use('Agg')
+
+    # Limit OpenCV to a single thread, as the diagrams are processed in
+    # parallel.
+    cv2.setNumThreads(1)
+
+
+def export_diagrams(diagrams, output_dir, jobs=None, total=None, **kwargs):
+    """
+    Exports the annotation for multiple Diagram objects in parallel using a
+    pool of processes.
+
+    Parameters:
+        diagrams: An iterable of Diagram objects. The iterable is consumed as
+                  the export progresses, which allows loading the diagrams
+                  on demand.
+        output_dir: Path to the directory in which the files are written.
+
+    Optional parameters:
+        jobs: The number of processes to use. By default, the number of CPUs
+              is used. If jobs is 1, the diagrams are exported in the current
+              process.
+        total: The number of diagrams, which is shown in the progress counter.
+        dpi: The resolution of the images as dots per inch.
+        layout_engine: A string defining the layout engine used for drawing
+                       the graphs.
+
+    Returns:
+        A tuple of the number of diagrams exported and a list of (image name,
+        error) tuples for diagrams that could not be exported.
+    """
+    # Create the output directory if needed
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Set up counters and a list for errors
+    done, errors = 0, []
+
+    # Pair each diagram with its image name, which identifies the diagram in
+    # the list of errors
+    items = ((os.path.basename(d.image_filename), d) for d in diagrams)
+
+    for image_name, task in map_diagrams(export_diagram, items, jobs=jobs,
+                                         initializer=init_worker,
+                                         output_dir=output_dir, **kwargs):
+
+        # Collect any errors
+        if task.exception() is not None:
+
+            errors.append((image_name, task.exception()))
+
+        done += 1
+
+        # Update the progress counter
+        sys.stdout.write("\r[INFO] Processed {}/{} diagrams ...".format(
+            done, total if total is not None else '?'))
+        sys.stdout.flush()
+
+    # Finish the line containing the progress counter
+    print()
+
+    return done - len(errors), errors
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+from .parse import element_categories
+
+import json
+import numpy as np
+import os
+
+
+class GeometryStore:
+    """
+    This class holds the geometry of AI2D diagram elements for an entire
+    corpus, which has been ingested using ingest_geometry(). The points of all
+    polygons and rectangles are stored in a single memory-mapped array, and the
+    points of each element are returned as a view into this array without
+    copying them.
+    """
+    def __init__(self, path):
+        """
+        This function initializes the GeometryStore class.
+
+        Parameters:
+            path: Path to the directory created by ingest_geometry().
+
+        Returns:
+            A GeometryStore object.
+        """
+        # Read the index describing the contents of the store
+        with open(os.path.join(path, 'index.json')) as f:
+
+            self.index = json.load(f)
+
+        # Memory-map the arrays
+        self.arrays = {name: np.load(os.path.join(path, name + '.npy'),
+                                     mmap_mode='r')
+                       for name in geometry_arrays}
+
+        # Map the image names to their positions
+        self.images = {name: i for i, name in
+                       enumerate(self.arrays['image_names'].tolist())}
+
+    def __contains__(self, image_name):
+
+        return image_name in self.images
+
+    def __getitem__(self, image_name):
+
+        return ImageGeometry(self, self.images[image_name])
+
+    def __iter__(self):
+
+        return iter(self.images)
+
+    def __len__(self):
+
+        return len(self.images)
+
+    def get(self, image_name, default=None):
+        """
+        Retrieves the geometry of a single diagram.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Optional parameters:
+            default: The value returned if the diagram is not found.
+
+        Returns:
+            An ImageGeometry object or the default value.
+        """
+        return self[image_name] if image_name in self.images else default
+
+
+class ImageGeometry:
+    """
+    This class holds the geometry of the elements in a single diagram, mapping
+    the identifiers of the elements to arrays of points. Polygons have a point
+    for each vertex, whereas rectangles have two points for opposite corners,
+    as in the AI2D annotation.
+    """
+    def __init__(self, store, position):
+        """
+        This function initializes the ImageGeometry class.
+
+        Parameters:
+            store: A GeometryStore object.
+            position: The position of the diagram in the store.
+
+        Returns:
+            An ImageGeometry object.
+        """
+        self.store = store
+
+        # Get the rows of the elements in the diagram
+        start, end = store.arrays['image_offsets'][position:position + 2]
+
+        # Map the identifiers of the elements to their rows
+        self.elements = {e: row for row, e in enumerate(
+            store.arrays['element_ids'][start:end].tolist(), start=int(start))}
+
+    def __contains__(self, element):
+
+        return element in self.elements
+
+    def __getitem__(self, element):
+
+        row = self.elements[element]
+        start, end = self.store.arrays['element_offsets'][row:row + 2]
+
+        return self.store.arrays['coordinates'][start:end]
+
+    def __iter__(self):
+
+        return iter(self.elements)
+
+    def __len__(self):
+
+        return len(self.elements)
+
+    def get(self, element, default=None):
+        """
+        Retrieves the points of a single element.
+
+        Parameters:
+            element: The identifier of the element, e.g. B0.
+
+        Optional parameters:
+            default: The value returned if the element is not found.
+
+        Returns:
+            A read-only NumPy array of shape (points, 2) or the default value.
+        """
+        return self[element] if element in self.elements else default
+
+    def category(self, element):
+        """
+        Gets the category of a single element.
+
+        Parameters:
+            element: The identifier of the element, e.g. B0.
+
+        Returns:
+            The category of the element in the AI2D annotation, e.g. 'blobs'.
+        """
+        return self.store.index['categories'][
+            self.store.arrays['element_categories'][self.elements[element]]]
+
+
+def ingest_geometry(rows, path):
+    """
+    Ingests the geometry of diagram elements in the AI2D annotation into a
+    directory of arrays, which can be opened using GeometryStore. The points of
+    all elements are concatenated into a single array of integer coordinates,
+    and the points of element i are found between element_offsets[i] and
+    element_offsets[i + 1]. The elements of diagram j are likewise found
+    between image_offsets[j] and image_offsets[j + 1].
+
+    Parameters:
+        rows: An iterable of rows as dictionaries with the keys 'image_name' and
+              'annotation', e.g. the output of iter_annotation().
+        path: Path to the output directory.
+
+    Returns:
+        A tuple with the number of diagrams and elements ingested.
+    """
+    # Set up placeholders for the arrays
+    image_names, image_offsets = [], [0]
+    element_ids, categories, element_offsets = [], [], [0]
+    coordinates = []
+
+    for row in rows:
+
+        annotation = row['annotation']
+
+        # The annotation may be stored as a JSON string
+        if type(annotation) == str:
+
+            annotation = json.loads(annotation)
+
+        image_names.append(row['image_name'])
+
+        for code, category in enumerate(element_categories):
+
+            for element, attributes in annotation.get(category, {}).items():
+
+                # Elements are outlined using either polygons or rectangles
+                points = attributes.get('polygon', attributes.get('rectangle'))
+
+                if not points:
+
+                    continue
+
+                points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+
+                element_ids.append(element)
+                categories.append(code)
+                coordinates.append(points)
+                element_offsets.append(element_offsets[-1] + len(points))
+
+        image_offsets.append(len(element_ids))
+
+    # Set up the output directory
+    os.makedirs(path, exist_ok=True)
+
+    # Collect the arrays and write each array into a separate file
+    arrays = {'coordinates': np.concatenate(coordinates) if coordinates
+              else np.empty((0, 2), dtype=np.int32),
+              'element_offsets': np.array(element_offsets, dtype=np.int64),
+              'element_categories': np.array(categories, dtype=np.int8),
+              'element_ids': np.array(element_ids, dtype=str),
+              'image_names': np.array(image_names, dtype=str),
+              'image_offsets': np.array(image_offsets, dtype=np.int64)}
+
+    for name, array in arrays.items():
+
+        np.save(os.path.join(path, name + '.npy'), array)
+
+    # Write an index describing the contents of the store
+    with open(os.path.join(path, 'index.json'), 'w') as f:
+
+        json.dump({'diagrams': len(image_names),
+                   'elements': len(element_ids),
+                   'categories': element_categories,
+                   'arrays': geometry_arrays}, f, indent=2)
+
+    return len(image_names), len(element_ids)
+
+
+# Define the arrays of a geometry store
+geometry_arrays = ['coordinates', 'element_offsets', 'element_categories',
+                   'element_ids', 'image_names', 'image_offsets']
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
 # Import modules
+from .compact import CompactGraph
 from .draw import *
+from .export import export_dot
 
 
 def process_command(user_input, mode, diagram, current_graph):
@@ -40,7 +42,8 @@ def process_command(user_input, mode, diagram, current_graph):
 
         # Draw grouping graph
         try:
-            grouping = draw_graph(diagram.layout_graph, dpi=100, mode='layout')
+            grouping = draw_graph(diagram.layout_graph, dpi=100, mode='layout',
+                                  cache=diagram.layouts)
 
         except AttributeError:
 
@@ -53,7 +56,8 @@ def process_command(user_input, mode, diagram, current_graph):
         # Draw connectivity graph
         try:
             connectivity = draw_graph(diagram.connectivity_graph, dpi=100,
-                                      mode='connectivity')
+                                      mode='connectivity',
+                                      cache=diagram.layouts)
 
         except AttributeError:
 
@@ -65,7 +69,8 @@ def process_command(user_input, mode, diagram, current_graph):
 
         # Draw RST graph
         try:
-            rst = draw_graph(diagram.rst_graph, dpi=100, mode='rst')
+            rst = draw_graph(diagram.rst_graph, dpi=100, mode='rst',
+                             cache=diagram.layouts)
 
         except AttributeError:
 
@@ -105,7 +110,7 @@ def process_command(user_input, mode, diagram, current_graph):
                                    dpi=200)
 
         diag_hires = draw_graph(current_graph, dpi=200,
-                                mode=mode)
+                                mode=mode, cache=diagram.layouts)
 
         # Write image on disk
         cv2.imwrite("segmentation_{}.png".format(fname), layout_hires)
@@ -162,6 +167,13 @@ def process_command(user_input, mode, diagram, current_graph):
             # If the graph is frozen, unfreeze by making a copy
             current_graph = current_graph.copy()
 
+        # Accept any provisional groups added by pregroup_annotation.py
+        if mode == 'layout':
+
+            for node, data in current_graph.nodes(data=True):
+
+                data.pop('provisional', None)
+
         # Remove grouping edges from RST and connectivity annotation
         if mode == 'rst' or mode == 'connectivity':
 
@@ -188,6 +200,14 @@ def process_command(user_input, mode, diagram, current_graph):
         # Freeze the graph
         nx.freeze(current_graph)
 
+        # Store the frozen graph in the Diagram object in a compact form
+        setattr(diagram, '{}_graph'.format(mode),
+                CompactGraph.from_networkx(current_graph))
+
+        # Drop the most recent layout of the graph, which is no longer needed
+        # for seeding incremental layouts
+        diagram.layouts.latest.pop(mode, None)
+
         # Destroy any remaining windows
         cv2.destroyAllWindows()
 
@@ -210,32 +230,8 @@ def process_command(user_input, mode, diagram, current_graph):
         # Join filename to get a string
         fname = ''.join(fname)
 
-        # Remove grouping edges from RST and connectivity annotation
-        if mode == 'rst' or mode == 'connectivity':
-
-            # Retrieve a list of edges in the graph
-            edge_bunch = list(current_graph.edges(data=True))
-
-            # Collect grouping edges from the edge list
-            try:
-                edge_bunch = [(u, v) for (u, v, d) in edge_bunch
-                              if d['kind'] == 'grouping']
-
-            except KeyError:
-                pass
-
-            # Remove grouping edges from current graph
-            current_graph.remove_edges_from(edge_bunch)
-
-        # Find nodes without edges (isolates)
-        isolates = list(nx.isolates(current_graph))
-
-        # Remove isolates
-        current_graph.remove_nodes_from(isolates)
-
         # Write DOT graph to disk
-        nx.nx_pydot.write_dot(current_graph,
-                              '{}_{}.dot'.format(fname, mode))
+        export_dot(current_graph, mode, '{}_{}.dot'.format(fname, mode))
 
         # Print status message
         print("[INFO] Saved a DOT graph for {}.png on disk.".format(fname))
@@ -410,7 +406,8 @@ def process_command(user_input, mode, diagram, current_graph):
             diagram.layout_graph = create_graph(diagram.annotation,
                                                 edges=False,
                                                 arrowheads=False,
-                                                mode='layout'
+                                                mode='layout',
+                                                index=diagram.element_types
                                                 )
 
         # Reset connectivity graph if requested
@@ -541,6 +538,7 @@ def process_command(user_input, mode, diagram, current_graph):
 # Define a dictionary of available commands during annotation
 commands = {'rst': ['rels', 'split', 'ungroup'],
             'connectivity': ['ungroup'],
+            'layout': ['suggest'],
             'generic': ['acap', 'cap', 'comment', 'done', 'exit', 'export',
                         'free', 'info', 'isolate', 'macrogroups', 'next',
                         'reset', 'rm'],
@@ -568,6 +566,14 @@ info = {'layout': "---\n"
                   "A list of available macro-groups can be printed using the\n"
                   "command 'macrogroups'. This command will also print all\n"
                   "currently defined macro-groups.\n"
+                  "---\n"
+                  "To get suggestions for grouping an element, enter the\n"
+                  "command 'suggest' followed by the identifier. The tool\n"
+                  "lists the elements that the element contains, lies inside,\n"
+                  "overlaps with or is near to, and highlights them.\n\n"
+                  "Example command: suggest b0\n\n"
+                  "Entering 'suggest' alone lists suggestions for all\n"
+                  "elements that have not been grouped yet.\n"
                   "---\n",
         'rst': "---\n"
                "Enter the command 'new' to create a new RST relation.\n"
@@ -644,7 +650,9 @@ messages = {'nucleus_err': "Sorry, a mononuclear relation cannot have more "
                                "complete.",
             'conn_complete': "[ERROR] Connectivity annotation is marked as "
                              "complete.",
-            'rst_complete': "[ERROR] RST annotation is marked as complete. "
+            'rst_complete': "[ERROR] RST annotation is marked as complete. ",
+            'save_conflict': "[ERROR] Sorry, {} was saved by another annotator "
+                             "while it was open. Your changes were not saved."
             }
 
 
@@ -702,3 +710,40 @@ macro_groups = {'table': 'table',
                 'ill': 'illustration',
                 'diag': 'diagrammatic'
                 }
+
+# Define a dictionary of Gestalt principles and their aliases (keys), which are
+# used for describing groups in evaluate_agreement_grouping.py
+gestalt_principles = {'prox': {'cat': 'proximity',
+                               'desc': 'the elements are close to each '
+                                       'other.'},
+                      'sim': {'cat': 'similarity',
+                              'desc': 'the elements are similar in'
+                                      'terms of appearance.'},
+                      'conn': {'cat': 'connectedness',
+                               'desc': 'the elements are connected to each '
+                                       'other.'},
+                      'cont': {'cat': 'continuity',
+                               'desc': 'the elements form a continuous unit.'},
+                      'sym': {'cat': 'symmetry',
+                              'desc': 'the elements are symmetrical in terms '
+                                      'of shape.'},
+                      'clos': {'cat': 'closure',
+                               'desc': 'one or more element encloses the '
+                                       'other.'},
+                      'guide': {'cat': 'guide',
+                                'desc': 'the annotation manual defines a '
+                                        'grouping in this case.'}
+                      }
+
+# Define a dictionary of connection types and their aliases (keys), which are
+# used for describing connections in evaluate_agreement_connectivity.py
+connection_categories = {'u': {'cat': 'undirected',
+                               'desc': 'The connection is undirected.'},
+                         'd': {'cat': 'directed',
+                               'desc': 'The connection is directed.'},
+                         'b': {'cat': 'bidirectional',
+                               'desc': 'The connection is bidirectional.'},
+                         'n': {'cat': 'no-connection',
+                               'desc': 'No valid connection holds between the '
+                                       'source and the target.'}
+                         }
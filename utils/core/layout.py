@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+from .cache import *
+
+import networkx as nx
+import numpy as np
+
+
+def get_layout(graph, cache=None, incremental=False, slot=None,
+               engine='neato'):
+    """
+    Computes the positions of nodes in a NetworkX graph for drawing, reusing a
+    previously computed layout if the structure of the graph has not changed.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        cache: A LayoutCache object. If None, the layout is always computed.
+        incremental: A Boolean defining whether the most recent layout for the
+                     slot is used as initial positions for the new layout.
+        slot: A key identifying a series of related layouts in the cache, e.g.
+              the annotation layer being drawn.
+        engine: A string defining the layout engine, either 'neato' (default),
+                which calls Graphviz, or 'stress', which uses stress_layout().
+
+    Returns:
+        A dictionary mapping nodes to (x, y) positions.
+    """
+    # Check that the layout engine is valid
+    if engine not in layout_engines:
+
+        raise ValueError("Unknown layout engine '{}', valid engines include "
+                         "{}.".format(engine, ', '.join(layout_engines)))
+
+    # Calculate a structural hash for the graph and combine with the engine
+    key = (engine, graph_hash(graph))
+
+    # Check if the layout has been cached
+    if cache is not None:
+
+        pos = cache.get(key)
+
+        # If the layout is found, record it as the most recent layout
+        if pos is not None:
+
+            cache.latest[slot] = pos
+
+            return pos
+
+    # Set up a placeholder for initial positions
+    initial = None
+
+    # Use the most recent layout as initial positions if requested
+    if incremental and cache is not None:
+
+        initial = cache.latest.get(slot)
+
+    # Compute the layout using the requested engine
+    if engine == 'neato':
+
+        pos = graphviz_layout(graph, prog='neato', initial=initial)
+
+    if engine == 'stress':
+
+        pos = stress_layout(graph, initial=initial)
+
+    # Store the layout in the cache
+    if cache is not None:
+
+        cache.put(key, pos)
+        cache.latest[slot] = pos
+
+    return pos
+
+
+def graphviz_layout(graph, prog='neato', initial=None):
+    """
+    Computes the positions of nodes in a NetworkX graph using Graphviz.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        prog: The Graphviz layout program to use.
+        initial: A dictionary mapping nodes to initial (x, y) positions in
+                 points. Nodes not found in the dictionary are placed by
+                 Graphviz.
+
+    Returns:
+        A dictionary mapping nodes to (x, y) positions in points.
+    """
+    # Check if initial positions have been provided for any nodes
+    if initial and any(n in initial for n in graph.nodes):
+
+        # Make a copy of the graph to avoid modifying the input
+        graph = graph.copy()
+
+        # Set the initial positions as node attributes: Graphviz expects the
+        # positions in inches, whereas the layout is returned in points.
+        for n in graph.nodes:
+
+            if n in initial:
+
+                x, y = initial[n]
+
+                graph.nodes[n]['pos'] = '{},{}'.format(x / 72, y / 72)
+
+    return nx.nx_pydot.graphviz_layout(graph, prog=prog)
+
+
+def stress_layout(graph, initial=None, edge_length=72.0, max_iter=300,
+                  tol=1e-4):
+    """
+    Computes the positions of nodes in a NetworkX graph using stress
+    majorization (SMACOF), which places nodes so that their distances match
+    the shortest path distances in the graph. This is the model also used by
+    Graphviz neato, but the layout is computed in NumPy without calling an
+    external process.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        initial: A dictionary mapping nodes to initial (x, y) positions in
+                 points. Other nodes are placed using classical scaling.
+        edge_length: The ideal length of an edge in points. The default value
+                     matches the default edge length in neato (one inch).
+        max_iter: The maximum number of iterations.
+        tol: Stop iterating when the relative decrease of stress falls below
+             this value.
+
+    Returns:
+        A dictionary mapping nodes to (x, y) positions in points.
+    """
+    # Get the list of nodes
+    nodes = list(graph.nodes)
+    n = len(nodes)
+
+    # Handle graphs with less than two nodes
+    if n == 0:
+
+        return {}
+
+    if n == 1:
+
+        return {nodes[0]: (0.0, 0.0)}
+
+    # Calculate shortest path distances between nodes, ignoring the direction
+    # of edges.
+    dist = shortest_path_matrix(graph, nodes)
+
+    # Place disconnected nodes at a fixed distance beyond the longest path
+    finite = np.isfinite(dist)
+    longest = dist[finite].max() if finite.any() else 0
+
+    dist[~finite] = longest + 1
+
+    # Scale the distances to points
+    dist = dist * edge_length
+
+    # Calculate weights for node pairs, which emphasise short distances
+    with np.errstate(divide='ignore'):
+
+        weights = dist ** -2.0
+
+    np.fill_diagonal(weights, 0)
+
+    # Set up the weighted Laplacian and its pseudo-inverse
+    laplacian = -weights
+    np.fill_diagonal(laplacian, weights.sum(axis=1))
+    laplacian_inv = np.linalg.pinv(laplacian)
+
+    # Set up initial positions using classical scaling
+    pos = classical_scaling(dist)
+
+    # Replace initial positions with those provided by the user, if available
+    if initial:
+
+        for i, node in enumerate(nodes):
+
+            if node in initial:
+
+                pos[i] = initial[node]
+
+    # Set up a variable for tracking the stress of the layout
+    stress = np.inf
+
+    # Iterate until the layout converges
+    for _ in range(max_iter):
+
+        # Calculate the current distances between nodes
+        current = np.sqrt(((pos[:, None, :] - pos[None, :, :]) ** 2)
+                          .sum(axis=-1))
+
+        # Calculate the stress of the current layout
+        new_stress = (weights * (current - dist) ** 2).sum() / 2
+
+        # Stop if the decrease in stress is small enough
+        if stress - new_stress < tol * new_stress:
+
+            break
+
+        stress = new_stress
+
+        # Set up the matrix used to update the positions (Guttman transform)
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            update = np.where(current > 0, -weights * dist / current, 0)
+
+        np.fill_diagonal(update, 0)
+        np.fill_diagonal(update, -update.sum(axis=1))
+
+        # Update the positions
+        pos = laplacian_inv @ (update @ pos)
+
+    return {node: (float(x), float(y)) for node, (x, y) in zip(nodes, pos)}
+
+
+def shortest_path_matrix(graph, nodes):
+    """
+    Calculates a matrix of shortest path lengths between nodes, ignoring the
+    direction of edges.
+
+    Parameters:
+        graph: A NetworkX Graph.
+        nodes: A list of nodes defining the order of rows and columns.
+
+    Returns:
+        A NumPy array, in which unreachable pairs of nodes are marked as inf.
+    """
+    # Map nodes to row indices
+    index = {node: i for i, node in enumerate(nodes)}
+
+    # Set up the matrix
+    dist = np.full((len(nodes), len(nodes)), np.inf)
+
+    # Get an undirected view of the graph
+    undirected = graph.to_undirected(as_view=True) if graph.is_directed() \
+        else graph
+
+    # Populate the matrix using breadth-first search from each node
+    for source, lengths in nx.all_pairs_shortest_path_length(undirected):
+
+        # Get the row for the source
+        row = dist[index[source]]
+
+        # Fill in the path lengths
+        for target, length in lengths.items():
+
+            row[index[target]] = length
+
+    return dist
+
+
+def classical_scaling(dist):
+    """
+    Places points in two dimensions so that their distances approximate a
+    distance matrix (classical multidimensional scaling).
+
+    Parameters:
+        dist: A symmetric NumPy array of distances.
+
+    Returns:
+        A NumPy array of shape (n, 2) with the positions of points.
+    """
+    # Double-centre the matrix of squared distances
+    n = len(dist)
+    centering = np.eye(n) - np.ones((n, n)) / n
+    gram = -0.5 * centering @ (dist ** 2) @ centering
+
+    # Get the two largest eigenvalues and their eigenvectors
+    values, vectors = np.linalg.eigh(gram)
+    values, vectors = values[-2:][::-1], vectors[:, -2:][:, ::-1]
+
+    # Calculate the positions
+    pos = vectors * np.sqrt(np.clip(values, 0, None))
+
+    # Add a small deterministic offset to separate nodes placed at the same
+    # position, e.g. nodes that are not connected to any other nodes.
+    offset = np.random.RandomState(0).uniform(-1, 1, pos.shape)
+
+    return pos + offset * dist.max() * 1e-2
+
+
+# Define the available layout engines
+layout_engines = ['neato', 'stress']
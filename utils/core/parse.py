@@ -4,7 +4,8 @@ import networkx as nx
 import json
 
 
-def create_graph(annotation, edges=False, arrowheads=False, mode='layout'):
+def create_graph(annotation, edges=False, arrowheads=False, mode='layout',
+                 index=None):
     """
     Draws an initial graph of diagram elements parsed from AI2D annotation.
 
@@ -15,6 +16,8 @@ def create_graph(annotation, edges=False, arrowheads=False, mode='layout'):
         mode: A string indicating the diagram structure to be drawn, valid 
               options include 'layout', 'connect' and 'rst'. Default mode is
               layout.
+        index: A dictionary mapping element identifiers to their types, as
+               returned by index_types(). Built from the annotation if None.
 
     Returns:
         A networkx graph with diagram elements.
@@ -50,7 +53,8 @@ def create_graph(annotation, edges=False, arrowheads=False, mode='layout'):
         diagram_elements, relations = parse_annotation(annotation, mode=mode)
 
         # Extract element types
-        element_types = extract_types(diagram_elements, annotation)
+        element_types = extract_types(diagram_elements, annotation,
+                                      index=index)
 
         # Check if arrowheads should be excluded
         if not arrowheads:
@@ -121,13 +125,15 @@ def create_graph(annotation, edges=False, arrowheads=False, mode='layout'):
         return graph
 
 
-def extract_types(elements, annotation):
+def extract_types(elements, annotation, index=None):
     """
     Extracts the types of the identified diagram elements.
 
     Parameters:
         elements: A list of diagram elements.
         annotation: A dictionary of AI2D annotation.
+        index: A dictionary mapping element identifiers to their types, as
+               returned by index_types(). Built from the annotation if None.
 
     Returns:
          A dictionary with element types as keys and identifiers as values.
@@ -136,34 +142,49 @@ def extract_types(elements, annotation):
     assert isinstance(elements, list)
     assert isinstance(annotation, dict)
 
-    # Define the target categories for various diagram elements
-    targets = ['arrowHeads', 'arrows', 'blobs', 'text', 'containers',
-               'imageConsts']
+    # Build the index of element types if not provided
+    if index is None:
 
-    # Create a dictionary for holding element types
-    element_types = {}
+        index = index_types(annotation)
 
-    # Loop over the diagram elements
-    for e in elements:
+    # Look up the type of each element in the index
+    element_types = {e: index[e] for e in elements if e in index}
 
-        try:
-            # Search for matches in the target categories
-            for t in targets:
+    # Return the element type dictionary
+    return element_types
 
-                # Get the identifiers for each element category
-                ids = [i for i in annotation[t].keys()]
 
-                # If the element is found among the identifiers, add the
-                # type to the dictionary
-                if e in ids:
-                    element_types[e] = t
+def index_types(annotation):
+    """
+    Builds an index of diagram element types in a single pass over the AI2D
+    annotation. As in the scan over categories used earlier, the categories
+    are read in the order of element_categories until a category is missing
+    from the annotation, so elements of the later categories are not typed.
 
-        # Skip if the category is not found
-        except KeyError:
-            continue
+    Parameters:
+        annotation: A dictionary of AI2D annotation.
 
-    # Return the element type dictionary
-    return element_types
+    Returns:
+         A dictionary with element identifiers as keys and types as values.
+    """
+    # Create a dictionary for holding the index
+    index = {}
+
+    # Loop over the target categories for various diagram elements
+    for t in element_categories:
+
+        # Stop if the category is not found
+        if t not in annotation:
+
+            break
+
+        # Add the identifiers in the category to the index
+        for i in annotation[t]:
+
+            index[i] = t
+
+    # Return the index
+    return index
 
 
 def get_node_dict(graph, kind=None):
@@ -537,3 +558,6 @@ def update_grouping(diagram, graph):
     graph.add_edges_from(temp_graph.edges(data=True))
 
 
+# Define the target categories for various diagram elements
+element_categories = ['arrowHeads', 'arrows', 'blobs', 'text', 'containers',
+                      'imageConsts']
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+from .canvas import GraphCanvas
+from .diagram import Diagram
+from .draw import *
+
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+
+
+class Prefetcher:
+    """
+    This class holds renders of upcoming diagrams, which are drawn in background
+    threads while the annotator is working on the current diagram.
+    """
+    def __init__(self, depth=2, max_bytes=256 * 1024 ** 2, workers=1):
+        """
+        This function initializes the Prefetcher class.
+
+        Parameters:
+            depth: The maximum number of upcoming diagrams rendered in advance.
+            max_bytes: The maximum number of bytes held by rendered images. No
+                       new diagrams are rendered until the memory is released.
+            workers: The number of background threads.
+
+        Returns:
+            A Prefetcher object.
+        """
+        self.depth = depth
+        self.max_bytes = max_bytes
+
+        # Set up a pool of threads for rendering
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        # Set up a dictionary mapping keys to pending and completed renders
+        self.tasks = OrderedDict()
+
+    def __contains__(self, key):
+
+        return key in self.tasks
+
+    @property
+    def nbytes(self):
+        """
+        Returns the number of bytes held by completed renders.
+        """
+        return sum(task.result()[1]['nbytes'] for task in self.tasks.values()
+                   if task.done() and task.exception() is None)
+
+    def schedule(self, key, diagram, annotation, image_path, review=False):
+        """
+        Starts rendering a diagram in the background, unless the diagram has
+        already been scheduled or the limits for depth or memory have been
+        reached.
+
+        Parameters:
+            key: A key identifying the diagram, e.g. a row index.
+            diagram: A Diagram object or None, if the Diagram object has not
+                     been created yet.
+            annotation: A dictionary containing AI2D annotation.
+            image_path: Path to the diagram image.
+            review: A Boolean defining whether review mode is active.
+
+        Returns:
+            True if the diagram was scheduled, otherwise False.
+        """
+        # Check whether the diagram has been scheduled already
+        if key in self.tasks:
+
+            return False
+
+        # Check the limits for depth and memory
+        if len(self.tasks) >= self.depth or self.nbytes >= self.max_bytes:
+
+            return False
+
+        # Submit the diagram for rendering
+        self.tasks[key] = self.executor.submit(prefetch_diagram, diagram,
+                                               annotation, image_path, review)
+
+        return True
+
+    def pop(self, key):
+        """
+        Retrieves a prefetched diagram, waiting for the render to finish if
+        needed, and removes it from the prefetcher.
+
+        Parameters:
+            key: The key used for scheduling the diagram.
+
+        Returns:
+            A tuple of a Diagram object and a dictionary of renders, or None if
+            the diagram has not been scheduled or could not be rendered.
+        """
+        # Return None if the diagram has not been scheduled
+        if key not in self.tasks:
+
+            return None
+
+        task = self.tasks.pop(key)
+
+        # Return None if rendering failed, which leaves drawing to the Diagram
+        if task.exception() is not None:
+
+            print("[WARNING] Prefetching failed: {}".format(task.exception()))
+
+            return None
+
+        return task.result()
+
+    def shutdown(self):
+        """
+        Stops the background threads without waiting for the render in
+        progress and cancels the renders that have not started yet.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        self.tasks.clear()
+
+
+def prefetch_diagram(diagram, annotation, image_path, review=False):
+    """
+    Prepares a diagram for annotation by creating the Diagram object if needed
+    and rendering the layout segmentation and the graph for the first annotation
+    layer that has not been marked as complete. The graphs of the connectivity
+    and RST layers are rendered with the grouping from the layout layer, which
+    the annotation methods add before drawing the graph.
+
+    Parameters:
+        diagram: A Diagram object or None.
+        annotation: A dictionary containing AI2D annotation.
+        image_path: Path to the diagram image.
+        review: A Boolean defining whether review mode is active, in which case
+                annotation begins from the layout layer.
+
+    Returns:
+        A tuple of the Diagram object and a dictionary of renders, which can be
+        passed to the annotation methods of the Diagram object.
+    """
+    # Create a Diagram object if needed
+    if diagram is None:
+
+        diagram = Diagram(annotation, image_path)
+
+    # Render the layout segmentation using the same parameters as the
+    # annotation methods of the Diagram object.
+    renders = {'segmentation': draw_layout(diagram.image_filename,
+                                           diagram.annotation, 480,
+                                           backend='opencv'),
+               'mode': None, 'key': None, 'graph': None, 'canvas': None}
+
+    # Find the first incomplete annotation layer and its graph
+    for mode, complete, graph in [
+            ('layout', diagram.group_complete, diagram.layout_graph),
+            ('connectivity', diagram.connectivity_complete,
+             diagram.connectivity_graph),
+            ('rst', diagram.rst_complete, diagram.rst_graph)]:
+
+        if not complete or review:
+
+            break
+
+    # Prepare the graphs of the connectivity and RST layers as the annotation
+    # methods do, by creating the graph if needed and adding the grouping from
+    # the layout layer, so that the render matches the graph being annotated.
+    # A copy is prepared, as the diagram has not been opened for annotation.
+    if mode != 'layout':
+
+        # Create an empty graph if the layer has not been annotated yet
+        if graph is None:
+
+            graph = nx.MultiDiGraph() if mode == 'connectivity' \
+                else nx.DiGraph()
+
+        else:
+
+            graph = graph.copy()
+
+        update_grouping(diagram, graph)
+
+    # Draw the graph. The layout is stored in the cache of the Diagram object
+    # and the canvas is kept for redrawing the graph during annotation.
+    renders['mode'] = mode
+    renders['key'] = graph_hash(graph)
+    renders['canvas'] = GraphCanvas(mode=mode, dpi=100, cache=diagram.layouts)
+    renders['graph'] = renders['canvas'].draw(graph)
+
+    # Calculate the memory used by the images
+    renders['nbytes'] = sum(img.nbytes for img in
+                            [renders['segmentation'], renders['graph']]
+                            if img is not None)
+
+    return diagram, renders
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+from .annotate import create_id
+from .batch import map_diagrams
+from .parse import index_types
+from .spatial import box_distances, contains, element_bounds
+
+import numpy as np
+
+
+def propose_groups(annotation, elements, label_distance=1.0):
+    """
+    Proposes groups of diagram elements based on their geometry and the
+    relationships defined in the AI2D annotation. Each element is assigned to
+    at most one parent element:
+
+        - Text is assigned to the blob it labels, as given by an
+          intraObjectLabel relationship, or otherwise to the nearest blob,
+          if the gap between the two is at most label_distance times the
+          height of the text.
+        - Other elements are assigned to the smallest blob or container whose
+          bounding box encloses their own.
+
+    Arrowheads are not included in the layout graph, so the bounding box of
+    each arrow is extended to cover its arrowhead, as given by an arrowHeadTail
+    relationship.
+
+    Parameters:
+        annotation: A dictionary of AI2D annotation.
+        elements: A collection of identifiers of elements that may be grouped,
+                  e.g. the elements in a layout graph that have not been
+                  grouped yet.
+
+    Optional parameters:
+        label_distance: The maximum gap between text and a blob, relative to
+                        the height of the text.
+
+    Returns:
+        A list of (parent, children, rule) tuples ordered from the innermost
+        groups to the outermost, in which rule is either 'label' or
+        'containment'.
+    """
+    bounds = element_bounds(annotation)
+
+    # Extend the bounding boxes of arrows to cover their arrowheads
+    relationships = annotation.get('relationships', {}).values()
+
+    for r in relationships:
+
+        if r.get('category') == 'arrowHeadTail' and r['origin'] in bounds \
+                and r['destination'] in bounds:
+
+            arrow, head = bounds[r['origin']], bounds[r['destination']]
+
+            bounds[r['origin']] = (min(arrow[0], head[0]),
+                                   min(arrow[1], head[1]),
+                                   max(arrow[2], head[2]),
+                                   max(arrow[3], head[3]))
+
+    # Restrict the elements to those that may be grouped and have geometry
+    nodes = [e for e in bounds if e in elements]
+    boxes = np.array([bounds[e] for e in nodes],
+                     dtype=np.float64).reshape(-1, 4)
+    positions = {e: i for i, e in enumerate(nodes)}
+
+    # Get the category of each element
+    index = index_types(annotation)
+    kinds = np.array([index.get(e) for e in nodes], dtype=object)
+
+    # Set up a placeholder for the parent of each element and its rule
+    parents, rules = {}, {}
+
+    # Find the blobs labelled by text in the relationships
+    labels = {r['origin']: r['destination'] for r in relationships
+              if r.get('category') == 'intraObjectLabel'}
+
+    # Measure the gaps between all text and blobs at once
+    text = np.flatnonzero(kinds == 'text')
+    blobs = np.flatnonzero(kinds == 'blobs')
+
+    if len(text) > 0 and len(blobs) > 0:
+
+        gaps = box_distances(boxes[text], boxes[blobs])
+        nearest = gaps.argmin(axis=1)
+
+        # Get the maximum gap for each text, based on its height
+        limits = label_distance * (boxes[text, 3] - boxes[text, 1])
+
+        for i, t in enumerate(text.tolist()):
+
+            # Prefer the blob given in the relationships
+            if labels.get(nodes[t]) in positions and \
+                    kinds[positions[labels[nodes[t]]]] == 'blobs':
+
+                parents[nodes[t]] = labels[nodes[t]]
+
+            elif gaps[i, nearest[i]] <= limits[i]:
+
+                parents[nodes[t]] = nodes[blobs[nearest[i]]]
+
+            else:
+
+                continue
+
+            rules[nodes[t]] = 'label'
+
+    # Find the blobs and containers enclosing each element at once, ignoring
+    # elements enclosing themselves or boxes of the same size
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    enclosing = contains(boxes[None], boxes[:, None]) & \
+        (areas[None] > areas[:, None]) & \
+        np.isin(kinds, ['blobs', 'containers'])[None]
+
+    # Assign the remaining elements to the smallest enclosing element
+    candidates = np.where(enclosing, areas[None], np.inf)
+
+    for i in np.flatnonzero(enclosing.any(axis=1)).tolist():
+
+        if nodes[i] not in parents:
+
+            parents[nodes[i]] = nodes[int(candidates[i].argmin())]
+            rules[nodes[i]] = 'containment'
+
+    # Collect the children of each parent
+    children = {}
+
+    for child, parent in parents.items():
+
+        children.setdefault(parent, []).append(child)
+
+    # Order the groups from the innermost to the outermost. Parents assigned
+    # through containment are always larger than their children, and blobs
+    # labelled by text are never children of the text.
+    order = sorted(children, key=lambda p: areas[positions[p]])
+
+    return [(p, children[p], 'containment' if any(
+        rules[c] == 'containment' for c in children[p]) else 'label')
+            for p in order]
+
+
+def clear_provisional(graph):
+    """
+    Removes the provisional groups from a layout graph.
+
+    Parameters:
+        graph: A NetworkX Graph containing layout annotation. The graph is
+               modified in place.
+
+    Returns:
+        The number of groups removed.
+    """
+    provisional = [n for n, p in graph.nodes(data='provisional') if p]
+
+    graph.remove_nodes_from(provisional)
+
+    return len(provisional)
+
+
+def pregroup_diagram(diagram, label_distance=1.0):
+    """
+    Adds provisional groups proposed by propose_groups() to the layout graph
+    of a Diagram object. Any provisional groups added earlier are replaced.
+    The groups are marked using the node attribute 'provisional', which is
+    removed once the annotator marks the layout annotation as done.
+
+    Parameters:
+        diagram: A Diagram object.
+
+    Optional parameters:
+        label_distance: The maximum gap between text and a blob, relative to
+                        the height of the text.
+
+    Returns:
+        A tuple of the Diagram object and a list of dictionaries describing
+        the groups added, with the keys defined in report_columns.
+    """
+    # Skip diagrams without annotation and those with complete layout
+    if diagram is None or diagram.group_complete:
+
+        return diagram, []
+
+    graph = diagram.layout_graph
+
+    # Replace any earlier provisional groups
+    clear_provisional(graph)
+
+    # Restrict the groups to elements that have not been grouped
+    elements = {n for n, k in graph.nodes(data='kind')
+                if k not in ['group', 'imageConsts'] and graph.degree(n) == 0}
+
+    # Set up a dictionary mapping elements to the groups that represent them
+    units, report = {}, []
+
+    for parent, children, rule in propose_groups(diagram.annotation, elements,
+                                                 label_distance):
+
+        # Create a new grouping node and connect the parent and the children,
+        # or the groups that represent them, to the node
+        group = create_id()
+        members = [units.get(m, m) for m in [parent] + children]
+
+        graph.add_node(group, kind='group', provisional=True)
+
+        for member in members:
+
+            graph.add_edge(member, group)
+
+        units[parent] = group
+
+        report.append({'group': group,
+                       'rule': rule,
+                       'parent': parent,
+                       'members': ' '.join(members)})
+
+    return diagram, report
+
+
+def pregroup_diagrams(diagrams, jobs=None, label_distance=1.0):
+    """
+    Adds provisional groups to the layout graphs of multiple Diagram objects
+    in parallel using a pool of processes.
+
+    Parameters:
+        diagrams: An iterable of (key, Diagram object) tuples, e.g. the index
+                  and the diagram of each row in a pandas DataFrame. The
+                  iterable is consumed as the grouping progresses.
+
+    Optional parameters:
+        jobs: The number of processes to use. By default, the number of CPUs
+              is used. If jobs is 1, the diagrams are grouped in the current
+              process.
+        label_distance: The maximum gap between text and a blob, relative to
+                        the height of the text.
+
+    Returns:
+        Yields tuples of (key, Diagram object, groups) in the order in which
+        the diagrams are grouped.
+    """
+    for key, task in map_diagrams(pregroup_diagram, diagrams, jobs=jobs,
+                                  label_distance=label_distance):
+
+        yield (key,) + task.result()
+
+
+# Define the keys used for describing the groups added
+report_columns = ['group', 'rule', 'parent', 'members']
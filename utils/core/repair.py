@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+from .batch import map_diagrams
+
+
+def index_relations(rst_graph):
+    """
+    Builds an index of the relations in an RST graph and the edges connected to
+    them, which allows repairing the relations without scanning the edges of
+    the graph again for each relation.
+
+    Parameters:
+        rst_graph: A NetworkX DiGraph containing RST annotation.
+
+    Returns:
+        A dictionary mapping the identifiers of relation nodes to dictionaries
+        with the keys 'data' (the attributes of the node), 'out' (a list of
+        (target, kind) tuples for outgoing edges to other relations) and 'in'
+        (a list of (source, kind) tuples for incoming edges), keeping the order
+        of the edges in the graph.
+    """
+    # Map each node to its kind
+    kinds = dict(rst_graph.nodes(data='kind'))
+
+    # Set up a placeholder for the index
+    index = {}
+
+    for node, data in rst_graph.nodes(data=True):
+
+        # Skip nodes that are not relations
+        if kinds[node] != 'relation':
+
+            continue
+
+        index[node] = {'data': data,
+                       'out': [(t, d.get('kind')) for t, d in
+                               rst_graph.succ[node].items()
+                               if kinds.get(t) == 'relation'],
+                       'in': [(s, d.get('kind')) for s, d in
+                              rst_graph.pred[node].items()]}
+
+    return index
+
+
+def repair_relations(rst_graph):
+    """
+    Repairs references to relations in the attributes 'nucleus', 'satellites'
+    and 'nuclei' of relation nodes. References to relations may have been
+    stored using the identifiers shown to the annotator, e.g. R1, instead of
+    the identifiers of the relation nodes. These references are replaced with
+    the identifiers of the relations connected to the relation using edges of
+    the corresponding kind.
+
+    Parameters:
+        rst_graph: A NetworkX DiGraph containing RST annotation. The graph is
+                   modified in place.
+
+    Returns:
+        A list of dictionaries describing the replacements, with the keys
+        defined in report_columns.
+    """
+    # Index the relations and their edges
+    index = index_relations(rst_graph)
+
+    # Set up a dictionary to hold the identifiers that need to be replaced and
+    # a list for describing the replacements
+    replacements, report = {}, []
+
+    for rel_id, relation in index.items():
+
+        # Loop over the attributes that may refer to other relations
+        for attribute, direction, edge_kind in relation_attributes:
+
+            # Skip attributes not defined for the relation
+            if attribute not in relation['data']:
+
+                continue
+
+            # Split the attribute into identifiers
+            members = relation['data'][attribute].split()
+
+            # Restrict the result to references to relations, which are shorter
+            # than the identifiers of relation nodes
+            references = [m for m in members if m[0] == 'R' and
+                          len(m) != relation_id_length]
+
+            # Pair the references with the edges between the relations
+            for r, (node, kind) in zip(references, relation[direction]):
+
+                # Check that the edge connects two relations and is of the
+                # correct kind, and that the replacement has not been recorded
+                if node not in index or kind != edge_kind or r in replacements:
+
+                    continue
+
+                replacements[r] = node
+
+                # Describe the replacement, using the direction of the edge
+                source, target = (rel_id, node) if direction == 'out' \
+                    else (node, rel_id)
+
+                report.append({'relation': rel_id,
+                               'rel_name': relation['data'].get('rel_name'),
+                               'attribute': attribute,
+                               'old': r,
+                               'new': node,
+                               'edge': kind,
+                               'source': source,
+                               'target': target})
+
+            # Replace the identifiers and update the node attributes
+            rst_graph.nodes[rel_id][attribute] = ' '.join(
+                replacements.get(m, m) for m in members)
+
+    return report
+
+
+def repair_diagram(diagram):
+    """
+    Repairs the references to relations in the RST graph of a Diagram object.
+
+    Parameters:
+        diagram: A Diagram object.
+
+    Returns:
+        A tuple of the repaired Diagram object and a list of replacements
+        returned by repair_relations().
+    """
+    # Skip diagrams without RST annotation
+    if diagram is None or diagram.rst_graph is None:
+
+        return diagram, []
+
+    return diagram, repair_relations(diagram.rst_graph)
+
+
+def repair_diagrams(diagrams, jobs=None):
+    """
+    Repairs the references to relations in multiple Diagram objects in
+    parallel using a pool of processes.
+
+    Parameters:
+        diagrams: An iterable of (key, Diagram object) tuples, e.g. the index
+                  and the diagram of each row in a pandas DataFrame. The
+                  iterable is consumed as the repair progresses.
+
+    Optional parameters:
+        jobs: The number of processes to use. By default, the number of CPUs
+              is used. If jobs is 1, the diagrams are repaired in the current
+              process.
+
+    Returns:
+        Yields tuples of (key, Diagram object, replacements) in the order in
+        which the diagrams are repaired.
+    """
+    for key, task in map_diagrams(repair_diagram, diagrams, jobs=jobs):
+
+        yield (key,) + task.result()
+
+
+# Define the attributes of relation nodes that may refer to other relations,
+# the direction of the edges connecting the relations and the kind of edges
+relation_attributes = [('nucleus', 'out', 'nucleus'),
+                       ('satellites', 'in', 'satellite'),
+                       ('nuclei', 'out', 'nucleus')]
+
+# Define the length of the identifiers of relation nodes created by create_id()
+relation_id_length = 6
+
+# Define the keys used for describing replacements
+report_columns = ['relation', 'rel_name', 'attribute', 'old', 'new', 'edge',
+                  'source', 'target']
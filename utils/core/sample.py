@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+
+class Reservoir:
+    """
+    This class holds a fixed-size random sample of the items it has been given,
+    which is maintained using reservoir sampling. Each item seen has the same
+    probability of being included in the sample.
+    """
+    def __init__(self, size, rng):
+        """
+        This function initializes the Reservoir class.
+
+        Parameters:
+            size: The maximum number of items in the sample.
+            rng: A NumPy random number generator.
+
+        Returns:
+            A Reservoir object.
+        """
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+
+    def add(self, item):
+        """
+        Offers an item to the sample.
+
+        Parameters:
+            item: Any Python object.
+
+        Returns:
+            None
+        """
+        self.seen += 1
+
+        # Fill the reservoir first
+        if len(self.items) < self.size:
+
+            self.items.append(item)
+
+            return
+
+        # Then replace a random item with decreasing probability
+        position = self.rng.integers(self.seen)
+
+        if position < self.size:
+
+            self.items[position] = item
+
+
+def get_children(graph):
+    """
+    Maps the groups in a layout graph to the elements they contain. The graph
+    is traversed from the image constant, which is the root of the hierarchy.
+
+    Parameters:
+        graph: A NetworkX Graph containing layout annotation.
+
+    Returns:
+        A dictionary mapping the identifiers of groups to lists of elements
+        (not groups) that the group contains, including the elements of any
+        nested groups.
+    """
+    # Find the root of the hierarchy
+    roots = [n for n, k in graph.nodes(data='kind') if k == 'imageConsts']
+
+    # Return an empty dictionary if the hierarchy has no root
+    if not roots:
+
+        return {}
+
+    # Get the parent of each node in a breadth-first traversal from the root
+    parents = dict(nx.bfs_predecessors(graph, roots[0]))
+
+    # Set up a placeholder for the elements in each group
+    children = {n: [] for n, k in graph.nodes(data='kind') if k == 'group'}
+
+    # Loop over the nodes starting from the leaves, adding the elements of each
+    # node to its parent. The elements of nested groups are added to the
+    # parent group once the nested group has been completed.
+    for node in reversed([roots[0]] + list(parents)):
+
+        parent = parents.get(node)
+
+        # Skip nodes whose parent is not a group
+        if parent not in children:
+
+            continue
+
+        if node in children:
+
+            children[parent].extend(children[node])
+
+        else:
+
+            children[parent].append(node)
+
+    # Leave out groups that could not be reached from the root
+    return {k: v for k, v in children.items() if v}
+
+
+def extract_items(image_name, diagram, task):
+    """
+    Extracts the items that can be sampled for measuring agreement from a
+    Diagram object.
+
+    Parameters:
+        image_name: The filename of the diagram image, e.g. 1132.png.
+        diagram: A Diagram object.
+        task: The agreement task, either 'rst', 'connectivity', 'grouping' or
+              'macro'.
+
+    Returns:
+        A list of dictionaries with the columns expected by the corresponding
+        evaluate_agreement_*.py script and the original label in the key
+        'original', which is None for groups.
+    """
+    # Set up a placeholder for the items
+    items = []
+
+    # Extract RST relations
+    if task == 'rst' and diagram.rst_complete:
+
+        for node, data in diagram.rst_graph.nodes(data=True):
+
+            if data.get('kind') == 'relation':
+
+                items.append({'image_name': image_name, 'id': node,
+                              'original': data.get('rel_name')})
+
+    # Extract connections, leaving out edges added for grouping
+    if task == 'connectivity' and diagram.connectivity_complete:
+
+        for source, target, kind in diagram.connectivity_graph.edges(
+                data='kind'):
+
+            if kind != 'grouping':
+
+                items.append({'image_name': image_name, 'source': source,
+                              'target': target, 'original': kind})
+
+    # Extract groups and the elements that they contain
+    if task == 'grouping' and diagram.group_complete:
+
+        for group, elements in get_children(diagram.layout_graph).items():
+
+            items.append({'image_name': image_name, 'id': group,
+                          'elements': elements, 'original': None})
+
+    # Extract nodes assigned to a macro-group
+    if task == 'macro' and diagram.group_complete:
+
+        for node, data in diagram.layout_graph.nodes(data=True):
+
+            if 'macro_group' in data:
+
+                items.append({'image_name': image_name, 'id': node,
+                              'node_type': data.get('kind'),
+                              'original': data['macro_group']})
+
+    return items
+
+
+def stratified_sample(rows, task, size, stratify='label', categories=None,
+                      seed=None):
+    """
+    Draws a sample of items for measuring agreement, stratified by the original
+    label of the items or the category of the diagrams. The rows are read in a
+    single pass, keeping only the sampled items in memory.
+
+    Parameters:
+        rows: An iterable of rows as dictionaries with the keys 'image_name' and
+              'diagram', e.g. the output of iter_annotation().
+        task: The agreement task, either 'rst', 'connectivity', 'grouping' or
+              'macro'.
+        size: The number of items sampled from each stratum.
+
+    Optional parameters:
+        stratify: Either 'label' for stratifying by the original label or
+                  'category' for stratifying by the category of the diagram.
+        categories: A dictionary mapping image names to the categories of the
+                    diagrams. Required for stratifying by category.
+        seed: A seed for the random number generator.
+
+    Returns:
+        A pandas DataFrame with a row for each sampled item, in random order,
+        and the stratum of each item in the column 'stratum'.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Set up a reservoir for each stratum
+    reservoirs = {}
+
+    for row in rows:
+
+        diagram = row.get('diagram')
+
+        # Skip diagrams without annotation and those marked for deletion
+        if diagram is None or any('deletion' in c for c in diagram.comments):
+
+            continue
+
+        for item in extract_items(row['image_name'], diagram, task):
+
+            # Get the stratum of the item
+            stratum = item['original'] if stratify == 'label' else \
+                categories.get(row['image_name'])
+
+            if stratum not in reservoirs:
+
+                reservoirs[stratum] = Reservoir(size, rng)
+
+            reservoirs[stratum].add(dict(item, stratum=stratum))
+
+    # Collect the samples, visiting the strata in a fixed order to keep the
+    # result reproducible
+    items = [item for stratum in sorted(reservoirs, key=str)
+             for item in reservoirs[stratum].items]
+
+    # Shuffle the items so that the strata are not presented in blocks
+    sample = pd.DataFrame([items[i] for i in rng.permutation(len(items))])
+
+    return sample.reset_index(drop=True)
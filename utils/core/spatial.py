@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+from .parse import element_categories
+
+import numpy as np
+
+
+class SpatialIndex:
+    """
+    This class holds a spatial index over the bounding boxes of diagram
+    elements. The boxes are assigned to the cells of a uniform grid, so that
+    queries only examine the boxes in the cells covered by the query, which are
+    then tested together using NumPy.
+    """
+    def __init__(self, bounds, cell_size=None):
+        """
+        This function initializes the SpatialIndex class.
+
+        Parameters:
+            bounds: A dictionary mapping the identifiers of elements to tuples
+                    of (x_min, y_min, x_max, y_max), e.g. the output of
+                    element_bounds() or of node_bounds() in core/tensors.py.
+
+        Optional parameters:
+            cell_size: The width and height of the grid cells in pixels. By
+                       default, the median size of the boxes is used.
+
+        Returns:
+            A SpatialIndex object.
+        """
+        # Store the identifiers of the elements and their positions
+        self.elements = list(bounds)
+        self.positions = {e: i for i, e in enumerate(self.elements)}
+
+        # Store the boxes in a single array
+        self.boxes = np.array([bounds[e] for e in self.elements],
+                              dtype=np.float64).reshape(-1, 4)
+
+        # Set the size of the grid cells, which must be at least one pixel
+        if cell_size is None:
+
+            sizes = np.maximum(self.boxes[:, 2] - self.boxes[:, 0],
+                               self.boxes[:, 3] - self.boxes[:, 1])
+
+            cell_size = np.median(sizes) if len(sizes) > 0 else 1
+
+        self.cell_size = max(float(cell_size), 1.0)
+
+        # Get the range of cells covered by each box
+        cells = np.floor(self.boxes / self.cell_size).astype(np.int64)
+
+        # Assign the boxes to the cells they cover
+        grid = {}
+
+        for i, (x_min, y_min, x_max, y_max) in enumerate(cells.tolist()):
+
+            for x in range(x_min, x_max + 1):
+
+                for y in range(y_min, y_max + 1):
+
+                    grid.setdefault((x, y), []).append(i)
+
+        self.grid = {k: np.array(v, dtype=np.int64) for k, v in grid.items()}
+
+        # Store the extent of the grid for clipping queries
+        self.extent = np.concatenate([cells[:, :2].min(axis=0),
+                                      cells[:, 2:].max(axis=0)]) \
+            if len(cells) > 0 else None
+
+    def __contains__(self, element):
+
+        return element in self.positions
+
+    def __len__(self):
+
+        return len(self.elements)
+
+    def box(self, query):
+        """
+        Gets the bounding box of a query.
+
+        Parameters:
+            query: The identifier of an element in the index or a tuple of
+                   (x_min, y_min, x_max, y_max).
+
+        Returns:
+            A NumPy array with the bounding box.
+        """
+        if type(query) == str:
+
+            return self.boxes[self.positions[query]]
+
+        return np.asarray(query, dtype=np.float64)
+
+    def candidates(self, box):
+        """
+        Gets the boxes in the grid cells covered by a bounding box.
+
+        Parameters:
+            box: A tuple or an array of (x_min, y_min, x_max, y_max).
+
+        Returns:
+            A sorted NumPy array with the positions of the boxes.
+        """
+        # Return an empty array if the index is empty
+        if self.extent is None:
+
+            return np.empty(0, dtype=np.int64)
+
+        # Get the range of cells covered by the box, clipped to the grid
+        x_min, y_min = np.maximum(np.floor(box[:2] / self.cell_size),
+                                  self.extent[:2]).astype(np.int64)
+        x_max, y_max = np.minimum(np.floor(box[2:] / self.cell_size),
+                                  self.extent[2:]).astype(np.int64)
+
+        found = [self.grid[(x, y)] for x in range(x_min, x_max + 1)
+                 for y in range(y_min, y_max + 1) if (x, y) in self.grid]
+
+        return np.unique(np.concatenate(found)) if found else \
+            np.empty(0, dtype=np.int64)
+
+    def overlapping(self, query, among=None):
+        """
+        Finds the elements whose bounding boxes overlap with a query.
+
+        Parameters:
+            query: The identifier of an element in the index or a tuple of
+                   (x_min, y_min, x_max, y_max).
+
+        Optional parameters:
+            among: A collection of identifiers to which the results are
+                   restricted.
+
+        Returns:
+            A list of identifiers.
+        """
+        box = self.box(query)
+        positions = self.candidates(box)
+        boxes = self.boxes[positions]
+
+        hits = (boxes[:, 0] <= box[2]) & (boxes[:, 2] >= box[0]) & \
+               (boxes[:, 1] <= box[3]) & (boxes[:, 3] >= box[1])
+
+        return self.select(positions[hits], query, among)
+
+    def contained(self, query, among=None):
+        """
+        Finds the elements whose bounding boxes lie inside a query.
+
+        Parameters:
+            query: The identifier of an element in the index or a tuple of
+                   (x_min, y_min, x_max, y_max).
+
+        Optional parameters:
+            among: A collection of identifiers to which the results are
+                   restricted.
+
+        Returns:
+            A list of identifiers.
+        """
+        box = self.box(query)
+        positions = self.candidates(box)
+
+        hits = contains(box, self.boxes[positions])
+
+        return self.select(positions[hits], query, among)
+
+    def containing(self, query, among=None):
+        """
+        Finds the elements whose bounding boxes enclose a query.
+
+        Parameters:
+            query: The identifier of an element in the index or a tuple of
+                   (x_min, y_min, x_max, y_max).
+
+        Optional parameters:
+            among: A collection of identifiers to which the results are
+                   restricted.
+
+        Returns:
+            A list of identifiers.
+        """
+        box = self.box(query)
+        positions = self.candidates(box)
+
+        hits = contains(self.boxes[positions], box)
+
+        return self.select(positions[hits], query, among)
+
+    def nearest(self, query, k=1, among=None):
+        """
+        Finds the k elements nearest to a query. The distance between two
+        bounding boxes is the length of the gap between them, which is zero
+        for overlapping boxes. Ties are broken by the distance between the
+        centres of the boxes.
+
+        Parameters:
+            query: The identifier of an element in the index or a tuple of
+                   (x_min, y_min, x_max, y_max).
+
+        Optional parameters:
+            k: The number of elements to return.
+            among: A collection of identifiers to which the results are
+                   restricted.
+
+        Returns:
+            A list of identifiers ordered by distance.
+        """
+        box = self.box(query)
+
+        # Measure the distances to all boxes at once
+        gaps = box_distances(box[None], self.boxes)[0]
+        centres = centre_distances(box[None], self.boxes)[0]
+
+        # Sort the boxes by distance
+        order = np.lexsort((centres, gaps))
+
+        return self.select(order, query, among)[:k]
+
+    def select(self, positions, query, among=None):
+        """
+        Converts the positions of boxes into identifiers, leaving out the
+        query itself and any elements not requested.
+
+        Parameters:
+            positions: An array with the positions of boxes.
+            query: The query, which is left out if it is an element.
+
+        Optional parameters:
+            among: A collection of identifiers to which the results are
+                   restricted.
+
+        Returns:
+            A list of identifiers.
+        """
+        # Only elements, not boxes, are left out of the results
+        query = query if type(query) == str else None
+
+        return [self.elements[i] for i in positions.tolist()
+                if self.elements[i] != query
+                and (among is None or self.elements[i] in among)]
+
+
+def element_bounds(annotation, geometry=None):
+    """
+    Gets the bounding boxes of diagram elements from the AI2D annotation.
+
+    Parameters:
+        annotation: A dictionary of AI2D annotation.
+
+    Optional parameters:
+        geometry: The geometry of the diagram elements from a GeometryStore,
+                  which is used instead of the coordinates in the annotation.
+
+    Returns:
+        A dictionary mapping the identifiers of elements to tuples of (x_min,
+        y_min, x_max, y_max) in pixels.
+    """
+    # Use the geometry of the elements if available
+    if geometry is not None:
+
+        return {e: tuple(geometry[e].min(axis=0).tolist() +
+                         geometry[e].max(axis=0).tolist())
+                for e in geometry if len(geometry[e]) > 0}
+
+    bounds = {}
+
+    for category in element_categories:
+
+        for element, attributes in annotation.get(category, {}).items():
+
+            # Elements are outlined using either polygons or rectangles
+            points = attributes.get('polygon', attributes.get('rectangle'))
+
+            if not points:
+
+                continue
+
+            points = np.asarray(points, dtype=np.float32)
+
+            bounds[element] = tuple(points.min(axis=0)[:2].tolist() +
+                                    points.max(axis=0)[:2].tolist())
+
+    return bounds
+
+
+def index_elements(annotation, geometry=None, elements=None):
+    """
+    Builds a spatial index over the elements in the AI2D annotation.
+
+    Parameters:
+        annotation: A dictionary of AI2D annotation.
+
+    Optional parameters:
+        geometry: The geometry of the diagram elements from a GeometryStore,
+                  which is used instead of the coordinates in the annotation.
+        elements: A collection of identifiers to include in the index, e.g. the
+                  nodes of a layout graph. By default, all elements with a
+                  polygon or a rectangle are included.
+
+    Returns:
+        A SpatialIndex object.
+    """
+    bounds = element_bounds(annotation, geometry=geometry)
+
+    if elements is not None:
+
+        bounds = {e: b for e, b in bounds.items() if e in elements}
+
+    return SpatialIndex(bounds)
+
+
+def contains(outer, inner):
+    """
+    Checks whether bounding boxes enclose other bounding boxes. The arrays are
+    broadcast against each other.
+
+    Parameters:
+        outer: An array of shape (..., 4) with the enclosing boxes.
+        inner: An array of shape (..., 4) with the enclosed boxes.
+
+    Returns:
+        A Boolean array.
+    """
+    outer, inner = np.asarray(outer), np.asarray(inner)
+
+    return (outer[..., 0] <= inner[..., 0]) & \
+           (outer[..., 1] <= inner[..., 1]) & \
+           (outer[..., 2] >= inner[..., 2]) & \
+           (outer[..., 3] >= inner[..., 3])
+
+
+def box_distances(a, b):
+    """
+    Measures the gaps between two sets of bounding boxes.
+
+    Parameters:
+        a: An array of shape (n, 4) with boxes of (x_min, y_min, x_max, y_max).
+        b: An array of shape (m, 4) with boxes of (x_min, y_min, x_max, y_max).
+
+    Returns:
+        An array of shape (n, m) with the distances between the boxes, which
+        are zero for overlapping boxes.
+    """
+    a, b = np.asarray(a)[:, None], np.asarray(b)[None]
+
+    # Get the horizontal and vertical gaps between the boxes
+    dx = np.maximum(0, np.maximum(a[..., 0] - b[..., 2], b[..., 0] - a[..., 2]))
+    dy = np.maximum(0, np.maximum(a[..., 1] - b[..., 3], b[..., 1] - a[..., 3]))
+
+    return np.hypot(dx, dy)
+
+
+def centre_distances(a, b):
+    """
+    Measures the distances between the centres of two sets of bounding boxes.
+
+    Parameters:
+        a: An array of shape (n, 4) with boxes of (x_min, y_min, x_max, y_max).
+        b: An array of shape (m, 4) with boxes of (x_min, y_min, x_max, y_max).
+
+    Returns:
+        An array of shape (n, m) with the distances between the centres.
+    """
+    a, b = np.asarray(a), np.asarray(b)
+
+    # Get the centres of the boxes
+    ca = (a[:, :2] + a[:, 2:]) / 2
+    cb = (b[:, :2] + b[:, 2:]) / 2
+
+    return np.hypot(*np.moveaxis(ca[:, None] - cb[None], -1, 0))
+
+
+def suggest_groups(index, element, k=3, among=None):
+    """
+    Suggests candidates for grouping with a diagram element, based on the
+    spatial relations between the element and other elements.
+
+    Parameters:
+        index: A SpatialIndex object.
+        element: The identifier of an element in the index.
+
+    Optional parameters:
+        k: The number of nearest elements to suggest.
+        among: A collection of identifiers to which the candidates are
+               restricted.
+
+    Returns:
+        A dictionary mapping the spatial relations 'contains', 'inside',
+        'overlaps' and 'near' to lists of identifiers. Each candidate is
+        listed only under the first relation that holds.
+    """
+    suggestions = {'contains': index.contained(element, among=among),
+                   'inside': index.containing(element, among=among),
+                   'overlaps': index.overlapping(element, among=among)}
+
+    # Only list each candidate once
+    seen = set()
+
+    for relation, candidates in suggestions.items():
+
+        suggestions[relation] = [c for c in candidates if c not in seen]
+        seen.update(candidates)
+
+    # Add the nearest elements that have not been listed yet
+    suggestions['near'] = [c for c in index.nearest(element, k=len(index),
+                                                    among=among)
+                           if c not in seen][:k]
+
+    return suggestions
+
+
+def format_suggestions(element, suggestions):
+    """
+    Formats the suggestions for grouping a diagram element for printing.
+
+    Parameters:
+        element: The identifier of the element.
+        suggestions: A dictionary returned by suggest_groups().
+
+    Returns:
+        A string describing the suggestions.
+    """
+    # Describe each spatial relation that holds
+    parts = ["{} {}".format(relation, ', '.join(candidates))
+             for relation, candidates in suggestions.items() if candidates]
+
+    return "{}: {}".format(element, '; '.join(parts) if parts
+                           else 'no candidates')
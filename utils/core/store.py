@@ -0,0 +1,683 @@
+# -*- coding: utf-8 -*-
+
+from .cache import LRUCache
+from .database import AnnotationDatabase, is_database
+
+import os
+import pandas as pd
+import pickle
+import struct
+import zlib
+
+
+# Define the layout of the header preceding each record: the length of the key,
+# the length of the payload and a CRC32 checksum of the payload.
+record_header = struct.Struct('<III')
+
+# Define a signature that identifies files containing AI2D-RST annotation stored
+# as keyed records, one record for each row of a pandas DataFrame.
+record_signature = b'AI2D-RST records\n'
+
+# Define the attributes of Diagram objects stored in the index of a record file,
+# which allow checking the status of annotation without loading the diagrams.
+status_attributes = ['complete', 'group_complete', 'connectivity_complete',
+                     'rst_complete', 'comments']
+
+
+def write_record(file, key, obj):
+    """
+    Writes a single keyed record into an open binary file.
+
+    Parameters:
+        file: A file object opened in binary mode for writing.
+        key: A string identifying the record, e.g. the name of a diagram image.
+        obj: A picklable Python object.
+
+    Returns:
+        The number of bytes written.
+    """
+    # Encode the key and serialize the object
+    key = key.encode('utf-8')
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # Pack the header and write the record
+    header = record_header.pack(len(key), len(payload), zlib.crc32(payload))
+    file.write(header + key + payload)
+
+    return len(header) + len(key) + len(payload)
+
+
+def iter_records(file, load=True):
+    """
+    Iterates over the keyed records stored in an open binary file. Iteration
+    stops at the first incomplete or corrupted record, which may result from
+    an interrupted write.
+
+    Parameters:
+        file: A file object opened in binary mode for reading.
+        load: A Boolean defining whether the records should be unpickled. If
+              False, the payload is skipped without reading it.
+
+    Returns:
+        Yields tuples of (key, object, offset, length), where offset and length
+        refer to the position of the entire record in the file. If load is
+        False, the object is None.
+    """
+    while True:
+
+        # Get the position of the current record
+        offset = file.tell()
+
+        # Read the header and stop if the file ends
+        header = file.read(record_header.size)
+
+        if len(header) < record_header.size:
+
+            return
+
+        # Unpack the header
+        key_len, payload_len, checksum = record_header.unpack(header)
+
+        # Read the key
+        key = file.read(key_len)
+
+        if len(key) < key_len:
+
+            return
+
+        # Calculate the length of the entire record
+        length = record_header.size + key_len + payload_len
+
+        # If the payload is not needed, skip over it
+        if not load:
+
+            file.seek(payload_len, os.SEEK_CUR)
+
+            # Check that the payload has actually been written
+            if file.tell() > os.fstat(file.fileno()).st_size:
+
+                return
+
+            yield key.decode('utf-8'), None, offset, length
+
+            continue
+
+        # Read the payload and verify its checksum
+        payload = file.read(payload_len)
+
+        if len(payload) < payload_len or zlib.crc32(payload) != checksum:
+
+            return
+
+        yield key.decode('utf-8'), pickle.loads(payload), offset, length
+
+
+def read_record(file, offset):
+    """
+    Reads a single keyed record from an open binary file.
+
+    Parameters:
+        file: A file object opened in binary mode for reading.
+        offset: The position of the record in the file.
+
+    Returns:
+        A tuple of (key, object).
+    """
+    # Move to the beginning of the record and read the header
+    file.seek(offset)
+
+    key_len, payload_len, checksum = record_header.unpack(
+        file.read(record_header.size))
+
+    # Read the key and the payload
+    key = file.read(key_len).decode('utf-8')
+    payload = file.read(payload_len)
+
+    # Verify the checksum
+    if zlib.crc32(payload) != checksum:
+
+        raise IOError("Record {} at offset {} in {} is corrupted.".format(
+            key, offset, file.name))
+
+    return key, pickle.loads(payload)
+
+
+def is_record_file(path):
+    """
+    Checks whether a file contains AI2D-RST annotation stored as keyed records.
+
+    Parameters:
+        path: Path to the file.
+
+    Returns:
+        True or False.
+    """
+    # Directories and missing files cannot be record files
+    if not os.path.isfile(path):
+
+        return False
+
+    # Compare the beginning of the file with the signature
+    with open(path, 'rb') as file:
+
+        return file.read(len(record_signature)) == record_signature
+
+
+def get_status(diagram):
+    """
+    Collects the attributes describing the status of annotation from a Diagram
+    object.
+
+    Parameters:
+        diagram: A Diagram object or None.
+
+    Returns:
+        A dictionary with the attributes defined in status_attributes as keys.
+        Attributes missing from the Diagram object are omitted. If the diagram
+        is None, None is returned.
+    """
+    # Return None if the Diagram object does not exist
+    if diagram is None:
+
+        return None
+
+    return {a: getattr(diagram, a) for a in status_attributes
+            if hasattr(diagram, a)}
+
+
+def write_records(annotation_df, path):
+    """
+    Writes a pandas DataFrame containing AI2D-RST annotation into a file of
+    keyed records, which allows reading individual diagrams without loading
+    the entire DataFrame. An index of the records is written into the file
+    <path>.index.
+
+    Parameters:
+        annotation_df: A pandas DataFrame with the column 'image_name', or an
+                       iterable of rows as dictionaries, which are written one
+                       at a time.
+        path: Path to the output file.
+
+    Returns:
+        The number of records written.
+    """
+    # Set up dictionaries for the offsets of records and the status of diagrams
+    offsets, status = {}, {}
+
+    # Get the rows of the DataFrame
+    rows = annotation_df.to_dict('records') \
+        if isinstance(annotation_df, pd.DataFrame) else annotation_df
+
+    with open(path, 'wb') as file:
+
+        # Write the signature
+        file.write(record_signature)
+
+        # Write each row as a dictionary keyed by the image name
+        for row in rows:
+
+            offsets[row['image_name']] = file.tell()
+            status[row['image_name']] = get_status(row.get('diagram'))
+
+            write_record(file, row['image_name'], row)
+
+    # Write the index
+    write_index(path, offsets, status)
+
+    return len(offsets)
+
+
+def write_index(path, offsets, status):
+    """
+    Writes an index for a record file into the file <path>.index.
+
+    Parameters:
+        path: Path to the record file.
+        offsets: A dictionary mapping keys to the offsets of their records.
+        status: A dictionary mapping keys to the output of get_status().
+
+    Returns:
+        None
+    """
+    # Store the size of the record file, which is used to detect whether the
+    # record file has changed after writing the index.
+    index = {'size': os.path.getsize(path), 'offsets': offsets,
+             'status': status}
+
+    with open(path + '.index', 'wb') as file:
+
+        pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def index_records(path):
+    """
+    Builds an index of the records in a record file. The index is read from
+    the file <path>.index if it is up to date. Otherwise the index is built by
+    reading the headers and keys of the records only.
+
+    Parameters:
+        path: Path to the record file.
+
+    Returns:
+        A tuple of two dictionaries, which map keys to the offsets of their
+        records and to the status of diagrams. If a key occurs several times,
+        the last record is used. The latter dictionary is empty if the index
+        is built from the headers.
+    """
+    # Check if the index exists and matches the record file
+    if os.path.isfile(path + '.index'):
+
+        with open(path + '.index', 'rb') as file:
+
+            index = pickle.load(file)
+
+        if index['size'] == os.path.getsize(path):
+
+            return index['offsets'], index['status']
+
+        # Print status
+        print("[WARNING] The index {} is out of date, rebuilding the index."
+              .format(path + '.index'))
+
+    # Set up a dictionary for the offsets
+    offsets = {}
+
+    with open(path, 'rb') as file:
+
+        # Skip the signature
+        file.seek(len(record_signature))
+
+        # Loop over the records without unpickling them
+        for key, _, offset, _ in iter_records(file, load=False):
+
+            offsets[key] = offset
+
+    return offsets, {}
+
+
+class AnnotationIndex:
+    """
+    This class provides access to the rows of AI2D-RST annotation by the name
+    of the diagram image, e.g. 1132.png.
+
+    If the annotation is stored in a pandas DataFrame, the entire DataFrame is
+    loaded at once. If the annotation is stored in a record file created using
+    write_records() or in an SQLite database, the rows are loaded lazily, that
+    is, only when requested, and only the most recently used rows are kept in
+    memory.
+    """
+    def __init__(self, path, maxsize=32):
+        """
+        This function initializes the AnnotationIndex class.
+
+        Parameters:
+            path: Path to a pandas DataFrame, a record file or an SQLite
+                  database containing AI2D-RST annotation.
+
+        Optional parameters:
+            maxsize: The maximum number of rows kept in memory when reading a
+                     record file or a database.
+
+        Returns:
+            An AnnotationIndex object.
+        """
+        self.path = path
+
+        # Check whether to load the rows lazily
+        self.database = AnnotationDatabase(path) if is_database(path) else None
+        self.lazy = self.database is not None or is_record_file(path)
+
+        # Read the status of diagrams from the database, which is used in place
+        # of the offsets of records to keep the order of the diagrams
+        if self.database is not None:
+
+            self.statuses = self.database.statuses()
+            self.offsets = dict.fromkeys(self.statuses)
+            self.rows = LRUCache(maxsize=maxsize)
+
+        # Read the offsets of the records and the status of diagrams, and set
+        # up a cache for rows that have been loaded.
+        elif self.lazy:
+
+            self.offsets, self.statuses = index_records(path)
+            self.rows = LRUCache(maxsize=maxsize)
+
+        # Otherwise load the DataFrame and store the rows by image name
+        else:
+
+            annotation_df = read_annotation(path)
+
+            self.rows, self.statuses = {}, {}
+
+            for row in annotation_df.to_dict('records'):
+
+                self.rows[row['image_name']] = row
+
+            self.offsets = dict.fromkeys(self.rows)
+
+    def __contains__(self, image_name):
+
+        return image_name in self.offsets
+
+    def __getitem__(self, image_name):
+        """
+        Retrieves the row for a diagram.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Returns:
+            A dictionary containing the row, e.g. the keys 'annotation' and
+            'diagram'.
+        """
+        # Raise an error for unknown diagrams
+        if image_name not in self.offsets:
+
+            raise KeyError(image_name)
+
+        # Return the row directly if the entire DataFrame has been loaded
+        if not self.lazy:
+
+            return self.rows[image_name]
+
+        # Check if the row has been loaded recently
+        row = self.rows.get(image_name)
+
+        # Otherwise load the row from the database
+        if row is None and self.database is not None:
+
+            row = self.database[image_name]
+
+            self.rows.put(image_name, row)
+
+        # Or from the record file
+        if row is None:
+
+            with open(self.path, 'rb') as file:
+
+                _, row = read_record(file, self.offsets[image_name])
+
+            self.rows.put(image_name, row)
+
+        return row
+
+    def __iter__(self):
+
+        return iter(self.offsets)
+
+    def status(self, image_name):
+        """
+        Retrieves the status of annotation for a diagram, using the index of
+        the record file if possible.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+
+        Returns:
+            A dictionary returned by get_status() or None if the diagram has
+            no Diagram object.
+        """
+        # Collect the status from the Diagram object if not available
+        if image_name not in self.statuses:
+
+            return get_status(self[image_name].get('diagram'))
+
+        return self.statuses[image_name]
+
+    def __len__(self):
+
+        return len(self.offsets)
+
+
+class Journal:
+    """
+    This class holds an append-only journal of Diagram objects, which is stored
+    next to a pandas DataFrame containing AI2D-RST annotation. Saving a diagram
+    appends a single record to the journal instead of rewriting the DataFrame.
+    """
+    def __init__(self, snapshot_path):
+        """
+        This function initializes the Journal class.
+
+        Parameters:
+            snapshot_path: Path to the pandas DataFrame (the snapshot) whose
+                           changes are recorded in the journal.
+
+        Returns:
+            A Journal object stored in the file <snapshot_path>.journal.
+        """
+        # Set the paths to the snapshot and the journal
+        self.snapshot_path = snapshot_path
+        self.path = snapshot_path + '.journal'
+
+    def __len__(self):
+        """
+        Returns the number of complete records in the journal.
+        """
+        # Return zero if the journal does not exist
+        if not os.path.isfile(self.path):
+
+            return 0
+
+        with open(self.path, 'rb') as journal_file:
+
+            return sum(1 for _ in iter_records(journal_file, load=False))
+
+    def append(self, image_name, diagram):
+        """
+        Appends a Diagram object to the journal.
+
+        Parameters:
+            image_name: The filename of the diagram image, e.g. 1132.png.
+            diagram: A Diagram object.
+
+        Returns:
+            True, as in the append() function of an AnnotationDatabase object.
+        """
+        with open(self.path, 'ab') as journal_file:
+
+            # Write the record and make sure it reaches the disk
+            write_record(journal_file, image_name, diagram)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        return True
+
+    def replay(self, annotation_df):
+        """
+        Replays the journal on top of a DataFrame, replacing the Diagram objects
+        in the column 'diagram' with those stored in the journal.
+
+        Parameters:
+            annotation_df: A pandas DataFrame with the columns 'image_name' and
+                           'diagram'.
+
+        Returns:
+            The number of records replayed.
+        """
+        # Return immediately if the journal does not exist
+        if not os.path.isfile(self.path):
+
+            return 0
+
+        # Map image names to the index of the DataFrame
+        index = dict(zip(annotation_df['image_name'], annotation_df.index))
+
+        # Set up a counter for replayed records and the end of valid records
+        replayed = 0
+        valid_end = 0
+
+        with open(self.path, 'rb') as journal_file:
+
+            # Loop over the records in the journal
+            for image_name, diagram, offset, length in iter_records(
+                    journal_file):
+
+                # Update the position of the last valid record
+                valid_end = offset + length
+
+                # Skip records for diagrams not found in the DataFrame
+                if image_name not in index:
+
+                    print("[WARNING] Diagram {} in {} was not found in the "
+                          "DataFrame.".format(image_name, self.path))
+
+                    continue
+
+                # Replace the Diagram object
+                annotation_df.at[index[image_name], 'diagram'] = diagram
+
+                replayed += 1
+
+        # If the journal ends with an incomplete record, e.g. after a crash
+        # during writing, truncate the journal to the last valid record.
+        if os.path.getsize(self.path) > valid_end:
+
+            print("[WARNING] Discarding an incomplete record at the end of {}."
+                  .format(self.path))
+
+            with open(self.path, 'r+b') as journal_file:
+
+                journal_file.truncate(valid_end)
+
+        return replayed
+
+    def compact(self, annotation_df):
+        """
+        Folds the journal into the snapshot by writing the DataFrame to disk and
+        removing the journal. The DataFrame must already contain the changes
+        recorded in the journal, e.g. by calling replay().
+
+        Parameters:
+            annotation_df: A pandas DataFrame containing the annotation.
+
+        Returns:
+            None
+        """
+        # Write the snapshot into a temporary file and replace the previous
+        # snapshot only after the write has been completed.
+        temp_path = self.snapshot_path + '.tmp'
+        annotation_df.to_pickle(temp_path)
+        os.replace(temp_path, self.snapshot_path)
+
+        # Remove the journal
+        if os.path.isfile(self.path):
+
+            os.remove(self.path)
+
+
+def read_annotation(path):
+    """
+    Reads a pandas DataFrame containing AI2D-RST annotation and applies any
+    changes recorded in its journal. If the annotation is stored in an SQLite
+    database, the diagrams are read from the database.
+
+    Parameters:
+        path: Path to the pandas DataFrame or the database.
+
+    Returns:
+        A pandas DataFrame.
+    """
+    # Read the diagrams from the database if needed
+    if is_database(path):
+
+        return AnnotationDatabase(path).read()
+
+    # Read the snapshot
+    annotation_df = pd.read_pickle(path)
+
+    # Check if a journal exists and replay the changes
+    journal = Journal(path)
+
+    if os.path.isfile(journal.path) and 'diagram' in annotation_df.columns:
+
+        journal.replay(annotation_df)
+
+    return annotation_df
+
+
+def iter_annotation(path):
+    """
+    Iterates over the rows of AI2D-RST annotation stored in a pandas DataFrame,
+    a record file or an SQLite database. Record files and databases are read
+    one row at a time, whereas a DataFrame is read at once.
+
+    Parameters:
+        path: Path to the pandas DataFrame, the record file or the database.
+
+    Returns:
+        Yields the rows as dictionaries, e.g. with the keys 'image_name',
+        'annotation' and 'diagram'.
+    """
+    # Read the rows from the database
+    if is_database(path):
+
+        yield from AnnotationDatabase(path).iterrows()
+
+    # Read the records, skipping the signature
+    elif is_record_file(path):
+
+        with open(path, 'rb') as file:
+
+            file.seek(len(record_signature))
+
+            for _, row, _, _ in iter_records(file):
+
+                yield row
+
+    # Otherwise read the DataFrame and apply the journal
+    else:
+
+        yield from read_annotation(path).to_dict('records')
+
+
+def merge_annotation(paths, purge=False):
+    """
+    Merges the rows of AI2D-RST annotation stored in several files, reading the
+    files one at a time. If the same diagram occurs several times, the first
+    occurrence is kept.
+
+    Parameters:
+        paths: A list of paths to pandas DataFrames, record files or SQLite
+               databases.
+
+    Optional parameters:
+        purge: A Boolean defining whether diagrams marked as candidates for
+               deletion, that is, diagrams with a comment containing the word
+               'deletion', are removed.
+
+    Returns:
+        Yields the rows as dictionaries.
+    """
+    # Set up a dictionary mapping image names to the files in which they were
+    # found. Only the names are kept in memory.
+    seen = {}
+
+    for path in paths:
+
+        # Print status
+        print("[INFO] Adding {} to the output ...".format(path))
+
+        for row in iter_annotation(path):
+
+            image_name = row['image_name']
+
+            # Skip diagrams that have already been added
+            if image_name in seen:
+
+                print("[WARNING] Diagram {} in {} was already added from {}, "
+                      "skipping.".format(image_name, path, seen[image_name]))
+
+                continue
+
+            seen[image_name] = path
+
+            # Skip diagrams marked for deletion if requested
+            diagram = row.get('diagram')
+
+            if purge and diagram is not None and \
+                    any('deletion' in c for c in diagram.comments):
+
+                continue
+
+            yield row
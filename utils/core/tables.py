@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+
+from .diagram import Diagram
+
+import json
+import networkx as nx
+import os
+import pandas as pd
+import shutil
+
+
+def flatten_diagram(image_name, diagram):
+    """
+    Flattens the graphs of a Diagram object into rows of node and edge tables.
+
+    Parameters:
+        image_name: The name of the diagram image, e.g. 1132.png.
+        diagram: A Diagram object.
+
+    Returns:
+        A tuple of two lists of dictionaries, which hold the rows for nodes and
+        edges.
+    """
+    # Set up placeholders for the rows
+    nodes, edges = [], []
+
+    # Loop over the annotation layers
+    for layer, attribute in layer_graphs.items():
+
+        graph = getattr(diagram, attribute)
+
+        # Skip layers that have not been annotated
+        if graph is None:
+
+            continue
+
+        # Add a row for each node, keeping the order of the nodes
+        for position, (node, data) in enumerate(graph.nodes(data=True)):
+
+            # Copy the attributes, leaving out those stored in their own column
+            attributes = {k: v for k, v in data.items()
+                          if k not in node_attributes}
+
+            nodes.append({'image_name': image_name,
+                          'layer': layer,
+                          'position': position,
+                          'node_id': node,
+                          'kind': data.get('kind'),
+                          'macro_group': data.get('macro_group'),
+                          'rel_name': data.get('rel_name'),
+                          'attributes': json.dumps(attributes)
+                          if attributes else None})
+
+        # Get the edges, including keys for multigraphs
+        graph_edges = graph.edges(keys=True, data=True) \
+            if graph.is_multigraph() else graph.edges(data=True)
+
+        # Add a row for each edge, keeping the order of the edges
+        for position, (*edge, data) in enumerate(graph_edges):
+
+            # Copy the attributes, leaving out the kind of the edge
+            attributes = {k: v for k, v in data.items() if k != 'kind'}
+
+            edges.append({'image_name': image_name,
+                          'layer': layer,
+                          'position': position,
+                          'source': edge[0],
+                          'target': edge[1],
+                          'key': edge[2] if len(edge) == 3 else None,
+                          'kind': data.get('kind'),
+                          'attributes': json.dumps(attributes)
+                          if attributes else None})
+
+    return nodes, edges
+
+
+def write_tables(annotation_df, path):
+    """
+    Writes the annotation in a pandas DataFrame into columnar tables stored in
+    the Parquet format. The directory holds a table of diagrams, with their
+    status and the original AI2D annotation, and tables of nodes and edges,
+    which are partitioned by annotation layer.
+
+    Parameters:
+        annotation_df: A pandas DataFrame with the columns 'image_name' and
+                       'annotation', and optionally 'diagram'.
+        path: Path to the output directory.
+
+    Returns:
+        A tuple with the number of diagrams, nodes and edges written.
+    """
+    # Set up placeholders for the rows
+    diagrams, nodes, edges = [], [], []
+
+    # DataFrames that have not been annotated yet have no column for diagrams
+    diagram_column = annotation_df['diagram'] if 'diagram' in \
+        annotation_df.columns else [None] * len(annotation_df)
+
+    # Loop over the rows of the DataFrame
+    for image_name, annotation, diagram in zip(annotation_df['image_name'],
+                                               annotation_df['annotation'],
+                                               diagram_column):
+
+        # Set up a row for the diagram
+        row = {'image_name': image_name,
+               'annotation': json.dumps(annotation),
+               'has_diagram': diagram is not None}
+
+        # Add the status, comments and graph types if the diagram exists
+        if diagram is not None:
+
+            row.update({k: getattr(diagram, k) for k in status_columns})
+
+            row['image_filename'] = diagram.image_filename
+            row['comments'] = json.dumps(diagram.comments)
+
+            # Store the type of each graph and whether it has been frozen
+            for layer, attribute in layer_graphs.items():
+
+                graph = getattr(diagram, attribute)
+
+                row['{}_graph'.format(layer)] = type(graph).__name__ \
+                    if graph is not None else None
+                row['{}_frozen'.format(layer)] = graph is not None and \
+                    nx.is_frozen(graph)
+
+            # Flatten the graphs
+            diagram_nodes, diagram_edges = flatten_diagram(image_name, diagram)
+
+            nodes.extend(diagram_nodes)
+            edges.extend(diagram_edges)
+
+            # Store the graphs in a compact form again, as reading them
+            # converted them into NetworkX graphs
+            diagram.compact()
+
+        diagrams.append(row)
+
+    # Set up the output directory
+    os.makedirs(path, exist_ok=True)
+
+    # Write the table of diagrams
+    pd.DataFrame(diagrams, columns=diagram_columns).to_parquet(
+        os.path.join(path, 'diagrams.parquet'), index=False)
+
+    # Write the tables of nodes and edges partitioned by layer. Remove any
+    # previous tables first, as new partitions are added next to old ones.
+    for table, rows, columns in [('nodes', nodes, node_columns),
+                                 ('edges', edges, edge_columns)]:
+
+        table_path = os.path.join(path, table)
+
+        if os.path.isdir(table_path):
+
+            shutil.rmtree(table_path)
+
+        df = pd.DataFrame(rows, columns=columns)
+
+        # Use a nullable integer type for the keys of edges
+        if table == 'edges':
+
+            df['key'] = df['key'].astype('Int64')
+
+        df.to_parquet(table_path, partition_cols=['layer'], index=False)
+
+    return len(diagrams), len(nodes), len(edges)
+
+
+def read_table(path, table, layers=None, image_names=None, columns=None):
+    """
+    Reads a table written by write_tables(). The filters are pushed down to the
+    Parquet reader, so that only the matching partitions and row groups are
+    read.
+
+    Parameters:
+        path: Path to the directory containing the tables.
+        table: The name of the table, either 'diagrams', 'nodes' or 'edges'.
+        layers: A list of annotation layers to read, e.g. ['rst']. Not
+                available for the table of diagrams.
+        image_names: A list of diagrams to read, e.g. ['1132.png'].
+        columns: A list of columns to read. By default, all columns are read.
+
+    Returns:
+        A pandas DataFrame.
+    """
+    # Set up the filters
+    filters = []
+
+    if layers is not None:
+
+        filters.append(('layer', 'in', list(layers)))
+
+    if image_names is not None:
+
+        filters.append(('image_name', 'in', list(image_names)))
+
+    # Get the path to the table
+    table_path = os.path.join(path, 'diagrams.parquet') if table == 'diagrams' \
+        else os.path.join(path, table)
+
+    # No tables of nodes or edges are written if no diagram has any graphs, so
+    # return an empty table if the table is missing
+    if table != 'diagrams' and not os.path.isdir(table_path):
+
+        return pd.DataFrame(columns=columns if columns is not None else
+                            table_columns[table])
+
+    df = pd.read_parquet(table_path, columns=columns,
+                         filters=filters if filters else None)
+
+    # Partition columns are read as categories, convert them into strings
+    if 'layer' in df.columns:
+
+        df['layer'] = df['layer'].astype(str)
+
+    return df
+
+
+def read_tables(path, image_names=None):
+    """
+    Reads the tables written by write_tables() and rebuilds the Diagram objects.
+
+    Parameters:
+        path: Path to the directory containing the tables.
+        image_names: A list of diagrams to read. By default, all diagrams are
+                     read.
+
+    Returns:
+        A pandas DataFrame with the columns 'image_name', 'annotation' and
+        'diagram'.
+    """
+    # Read the tables
+    diagrams = read_table(path, 'diagrams', image_names=image_names)
+    nodes = read_table(path, 'nodes', image_names=image_names)
+    edges = read_table(path, 'edges', image_names=image_names)
+
+    # Group the nodes and edges by diagram and layer
+    node_groups = {k: g.sort_values('position') for k, g in
+                   nodes.groupby(['image_name', 'layer'], sort=False)}
+    edge_groups = {k: g.sort_values('position') for k, g in
+                   edges.groupby(['image_name', 'layer'], sort=False)}
+
+    # Set up a placeholder for the rebuilt rows
+    rows = []
+
+    # Loop over the diagrams
+    for row in diagrams.to_dict('records'):
+
+        # Parse the original annotation
+        annotation = json.loads(row['annotation'])
+
+        # Set up a placeholder for the Diagram object
+        diagram = None
+
+        if row['has_diagram']:
+
+            # Set up the attributes of the Diagram object
+            state = {k: bool(row[k]) for k in status_columns}
+
+            state.update({'image_filename': row['image_filename'],
+                          'annotation': annotation,
+                          'comments': json.loads(row['comments']),
+                          'update': False})
+
+            # Rebuild the graphs
+            for layer, attribute in layer_graphs.items():
+
+                state[attribute] = rebuild_graph(
+                    row['{}_graph'.format(layer)],
+                    node_groups.get((row['image_name'], layer)),
+                    edge_groups.get((row['image_name'], layer)),
+                    frozen=bool(row['{}_frozen'.format(layer)]))
+
+            # Create the Diagram object without parsing the annotation again
+            diagram = Diagram.__new__(Diagram)
+            diagram.__setstate__(state)
+
+        rows.append({'image_name': row['image_name'],
+                     'annotation': annotation,
+                     'diagram': diagram})
+
+    return pd.DataFrame(rows, columns=['image_name', 'annotation', 'diagram'])
+
+
+def rebuild_graph(graph_type, nodes, edges, frozen=False):
+    """
+    Rebuilds a NetworkX graph from rows of the node and edge tables.
+
+    Parameters:
+        graph_type: The name of the graph class, e.g. 'DiGraph', or None if the
+                    layer has not been annotated.
+        nodes: A pandas DataFrame with the nodes of the graph, or None.
+        edges: A pandas DataFrame with the edges of the graph, or None.
+        frozen: A Boolean defining whether the graph is frozen.
+
+    Returns:
+        A NetworkX graph or None.
+    """
+    # Return None for layers that have not been annotated
+    if pd.isna(graph_type):
+
+        return None
+
+    graph = graph_types[graph_type]()
+
+    # Add the nodes in their original order
+    if nodes is not None:
+
+        for node in nodes.to_dict('records'):
+
+            # Restore the attributes
+            data = json.loads(node['attributes']) \
+                if pd.notna(node['attributes']) else {}
+
+            for k in node_attributes:
+
+                if pd.notna(node[k]):
+
+                    data[k] = node[k]
+
+            graph.add_node(node['node_id'], **data)
+
+    # Add the edges in their original order
+    if edges is not None:
+
+        for edge in edges.to_dict('records'):
+
+            # Restore the attributes
+            data = json.loads(edge['attributes']) \
+                if pd.notna(edge['attributes']) else {}
+
+            if pd.notna(edge['kind']):
+
+                data['kind'] = edge['kind']
+
+            # Restore the keys of multigraphs
+            if graph.is_multigraph():
+
+                graph.add_edge(edge['source'], edge['target'],
+                               key=int(edge['key']), **data)
+
+            else:
+
+                graph.add_edge(edge['source'], edge['target'], **data)
+
+    # Freeze the graph if needed
+    if frozen:
+
+        nx.freeze(graph)
+
+    return graph
+
+
+# Map annotation layers to the attributes of Diagram objects
+layer_graphs = {'layout': 'layout_graph',
+                'connectivity': 'connectivity_graph',
+                'rst': 'rst_graph'}
+
+# Map the names of graph classes to the classes
+graph_types = {'Graph': nx.Graph, 'DiGraph': nx.DiGraph,
+               'MultiGraph': nx.MultiGraph, 'MultiDiGraph': nx.MultiDiGraph}
+
+# Define the attributes of Diagram objects that track the status
+status_columns = ['complete', 'group_complete', 'connectivity_complete',
+                  'rst_complete']
+
+# Define the attributes of nodes stored in their own columns
+node_attributes = ['kind', 'macro_group', 'rel_name']
+
+# Define the columns of the tables
+diagram_columns = ['image_name', 'annotation', 'has_diagram', 'image_filename',
+                   'comments'] + status_columns + \
+                  ['{}_{}'.format(l, c) for l in layer_graphs
+                   for c in ['graph', 'frozen']]
+
+node_columns = ['image_name', 'layer', 'position', 'node_id', 'kind',
+                'macro_group', 'rel_name', 'attributes']
+
+edge_columns = ['image_name', 'layer', 'position', 'source', 'target', 'key',
+                'kind', 'attributes']
+
+# Map the tables of nodes and edges to their columns
+table_columns = {'nodes': node_columns, 'edges': edge_columns}
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+from .interface import macro_groups, rst_relations
+from .parse import element_categories
+from .sample import get_children
+from .spatial import element_bounds
+from .tables import layer_graphs
+
+import json
+import networkx as nx
+import numpy as np
+import os
+
+
+def node_bounds(diagram, geometry=None):
+    """
+    Gets the bounding boxes of the nodes in the graphs of a Diagram object.
+    Groups are bounded by the elements that they contain, as given by the
+    layout graph.
+
+    Parameters:
+        diagram: A Diagram object.
+
+    Optional parameters:
+        geometry: The geometry of the diagram elements from a GeometryStore.
+
+    Returns:
+        A dictionary mapping the identifiers of nodes to tuples of (x_min,
+        y_min, x_max, y_max) in pixels.
+    """
+    bounds = element_bounds(diagram.annotation, geometry=geometry)
+
+    # Add the bounds of groups
+    for group, elements in get_children(diagram.layout_graph).items():
+
+        boxes = np.array([bounds[e] for e in elements if e in bounds])
+
+        if len(boxes) > 0:
+
+            bounds[group] = tuple(boxes[:, :2].min(axis=0).tolist() +
+                                  boxes[:, 2:].max(axis=0).tolist())
+
+    return bounds
+
+
+def graph_tensors(graph, layer, bounds):
+    """
+    Converts the graph of an annotation layer into arrays.
+
+    Parameters:
+        graph: A NetworkX graph.
+        layer: The annotation layer, either 'layout', 'connectivity' or 'rst'.
+        bounds: A dictionary mapping the identifiers of nodes to their bounding
+                boxes, as returned by node_bounds().
+
+    Returns:
+        A dictionary of NumPy arrays: 'node_ids' with the identifiers of the
+        nodes, 'node_features' with the bounding box of each node followed by
+        a one-hot encoding of its kind, 'node_labels' with the codes of RST
+        relations or macro-groups, 'edges' with pairs of node positions and
+        'edge_types' with the codes of the edge kinds.
+    """
+    nodes = list(graph)
+    positions = {n: i for i, n in enumerate(nodes)}
+
+    # Set up the node features, leaving the bounds of nodes without geometry,
+    # such as RST relations, at zero
+    features = np.zeros((len(nodes), 4 + len(node_kinds)), dtype=np.float32)
+    labels = np.full(len(nodes), -1, dtype=np.int16)
+
+    for i, (node, data) in enumerate(graph.nodes(data=True)):
+
+        if node in bounds:
+
+            features[i, :4] = bounds[node]
+
+        if data.get('kind') in node_kinds:
+
+            features[i, 4 + node_kinds.index(data['kind'])] = 1
+
+        # Get the label of the node, if the layer has any
+        label = data.get(label_attributes.get(layer))
+
+        if label in node_labels[layer]:
+
+            labels[i] = node_labels[layer].index(label)
+
+    # Get the edges and their kinds. Edges without a kind, i.e. those of the
+    # layout graph, are hierarchical and coded as grouping edges.
+    edges = list(graph.edges(data='kind'))
+
+    return {'node_ids': np.array(nodes, dtype=str),
+            'node_features': features,
+            'node_labels': labels,
+            'edges': np.array([(positions[u], positions[v])
+                               for u, v, k in edges],
+                              dtype=np.int32).reshape(-1, 2),
+            'edge_types': np.array([edge_kinds.index(k or 'grouping')
+                                    if (k or 'grouping') in edge_kinds else -1
+                                    for u, v, k in edges], dtype=np.int16)}
+
+
+def export_tensors(rows, path, geometry=None):
+    """
+    Exports the graphs of all annotation layers into a bundle of NumPy arrays
+    for training machine learning models. The graphs are stored as ragged
+    arrays, in which the nodes and edges of all graphs are concatenated, and
+    the graph of diagram i in a layer is found between offsets[i] and
+    offsets[i + 1]. Each array is written into a separate .npy file, which can
+    be memory-mapped using load_tensors().
+
+    Only layers marked as complete are exported. The graphs of incomplete
+    layers are left empty.
+
+    Parameters:
+        rows: An iterable of rows as dictionaries with the keys 'image_name'
+              and 'diagram', e.g. the output of iter_annotation().
+        path: Path to the output directory.
+
+    Optional parameters:
+        geometry: A GeometryStore holding the geometry of the diagram elements,
+                  which is used instead of the coordinates in the annotation.
+
+    Returns:
+        The number of diagrams exported.
+    """
+    # Set up placeholders for the image names, the status of the layers and
+    # the arrays of each layer
+    image_names, complete = [], []
+    arrays = {layer: {} for layer in layer_graphs}
+
+    for row in rows:
+
+        diagram = row.get('diagram')
+
+        # Skip diagrams without annotation and those marked for deletion
+        if diagram is None or any('deletion' in c for c in diagram.comments):
+
+            continue
+
+        image_names.append(row['image_name'])
+        complete.append([getattr(diagram, layer_status[layer])
+                         for layer in layer_graphs])
+
+        bounds = node_bounds(diagram, geometry=geometry.get(row['image_name'])
+                             if geometry is not None else None)
+
+        for layer, attribute in layer_graphs.items():
+
+            graph = getattr(diagram, attribute)
+
+            # Leave the graphs of incomplete layers empty
+            if graph is None or not getattr(diagram, layer_status[layer]):
+
+                graph = empty_graph
+
+            for name, array in graph_tensors(graph, layer, bounds).items():
+
+                arrays[layer].setdefault(name, []).append(array)
+
+        # Store the graphs in a compact form again, as reading them converted
+        # them into NetworkX graphs
+        diagram.compact()
+
+    # Set up the output directory
+    os.makedirs(path, exist_ok=True)
+
+    # Collect the arrays to be written, concatenating the arrays of each
+    # layer and adding the offsets of the graphs
+    bundle = {'image_names': np.array(image_names, dtype=str),
+              'complete': np.array(complete, dtype=bool).reshape(
+                  -1, len(layer_graphs))}
+
+    for layer, layer_arrays in arrays.items():
+
+        # Use the arrays of an empty graph if there are no diagrams
+        for name, empty in graph_tensors(empty_graph, layer, {}).items():
+
+            parts = layer_arrays.get(name, [])
+
+            bundle['{}_{}'.format(layer, name)] = np.concatenate(parts) \
+                if parts else empty
+
+        for name, key in [('node_offsets', 'node_ids'),
+                          ('edge_offsets', 'edges')]:
+
+            bundle['{}_{}'.format(layer, name)] = np.cumsum(
+                [0] + [len(p) for p in layer_arrays.get(key, [])],
+                dtype=np.int64)
+
+    # Write each array into a separate file
+    for name, array in bundle.items():
+
+        np.save(os.path.join(path, name + '.npy'), array)
+
+    # Write an index describing the contents of the bundle
+    index = {'diagrams': len(image_names),
+             'layers': list(layer_graphs),
+             'directed': {'layout': False, 'connectivity': True, 'rst': True},
+             'features': ['x_min', 'y_min', 'x_max', 'y_max'] + node_kinds,
+             'node_labels': node_labels,
+             'edge_types': edge_kinds,
+             'arrays': sorted(bundle)}
+
+    with open(os.path.join(path, 'index.json'), 'w') as f:
+
+        json.dump(index, f, indent=2)
+
+    return len(image_names)
+
+
+def load_tensors(path):
+    """
+    Loads a bundle written by export_tensors(). The arrays are memory-mapped,
+    so that only the parts accessed are read from the disk.
+
+    Parameters:
+        path: Path to the directory containing the bundle.
+
+    Returns:
+        A dictionary with the index of the bundle in the key 'index' and the
+        memory-mapped arrays under their names, e.g. 'rst_edges'.
+    """
+    with open(os.path.join(path, 'index.json')) as f:
+
+        bundle = {'index': json.load(f)}
+
+    for name in bundle['index']['arrays']:
+
+        bundle[name] = np.load(os.path.join(path, name + '.npy'),
+                               mmap_mode='r')
+
+    return bundle
+
+
+def get_graph(bundle, layer, i):
+    """
+    Gets the arrays of a single graph from a bundle, without copying them.
+
+    Parameters:
+        bundle: A dictionary returned by load_tensors().
+        layer: The annotation layer, either 'layout', 'connectivity' or 'rst'.
+        i: The position of the diagram in the bundle.
+
+    Returns:
+        A dictionary of arrays, as returned by graph_tensors().
+    """
+    graph = {}
+
+    for names, offsets in [(['node_ids', 'node_features', 'node_labels'],
+                            bundle[layer + '_node_offsets']),
+                           (['edges', 'edge_types'],
+                            bundle[layer + '_edge_offsets'])]:
+
+        start, end = int(offsets[i]), int(offsets[i + 1])
+
+        for name in names:
+
+            graph[name] = bundle['{}_{}'.format(layer, name)][start:end]
+
+    return graph
+
+
+def adjacency_matrix(graph, directed, size=None, sparse=False):
+    """
+    Builds the adjacency matrix of a single graph.
+
+    Parameters:
+        graph: A dictionary of arrays returned by get_graph().
+        directed: A Boolean defining whether the graph is directed. The
+                  adjacency matrix of an undirected graph is symmetric.
+
+    Optional parameters:
+        size: The number of rows and columns in the matrix, which is used for
+              padding the matrices of a batch to the same size. By default,
+              the size is the number of nodes.
+        sparse: A Boolean defining whether a SciPy sparse matrix is returned
+                instead of a NumPy array.
+
+    Returns:
+        A matrix of shape (size, size), in which each cell holds the number of
+        edges from the row node to the column node.
+    """
+    size = len(graph['node_ids']) if size is None else size
+
+    rows, cols = graph['edges'][:, 0], graph['edges'][:, 1]
+
+    # Add the reverse edges to undirected graphs, leaving out self-loops
+    if not directed:
+
+        loops = rows == cols
+        rows, cols = np.concatenate([rows, cols[~loops]]), \
+            np.concatenate([cols, rows[~loops]])
+
+    if sparse:
+
+        # SciPy is only needed for sparse matrices
+        from scipy.sparse import coo_matrix
+
+        return coo_matrix((np.ones(len(rows), dtype=np.float32),
+                           (rows, cols)), shape=(size, size)).tocsr()
+
+    matrix = np.zeros((size, size), dtype=np.float32)
+    np.add.at(matrix, (rows, cols), 1)
+
+    return matrix
+
+
+# Define the kinds of nodes and edges, whose codes are used in the arrays
+node_kinds = element_categories + ['group', 'relation']
+edge_kinds = ['grouping', 'undirectional', 'directional', 'bidirectional',
+              'nucleus', 'satellite']
+
+# Define the node attributes used as labels in each layer and their values
+label_attributes = {'layout': 'macro_group', 'rst': 'rel_name'}
+node_labels = {'layout': list(macro_groups.values()),
+               'connectivity': [],
+               'rst': [v['name'] for v in rst_relations.values()]}
+
+# Define the attributes of Diagram objects that mark each layer complete
+layer_status = {'layout': 'group_complete',
+                'connectivity': 'connectivity_complete',
+                'rst': 'rst_complete'}
+
+# Define an empty graph for incomplete layers
+empty_graph = nx.Graph()
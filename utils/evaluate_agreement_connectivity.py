@@ -14,7 +14,9 @@ Usage:
 
 Arguments:
     -a/--annotation: Path to the pandas DataFrame containing AI2D-RST Diagram
-                     objects.
+                     objects, or a record file or an SQLite database created
+                     using convert_annotation.py, from which only the diagrams
+                     in the sample are loaded.
     -s/--sample: Path to the file containing data sampled from the AI2D-RST
                  Diagram objects.
     -i/--images: Path to the directory containing the AI2D diagram images.
@@ -30,6 +32,8 @@ Returns:
 from pathlib import Path
 from colorama import Fore, Style, init
 from core.draw import *
+from core.interface import connection_categories
+from core.store import AnnotationIndex
 import argparse
 import cv2
 import os
@@ -71,7 +75,7 @@ if not Path(images_path).exists():
 if os.path.isfile(output_path):
 
     # Read existing files
-    annotation_df = pd.read_pickle(ann_path)
+    annotation_index = AnnotationIndex(ann_path)
     sample = pd.read_pickle(output_path)
 
     # Print status message
@@ -80,8 +84,8 @@ if os.path.isfile(output_path):
 # Otherwise, read the annotation from the input DataFrame
 if not os.path.isfile(output_path):
 
-    # Make a copy of the input DataFrame
-    annotation_df = pd.read_pickle(ann_path).copy()
+    # Index the input annotation by image name
+    annotation_index = AnnotationIndex(ann_path)
 
     # Load DataFrame containing sample
     sample = pd.read_pickle(sample_path)
@@ -91,17 +95,6 @@ conn_prompt = Fore.RED + "[CONNECTIVITY] What kind of connection holds " \
                          "between the source (red) and the target (blue)? " \
               + Style.RESET_ALL
 
-# Define a dictionary of connection types with descriptions
-connections = {'u': {'cat': 'undirected', 'desc': 'The connection is '
-                                                  'undirected.'},
-               'd': {'cat': 'directed', 'desc': 'The connection is directed.'},
-               'b': {'cat': 'bidirectional', 'desc': 'The connection is '
-                                                     'bidirectional.'},
-               'n': {'cat': 'no-connection', 'desc': 'No valid connection holds'
-                                                     ' between the source and '
-                                                     'the target.'}
-              }
-
 # Define a list of annotator commands
 commands = ['help', 'exit']
 
@@ -110,7 +103,8 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
     # Check if annotation has already been performed
     try:
-        if row['annotation'] in [v['cat'] for k, v in connections.items()]:
+        if row['annotation'] in [v['cat'] for k, v in
+                                 connection_categories.items()]:
 
             continue
 
@@ -133,14 +127,14 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
     print(Fore.YELLOW + "[INFO] Now processing connection {}/{} from {}."
           .format(i, len(sample), image_name) + Style.RESET_ALL)
 
-    # Fetch the layout annotation from the original DataFrame
-    original_row = annotation_df.loc[annotation_df['image_name'] == image_name]
+    # Fetch the layout annotation from the original annotation
+    original_row = annotation_index[image_name]
 
     # Get the annotation dictionary for the original AI2D annotation
-    annotation = original_row['annotation'].item()
+    annotation = original_row['annotation']
 
     # Get the AI2D Diagram object
-    diagram = original_row['diagram'].item()
+    diagram = original_row['diagram']
 
     # Assign source and target information to variables
     source = row['source']
@@ -198,7 +192,7 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
     # Draw the annotation and highlight the source and the target
     segmentation = draw_layout(image_path, annotation, height=480,
-                               highlight=highlight)
+                               highlight=highlight, backend='opencv')
 
     # Show the annotation
     cv2.imshow("Annotation", segmentation)
@@ -219,10 +213,10 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
             command = is_connection
 
         # If the input string is a valid description of connection
-        if is_connection in connections.keys():
+        if is_connection in connection_categories.keys():
 
             # Fetch the connection from the list
-            connection = connections[is_connection]['cat']
+            connection = connection_categories[is_connection]['cat']
 
             # Save the input to DataFrame
             sample.at[ix, 'annotation'] = str(connection)
@@ -237,7 +231,7 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
                   Style.RESET_ALL)
 
             # Loop over the Gestalt principles and print information
-            for k, v in connections.items():
+            for k, v in connection_categories.items():
                 print(Fore.YELLOW + "[INFO] "
                                     "{} ({}): {}"
                       .format(k, v['cat'], v['desc'])
@@ -14,7 +14,9 @@ Usage:
 
 Arguments:
     -a/--annotation: Path to the pandas DataFrame containing AI2D-RST Diagram
-                     objects.
+                     objects, or a record file or an SQLite database created
+                     using convert_annotation.py, from which only the diagrams
+                     in the sample are loaded.
     -s/--sample: Path to the file containing data sampled from the AI2D-RST
                  Diagram objects.
     -i/--images: Path to the directory containing the AI2D diagram images.
@@ -30,6 +32,8 @@ Returns:
 from pathlib import Path
 from colorama import Fore, Style, init
 from core.draw import *
+from core.interface import gestalt_principles
+from core.store import AnnotationIndex
 import argparse
 import cv2
 import os
@@ -71,7 +75,7 @@ if not Path(images_path).exists():
 if os.path.isfile(output_path):
 
     # Read existing files
-    annotation_df = pd.read_pickle(ann_path)
+    annotation_index = AnnotationIndex(ann_path)
     sample = pd.read_pickle(output_path)
 
     # Print status message
@@ -80,8 +84,8 @@ if os.path.isfile(output_path):
 # Otherwise, read the annotation from the input DataFrame
 if not os.path.isfile(output_path):
 
-    # Make a copy of the input DataFrame
-    annotation_df = pd.read_pickle(ann_path).copy()
+    # Index the input annotation by image name
+    annotation_index = AnnotationIndex(ann_path)
 
     # Load DataFrame containing sample
     sample = pd.read_pickle(sample_path)
@@ -94,24 +98,6 @@ group_prompt = Fore.RED + "[GROUPING] Do these elements form a SINGLE " \
 gestalt = Fore.RED + "[GROUPING] For which reason? " \
           + Style.RESET_ALL
 
-# Define a dictionary of gestalt principles with descriptions
-principles = {'prox': {'cat': 'proximity', 'desc': 'the elements are close to '
-                                                   'each other.'},
-              'sim': {'cat': 'similarity', 'desc': 'the elements are similar in'
-                                                   'terms of appearance.'},
-              'conn': {'cat': 'connectedness', 'desc': 'the elements are '
-                                                       'connected to each '
-                                                       'other.'},
-              'cont': {'cat': 'continuity', 'desc': 'the elements form a '
-                                                    'continuous unit.'},
-              'sym': {'cat': 'symmetry', 'desc': 'the elements are symmetrical '
-                                                 'in terms of shape.'},
-              'clos': {'cat': 'closure', 'desc': 'one or more element encloses '
-                                                 'the other.'},
-              'guide': {'cat': 'guide', 'desc': 'the annotation manual defines '
-                                                'a grouping in this case.'}
-              }
-
 # Define a list of annotator commands
 commands = ['help', 'exit']
 
@@ -120,8 +106,8 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
     # Check if annotation has already been performed
     try:
-        if row['annotation'] in [v['cat'] for k, v in principles.items()] + \
-                ['no-group']:
+        if row['annotation'] in [v['cat'] for k, v in
+                                 gestalt_principles.items()] + ['no-group']:
 
             continue
 
@@ -145,15 +131,15 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
     print(Fore.YELLOW + "[INFO] Now processing group {}/{} from {}."
           .format(i, len(sample), image_name) + Style.RESET_ALL)
 
-    # Fetch the layout annotation from the original DataFrame
-    original_row = annotation_df.loc[annotation_df['image_name'] == image_name]
+    # Fetch the layout annotation from the original annotation
+    original_row = annotation_index[image_name]
 
     # Get the annotation dictionary for the original AI2D annotation
-    annotation = original_row['annotation'].item()
+    annotation = original_row['annotation']
 
     # Draw the annotation
     segmentation = draw_layout(image_path, annotation, height=480,
-                               point=row['elements'])
+                               point=row['elements'], backend='opencv')
 
     # Show the annotation
     cv2.imshow("Annotation", segmentation)
@@ -189,7 +175,8 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
             gestalt_principle = None
 
             # Check input against valid inputs
-            while gestalt_principle not in list(principles.keys()) + commands:
+            while gestalt_principle not in list(gestalt_principles.keys()) \
+                    + commands:
 
                 # Request Gestalt principle
                 gestalt_principle = input(gestalt)
@@ -200,10 +187,10 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
                     # Set command variable
                     command = gestalt_principle
 
-                if gestalt_principle in list(principles.keys()):
+                if gestalt_principle in list(gestalt_principles.keys()):
 
                     # Fetch the principle from the dict
-                    principle = principles[gestalt_principle]['cat']
+                    principle = gestalt_principles[gestalt_principle]['cat']
 
                     # When valid input has been entered, save input to DataFrame
                     sample.at[ix, 'annotation'] = str(principle)
@@ -218,7 +205,7 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
                   Style.RESET_ALL)
 
             # Loop over the Gestalt principles and print information
-            for k, v in principles.items():
+            for k, v in gestalt_principles.items():
                 print(Fore.YELLOW + "[INFO] "
                                     "{} ({}): {}"
                       .format(k, v['cat'], v['desc'])
@@ -14,12 +14,16 @@ Usage:
 
 Arguments:
     -a/--annotation: Path to the pandas DataFrame containing AI2D-RST Diagram
-                     objects.
+                     objects, or a record file or an SQLite database created
+                     using convert_annotation.py, from which only the diagrams
+                     in the sample are loaded.
     -s/--sample: Path to the file containing data sampled from the AI2D-RST
                  Diagram objects.
     -i/--images: Path to the directory containing the AI2D diagram images.
     -o/--output: Path to the output file, in which the resulting annotation is
                  stored.
+    -c/--cache: Optional path to a directory for storing images of the graphs,
+                which are reused when the same diagrams are shown again.
 
 Returns:
     A pandas DataFrame containing the annotation stored in the input DataFrame
@@ -29,6 +33,7 @@ Returns:
 # Import packages
 from colorama import Fore, Style, init
 from core.draw import *
+from core.store import AnnotationIndex
 from core.interface import rst_relations
 from core.parse import *
 from pathlib import Path
@@ -51,10 +56,16 @@ ap.add_argument("-s", "--sample", required=True)
 ap.add_argument("-a", "--annotation", required=True)
 ap.add_argument("-i", "--images", required=True)
 ap.add_argument("-o", "--output", required=True)
+ap.add_argument("-c", "--cache", required=False)
 
 # Parse arguments
 args = vars(ap.parse_args())
 
+# Store the images of graphs on disk if requested
+if args['cache']:
+
+    render_cache.cache_dir = args['cache']
+
 # Assign arguments to variables
 ann_path = args['annotation']
 sample_path = args['sample']
@@ -75,7 +86,7 @@ if not Path(images_path).exists():
 if os.path.isfile(output_path):
 
     # Read existing files
-    annotation_df = pd.read_pickle(ann_path)
+    annotation_index = AnnotationIndex(ann_path)
     sample = pd.read_pickle(output_path)
 
     # Print status message
@@ -84,8 +95,8 @@ if os.path.isfile(output_path):
 # Otherwise, read the annotation from the input DataFrame
 if not os.path.isfile(output_path):
 
-    # Make a copy of the input DataFrame
-    annotation_df = pd.read_pickle(ann_path).copy()
+    # Index the input annotation by image name
+    annotation_index = AnnotationIndex(ann_path)
 
     # Load DataFrame containing sample
     sample = pd.read_pickle(sample_path)
@@ -121,14 +132,14 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
     print(Fore.YELLOW + "[INFO] Now processing RST relation {}/{} from {}."
           .format(i, len(sample), image_name) + Style.RESET_ALL)
 
-    # Fetch the layout annotation from the original DataFrame
-    original_row = annotation_df.loc[annotation_df['image_name'] == image_name]
+    # Fetch the layout annotation from the original annotation
+    original_row = annotation_index[image_name]
 
     # Get the annotation dictionary for the original AI2D annotation
-    annotation = original_row['annotation'].item()
+    annotation = original_row['annotation']
 
     # Get the AI2D Diagram object
-    diagram = original_row['diagram'].item()
+    diagram = original_row['diagram']
 
     # Generate a dictionary of RST relations present in the graph
     relation_ix = get_node_dict(diagram.rst_graph, kind='relation')
@@ -150,7 +161,8 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
     rst_highlight = {row['id']: 'aquamarine'}
 
     # Draw the annotation and highlight the source and the target
-    segmentation = draw_layout(image_path, annotation, height=480)
+    segmentation = draw_layout(image_path, annotation, height=480,
+                               backend='opencv')
 
     # Draw the graph using RST mode
     rst_graph = draw_graph(diagram.rst_graph, dpi=100, mode='rst',
@@ -237,7 +249,7 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
             # Re-draw the layout
             segmentation = draw_layout(image_path, annotation, height=480,
-                                       hide=True)
+                                       hide=True, backend='opencv')
 
             # Flag the annotation as hidden
             hide = True
@@ -249,7 +261,7 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
             # Re-draw the layout
             segmentation = draw_layout(image_path, annotation, height=480,
-                                       hide=False)
+                                       hide=False, backend='opencv')
 
             # Flag the annotation as visible
             hide = False
@@ -273,7 +285,8 @@ for i, (ix, row) in enumerate(sample.iterrows(), start=1):
 
                 # Re-draw the layout
                 segmentation = draw_layout(image_path, annotation, height=480,
-                                           hide=False, point=user_input)
+                                           hide=False, point=user_input,
+                                           backend='opencv')
 
                 continue
 
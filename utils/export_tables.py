@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script converts a pandas DataFrame containing AI2D-RST annotation into
+columnar tables stored in the Parquet format, which allow examining the entire
+corpus without loading the Diagram objects. The output directory contains a
+table of diagrams (diagrams.parquet) and tables of nodes (nodes/) and edges
+(edges/) in all annotation layers, partitioned by layer.
+
+If the input is a directory of tables, the Diagram objects are rebuilt and
+saved into a pandas DataFrame instead.
+
+The tables can be read using pandas, e.g. to read the RST relations:
+
+    pd.read_parquet('tables/nodes', filters=[('layer', '=', 'rst'),
+                                             ('kind', '=', 'relation')])
+
+Usage:
+    python export_tables.py -a annotation.pkl -o tables/
+    python export_tables.py -a tables/ -o annotation.pkl
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame containing the annotation, or
+                     to a directory of tables. Any changes recorded in the
+                     journal of the DataFrame are included.
+    -o/--output: Path to the output directory or file.
+
+Returns:
+    A directory of tables, or a pandas DataFrame if the input is a directory of
+    tables.
+"""
+
+# Import packages
+from core.store import read_annotation
+from core.tables import read_tables, write_tables
+from pathlib import Path
+import argparse
+import os
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation or "
+                     "a directory of tables.")
+ap.add_argument("-o", "--output", required=True,
+                help="Path to the output directory or file.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+output_path = args['output']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Rebuild the Diagram objects if the input is a directory of tables
+if os.path.isdir(ann_path):
+
+    # Read the tables
+    annotation_df = read_tables(ann_path)
+
+    # Save the DataFrame
+    annotation_df.to_pickle(output_path)
+
+    # Print status
+    print("[DONE] Rebuilt {} diagrams into {}.".format(len(annotation_df),
+                                                       output_path))
+
+# Otherwise write the annotation into tables
+else:
+
+    # Read the DataFrame and apply the journal
+    annotation_df = read_annotation(ann_path)
+
+    # Write the tables
+    diagrams, nodes, edges = write_tables(annotation_df, output_path)
+
+    # Print status
+    print("[DONE] Wrote {} diagrams, {} nodes and {} edges into {}.".format(
+        diagrams, nodes, edges, output_path))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script exports the graphs of AI2D-RST annotation into a bundle of NumPy
+arrays for training machine learning models. The nodes and edges of all
+diagrams are stored in ragged arrays, one for each annotation layer, together
+with the offsets of each graph. The node features consist of the bounding box
+of each element or group and a one-hot encoding of the kind of the node, while
+the edges carry the codes of their kinds, e.g. 'nucleus' or 'directional'.
+
+Each array is written into a separate .npy file, which can be memory-mapped
+using load_tensors() in core/tensors.py. The file index.json describes the
+arrays, the features and the codes used.
+
+Usage:
+    python export_tensors.py -a annotation.pkl -o tensors/
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame, record file or SQLite
+                     database containing the annotation.
+    -o/--output: Path to the output directory.
+    -g/--geometry: Optional path to a directory of element geometry created
+                   using ingest_geometry.py, from which the bounding boxes of
+                   the elements are read.
+
+Returns:
+    A directory containing the arrays and the index.
+"""
+
+# Import packages
+from core.geometry import GeometryStore
+from core.store import iter_annotation
+from core.tensors import export_tensors
+from pathlib import Path
+import argparse
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation.")
+ap.add_argument("-o", "--output", required=True,
+                help="Path to the output directory.")
+ap.add_argument("-g", "--geometry", required=False,
+                help="Path to a directory of element geometry created using "
+                     "ingest_geometry.py.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+output_path = args['output']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Open the geometry of the diagram elements if requested
+geometry = None
+
+if args['geometry']:
+
+    if not Path(args['geometry']).exists():
+
+        exit("[ERROR] Cannot find {}. Check the input to -g!".format(
+            args['geometry']))
+
+    geometry = GeometryStore(args['geometry'])
+
+# Export the graphs
+n_diagrams = export_tensors(iter_annotation(ann_path), output_path,
+                            geometry=geometry)
+
+# Print status
+print("[DONE] Exported the graphs of {} diagrams into {}.".format(
+    n_diagrams, output_path))
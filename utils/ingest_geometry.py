@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script ingests the geometry of diagram elements, that is, the polygons and
+rectangles in the AI2D annotation, into a directory of memory-mapped arrays.
+The geometry can then be read using the GeometryStore class in core/geometry.py
+without converting the coordinates from the annotation again, e.g. by giving
+the directory to visualize_annotation.py using the -g/--geometry argument.
+
+Usage:
+    python ingest_geometry.py -a annotation.pkl -o geometry/
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame, record file or SQLite
+                     database containing the annotation, or to the directory
+                     containing the original AI2D annotation as JSON files.
+    -o/--output: Path to the output directory.
+
+Returns:
+    A directory containing the geometry of the diagram elements.
+"""
+
+# Import packages
+from core.geometry import ingest_geometry
+from core.parse import load_annotation
+from core.store import iter_annotation
+from pathlib import Path
+import argparse
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the AI2D-RST annotation or AI2D JSON files.")
+ap.add_argument("-o", "--output", required=True,
+                help="Path to the output directory.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = Path(args['annotation'])
+output_path = args['output']
+
+# Verify the input path, print error and exit if not found
+if not ann_path.exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Read the original AI2D annotation from JSON files, which are named after the
+# diagram images, e.g. 1132.png.json
+if ann_path.is_dir():
+
+    rows = ({'image_name': p.stem, 'annotation': load_annotation(str(p))}
+            for p in sorted(ann_path.glob('*.json')))
+
+else:
+
+    rows = iter_annotation(str(ann_path))
+
+# Ingest the geometry
+n_diagrams, n_elements = ingest_geometry(rows, output_path)
+
+# Print status
+print("[DONE] Ingested {} elements from {} diagrams into {}.".format(
+    n_elements, n_diagrams, output_path))
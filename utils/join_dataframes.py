@@ -1,6 +1,30 @@
 # -*- coding: utf-8 -*-
 
+"""
+This script joins AI2D-RST annotation stored in several files into a single
+file. The input files are read one at a time and the rows are written into the
+output as they are read.
+
+Usage:
+    python join_dataframes.py -i annotation/ -o joined.pkl
+
+Arguments:
+    -i/--input: Path to the directory containing the pandas DataFrames, record
+                files or SQLite databases to join.
+    -o/--output: Path to the output file. If the file is an SQLite database,
+                 e.g. joined.db, or a record file with the extension .rec, the
+                 rows are written one at a time. Otherwise, the rows are
+                 collected into a pandas DataFrame, which is written at the end.
+    -p/--purge: Remove diagrams marked as candidates for deletion.
+
+Returns:
+    A file containing the joined annotation. If the same diagram occurs in
+    several files, the first occurrence is kept and a warning is printed.
+"""
+
 # Import the necessary packages
+from core.database import AnnotationDatabase, is_database
+from core.store import is_record_file, merge_annotation, write_records
 import argparse
 import glob
 import pandas as pd
@@ -10,9 +34,11 @@ ap = argparse.ArgumentParser()
 
 # Define arguments
 ap.add_argument("-i", "--input", required=True,
-                help="Path to the directory containing the DataFrames to join.")
+                help="Path to the directory containing the DataFrames, record "
+                     "files or SQLite databases to join.")
 ap.add_argument("-o", "--output", required=True,
-                help="Path to the combined DataFrame.")
+                help="Path to the combined DataFrame, record file or SQLite "
+                     "database.")
 ap.add_argument("-p", "--purge", required=False, action="store_true",
                 help="Remove diagrams marked as candidates for deletion.")
 
@@ -23,50 +49,34 @@ args = vars(ap.parse_args())
 input_dir = args['input']
 output_df = args['output']
 
-# Set up a placeholder list for DataFrames
-dfs = []
-
-# Get the files in the input directory
-for f in glob.glob(input_dir + '*.pkl'):
-
-    # Print status
-    print("[INFO] Adding {} to the DataFrame ...".format(f))
-
-    # Read DataFrame
-    df = pd.read_pickle(f)
-
-    # Append pickle to list
-    dfs.append(df)
-
-# Concatenate DataFrames in the list
-df_out = pd.concat(dfs)
+# Get the files in the input directory, including record files and databases
+input_files = sorted(f for f in glob.glob(input_dir + '*')
+                     if f.endswith('.pkl') or is_record_file(f)
+                     or is_database(f))
 
-# Check if the user has requested to remove diagrams marked for deletion
-if args['purge']:
+# Read the input files one at a time, removing duplicate diagrams and those
+# marked for deletion if requested
+rows = merge_annotation(input_files, purge=args['purge'])
 
-    # Set up placeholder list for rows to delete
-    del_rows = []
+# Write the rows into a database in a single transaction, replacing any
+# diagrams with the same image name
+if is_database(output_df):
 
-    # Loop over the DataFrame rows
-    for ix, row in df_out.iterrows():
+    written = AnnotationDatabase(output_df).write(rows)
 
-        # Loop over each comment
-        for comment in row['diagram'].comments:
+# Write the rows into a record file
+elif output_df.endswith('.rec'):
 
-            # If comment contains the word 'deletion' and index not in del list
-            if 'deletion' in comment and ix not in del_rows:
+    written = write_records(rows, output_df)
 
-                # Append index to list of rows to delete
-                del_rows.append(ix)
+# Otherwise collect the rows into a DataFrame and save the DataFrame
+else:
 
-    # Drop rows collected into the list
-    df_out = df_out.drop(del_rows)
+    df_out = pd.DataFrame(list(rows))
 
-# Reset index
-df_out = df_out.reset_index(drop=True)
+    df_out.to_pickle(output_df)
 
-# Save DataFrame
-df_out.to_pickle(output_df)
+    written = len(df_out)
 
 # Print status
-print("[DONE] Added {} diagrams to {}".format(len(df_out), output_df))
+print("[DONE] Added {} diagrams to {}".format(written, output_df))
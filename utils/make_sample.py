@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script draws a sample of items from AI2D-RST annotation for measuring
+agreement between annotators. The sample is stratified either by the original
+label of the items, e.g. the name of the RST relation, or by the category of
+the diagrams, and it can be given to the evaluate_agreement_*.py scripts using
+the -s/--sample argument.
+
+The annotation is read in a single pass, one diagram at a time if the input is
+a record file or an SQLite database, and only the sampled items are kept in
+memory.
+
+Usage:
+    python make_sample.py -a annotation.pkl -t rst -n 20 -r 42 -o sample.pkl
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame, record file or SQLite
+                     database containing the annotation.
+    -t/--task: The agreement task, either 'rst', 'connectivity', 'grouping' or
+               'macro', which defines the items to sample.
+    -n/--size: Number of items sampled from each stratum.
+    -s/--stratify: Stratify the sample by the original 'label' of the items
+                   (default) or by the 'category' of the diagrams, which is
+                   read from data/categories.json. Groups have no labels, so
+                   they are always stratified by category.
+    -r/--seed: Seed for the random number generator. The same seed and input
+               always produce the same sample.
+    -o/--output: Path to the output file.
+
+Returns:
+    A pandas DataFrame containing the sample.
+"""
+
+# Import packages
+from core.sample import stratified_sample
+from core.store import iter_annotation
+from pathlib import Path
+import argparse
+import json
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True,
+                help="Path to the pandas DataFrame with AI2D-RST annotation.")
+ap.add_argument("-t", "--task", required=True,
+                choices=['rst', 'connectivity', 'grouping', 'macro'],
+                help="The agreement task, which defines the items to sample.")
+ap.add_argument("-n", "--size", required=True, type=int,
+                help="Number of items sampled from each stratum.")
+ap.add_argument("-s", "--stratify", required=False, default='label',
+                choices=['label', 'category'],
+                help="Stratify by the original label or the diagram category.")
+ap.add_argument("-r", "--seed", required=False, type=int,
+                help="Seed for the random number generator.")
+ap.add_argument("-o", "--output", required=True,
+                help="Path to the output file.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+output_path = args['output']
+
+# Verify the input path, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+# Groups have no labels, stratify them by category
+stratify = 'category' if args['task'] == 'grouping' else args['stratify']
+
+# Load the categories of the diagrams if needed
+categories = None
+
+if stratify == 'category':
+
+    with open('data/categories.json') as f:
+
+        categories = json.load(f)
+
+# Draw the sample
+sample = stratified_sample(iter_annotation(ann_path), args['task'],
+                           args['size'], stratify=stratify,
+                           categories=categories, seed=args['seed'])
+
+# Save the sample
+sample.to_pickle(output_path)
+
+# Print status
+print("[DONE] Sampled {} items from {} strata into {}.".format(
+    len(sample), sample['stratum'].nunique() if len(sample) else 0,
+    output_path))
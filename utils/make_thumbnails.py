@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script resizes the AI2D diagram images to the heights used by the
+annotation and visualisation tools and stores the resized images on disk.
+The resized images are used when the same directory is given to the
+-t/--thumbnails argument of annotate.py or visualize_annotation.py.
+
+Usage:
+    python make_thumbnails.py -i path_to_ai2d_images/ -t thumbnails/
+
+Arguments:
+    -i/--images: Path to the directory containing the AI2D diagram images.
+    -t/--thumbnails: Path to the directory in which the resized images are
+                     stored.
+    -ht/--heights: Heights of the resized images (default 480 720).
+
+Returns:
+    Resized images stored in the directory given to -t/--thumbnails.
+"""
+
+# Import packages
+from core.draw import image_cache
+from pathlib import Path
+import argparse
+import glob
+import os
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-i", "--images", required=True,
+                help="Path to the directory with AI2D images.")
+ap.add_argument("-t", "--thumbnails", required=True,
+                help="Path to the directory for resized images.")
+ap.add_argument("-ht", "--heights", required=False, type=int, nargs='+',
+                default=[480, 720],
+                help="Heights of the resized images.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+images_path = args['images']
+
+# Verify the input path, print error and exit if not found
+if not Path(images_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -i!".format(images_path))
+
+# Store the resized images on disk
+image_cache.thumbnail_dir = args['thumbnails']
+
+# Get the paths to the diagram images
+image_paths = sorted(glob.glob(os.path.join(images_path, '*.png')))
+
+# Loop over the images and heights
+for i, image_path in enumerate(image_paths, start=1):
+
+    for height in args['heights']:
+
+        image_cache.load(image_path, height)
+
+    # Print status message every 100 images
+    if i % 100 == 0:
+
+        print("[INFO] Resized {}/{} images ...".format(i, len(image_paths)))
+
+# Print status
+print("[DONE] Stored resized images for {} diagrams in {}.".format(
+    len(image_paths), args['thumbnails']))
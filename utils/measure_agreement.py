@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script measures agreement between annotators using the output files of
+the evaluate_agreement_*.py scripts, which contain the labels assigned by each
+annotator to the same sample.
+
+Usage:
+    python measure_agreement.py -t rst -s annotator1.pkl annotator2.pkl
+    -o matrices/
+
+Arguments:
+    -t/--task: The agreement task, either 'rst', 'connectivity', 'grouping' or
+               'macro', which defines the valid labels.
+    -s/--samples: Paths to the output files of two or more annotators.
+    -b/--bootstrap: Number of bootstrap samples used for estimating confidence
+                    intervals (default 1000). Set to 0 to disable.
+    -c/--confidence: Level of confidence for the intervals (default 0.95).
+    -r/--seed: Seed for the random number generator used for bootstrapping.
+    -o/--output: Optional path to a directory, into which a confusion matrix is
+                 written for each pair of annotators as an image and a CSV file.
+
+Returns:
+    Prints Cohen's kappa for each pair of annotators, and Fleiss' kappa and
+    Krippendorff's alpha for all annotators, with their confidence intervals.
+"""
+
+# Import packages
+from core.agreement import *
+from pathlib import Path
+import argparse
+import itertools
+import os
+import pandas as pd
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-t", "--task", required=True,
+                choices=list(agreement_categories.keys()),
+                help="The agreement task, which defines the valid labels.")
+ap.add_argument("-s", "--samples", required=True, nargs='+',
+                help="Paths to the output files of the annotators.")
+ap.add_argument("-b", "--bootstrap", required=False, type=int, default=1000,
+                help="Number of bootstrap samples for confidence intervals.")
+ap.add_argument("-c", "--confidence", required=False, type=float,
+                default=0.95,
+                help="Level of confidence for the intervals.")
+ap.add_argument("-r", "--seed", required=False, type=int,
+                help="Seed for the random number generator.")
+ap.add_argument("-o", "--output", required=False,
+                help="Path to a directory for the confusion matrices.")
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+sample_paths = args['samples']
+categories = agreement_categories[args['task']]
+
+# Check that at least two annotators have been given
+if len(sample_paths) < 2:
+
+    exit("[ERROR] Give the output files of at least two annotators to -s!")
+
+# Verify the input paths, print error and exit if not found
+for path in sample_paths:
+
+    if not Path(path).exists():
+
+        exit("[ERROR] Cannot find {}. Check the input to -s!".format(path))
+
+# Use the names of the files to identify the annotators
+names = [os.path.splitext(os.path.basename(p))[0] for p in sample_paths]
+
+# Load the samples and encode the labels
+codes, unknown = encode_labels([pd.read_pickle(p) for p in sample_paths],
+                               categories)
+
+# Print status
+print("[INFO] Loaded {} items labelled by {} annotators.".format(len(codes),
+                                                                 len(names)))
+
+if unknown > 0:
+
+    print("[WARNING] Ignoring {} labels not valid for the task '{}'.".format(
+        unknown, args['task']))
+
+# Set up the output directory if requested
+if args['output']:
+
+    os.makedirs(args['output'], exist_ok=True)
+
+# Set up a list of metrics to calculate, starting with Cohen's kappa for each
+# pair of annotators
+metrics = []
+
+for (i, a), (j, b) in itertools.combinations(enumerate(names), 2):
+
+    metrics.append(("Cohen's kappa between {} and {}".format(a, b),
+                    cohen_kappa, codes[:, [i, j]]))
+
+    # Write the confusion matrix if requested
+    if args['output']:
+
+        matrix = confusion_matrix(codes[:, i], codes[:, j], len(categories))
+
+        path = os.path.join(args['output'], '{}-{}'.format(a, b))
+
+        pd.DataFrame(matrix, index=categories, columns=categories).to_csv(
+            path + '.csv')
+
+        plot_confusion_matrix(matrix, categories, path + '.png', names=(a, b))
+
+# Add the metrics for measuring agreement between all annotators
+metrics.append(("Fleiss' kappa", fleiss_kappa, codes))
+metrics.append(("Krippendorff's alpha", krippendorff_alpha, codes))
+
+# Calculate the metrics and print the results
+for name, metric, metric_codes in metrics:
+
+    value, lower, upper = measure_agreement(metric, metric_codes,
+                                            len(categories),
+                                            n_samples=args['bootstrap'],
+                                            confidence=args['confidence'],
+                                            seed=args['seed'])
+
+    # Add the confidence interval if available
+    if lower is None:
+
+        interval = ""
+
+    elif np.isnan(lower):
+
+        interval = " ({:.0%} CI undefined)".format(args['confidence'])
+
+    else:
+
+        interval = " ({:.0%} CI {:.3f}-{:.3f})".format(args['confidence'],
+                                                       lower, upper)
+
+    # Report the metric as undefined if it cannot be calculated, e.g. when all
+    # items received the same label
+    value = "undefined" if np.isnan(value) else "{:.3f}".format(value)
+
+    print("[INFO] {}: {}{}".format(name, value, interval))
+
+# Print status
+print("[DONE] Measured agreement for the task '{}'.".format(args['task']))
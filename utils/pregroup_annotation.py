@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""
+This script proposes groups of diagram elements in AI2D-RST annotation before
+the layout is annotated by hand. Text is grouped with the blobs it labels and
+elements with the blobs or containers that enclose them. The groups are added
+to the layout graph and marked as provisional, so that the annotator can remove
+incorrect groups using the command rm. Provisional groups are accepted once the
+layout annotation is marked as done.
+
+Diagrams whose layout annotation is complete are left unchanged. Running the
+script again replaces the provisional groups added earlier. Diagrams that have
+not been opened for annotation yet are created from the AI2D annotation, which
+allows proposing groups for a corpus before annotating it.
+
+Usage:
+    python pregroup_annotation.py -a annotation.pkl -i images/ -o output.pkl
+    -r report.csv
+
+Arguments:
+    -a/--annotation: Path to the pandas DataFrame containing the annotation. Any
+                     changes recorded in the journal are included.
+    -i/--images: Path to the directory containing the AI2D diagram images.
+    -o/--output: Path to the output file.
+    -r/--report: Optional path to a report of the groups added, which is
+                 written in the JSON format if the extension is .json and in
+                 the CSV format otherwise.
+    -j/--jobs: Number of processes used for grouping the diagrams (default:
+               number of CPUs).
+    -d/--distance: Maximum gap between text and a blob, relative to the height
+                   of the text (default: 1.0).
+
+Returns:
+    A pandas DataFrame containing the updated annotation and optionally a
+    report with a row for each group added.
+"""
+
+# Import packages
+from core import Diagram
+from core.batch import write_report
+from core.pregroup import pregroup_diagrams, report_columns
+from core.store import read_annotation
+from pathlib import Path
+import argparse
+import os
+
+# Set up the argument parser
+ap = argparse.ArgumentParser()
+
+# Define arguments
+ap.add_argument("-a", "--annotation", required=True)
+ap.add_argument("-i", "--images", required=True)
+ap.add_argument("-o", "--output", required=True)
+ap.add_argument("-r", "--report", required=False)
+ap.add_argument("-j", "--jobs", required=False, type=int, default=None)
+ap.add_argument("-d", "--distance", required=False, type=float, default=1.0)
+
+# Parse arguments
+args = vars(ap.parse_args())
+
+# Assign arguments to variables
+ann_path = args['annotation']
+images_path = args['images']
+output_path = args['output']
+
+# Verify the input paths, print error and exit if not found
+if not Path(ann_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -a!".format(ann_path))
+
+if not Path(images_path).exists():
+
+    exit("[ERROR] Cannot find {}. Check the input to -i!".format(images_path))
+
+# Make a copy of the input DataFrame
+annotation_df = read_annotation(ann_path).copy()
+
+# Initiate an empty column to hold the diagrams if no diagram has been
+# annotated yet
+if 'diagram' not in annotation_df.columns:
+
+    annotation_df['diagram'] = None
+
+# Create a Diagram object for each row without one, as the groups are added to
+# the layout graph. The diagrams are created as the grouping progresses.
+diagrams = ((ix, Diagram(row['annotation'], os.path.join(images_path,
+                                                         row['image_name']))
+             if row['diagram'] is None else row['diagram'])
+            for ix, row in annotation_df.iterrows())
+
+# Set up a placeholder for the groups added to each diagram
+grouped = {}
+
+# Group the diagrams in parallel
+for ix, diagram, groups in pregroup_diagrams(
+        diagrams, jobs=args['jobs'], label_distance=args['distance']):
+
+    # Store the updated diagram and the groups
+    annotation_df.at[ix, 'diagram'] = diagram
+    grouped[ix] = groups
+
+# Collect the groups in the order of the DataFrame, as the diagrams are grouped
+# in the order in which they finish, and add the image names
+report = [dict(image_name=annotation_df.at[ix, 'image_name'], **group)
+          for ix in annotation_df.index if ix in grouped
+          for group in grouped[ix]]
+
+# Save the updated DataFrame
+annotation_df.to_pickle(output_path)
+
+# Save the report if requested
+if args['report']:
+
+    write_report(report, args['report'], ['image_name'] + report_columns)
+
+# Print status message
+print("[DONE] Added {} provisional groups to {} diagrams.".format(
+    len(report), len({r['image_name'] for r in report})))
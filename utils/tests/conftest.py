@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import sys
+
+# Make the package core importable when the tests are run from any directory,
+# as the Diagram objects written by the scripts are unpickled in the tests
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+import subprocess
+import sys
+
+# Define the directory containing the scripts
+utils_dir = Path(__file__).resolve().parents[1]
+
+
+def make_annotation():
+    """
+    Creates AI2D annotation for a diagram with a blob labelled by text.
+    """
+    return {'blobs': {'B0': {'id': 'B0',
+                             'polygon': [[100, 100], [300, 100], [300, 250],
+                                         [100, 250]]}},
+            'text': {'T0': {'id': 'T0', 'rectangle': [[120, 260], [200, 280]],
+                            'value': 'label'}},
+            'arrows': {}, 'arrowHeads': {}, 'containers': {},
+            'imageConsts': {'I0': {'id': 'I0'}},
+            'relationships': {'T0+B0': {'id': 'T0+B0',
+                                        'category': 'intraObjectLabel',
+                                        'origin': 'T0', 'destination': 'B0'}}}
+
+
+@pytest.mark.parametrize('diagram_column', [False, True])
+def test_unannotated(tmp_path, diagram_column):
+
+    # Write the diagram images and a DataFrame without any Diagram objects
+    images = tmp_path / 'images'
+    images.mkdir()
+
+    rows = []
+
+    for name in ['1.png', '2.png']:
+
+        cv2.imwrite(str(images / name), np.full((400, 400, 3), 255, np.uint8))
+
+        rows.append({'image_name': name, 'annotation': make_annotation()})
+
+    annotation_df = pd.DataFrame(rows)
+
+    if diagram_column:
+
+        annotation_df['diagram'] = None
+
+    annotation_df.to_pickle(tmp_path / 'annotation.pkl')
+
+    # Propose the groups
+    result = subprocess.run([sys.executable, 'pregroup_annotation.py',
+                             '-a', str(tmp_path / 'annotation.pkl'),
+                             '-i', str(images),
+                             '-o', str(tmp_path / 'output.pkl'),
+                             '-r', str(tmp_path / 'report.csv'),
+                             '-j', '1'],
+                            cwd=utils_dir, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert "Added 2 provisional groups to 2 diagrams" in result.stdout
+
+    # Check that each diagram groups the text with the blob it labels
+    output_df = pd.read_pickle(tmp_path / 'output.pkl')
+
+    for diagram in output_df['diagram']:
+
+        graph = diagram.layout_graph
+        groups = [n for n, p in graph.nodes(data='provisional') if p]
+
+        assert len(groups) == 1
+        assert set(graph.neighbors(groups[0])) == {'B0', 'T0'}
+
+    # Check that the report follows the order of the DataFrame
+    report_df = pd.read_csv(tmp_path / 'report.csv')
+
+    assert report_df['image_name'].tolist() == ['1.png', '2.png']
+    assert report_df['rule'].tolist() == ['label', 'label']
@@ -7,20 +7,40 @@ Usage:
     python visualize_annotation.py -a annotation.pkl -i images/
 
 Arguments:
-    -a/--annotation: Path to the pandas DataFrame containing annotation.
+    -a/--annotation: Path to the pandas DataFrame containing annotation, or a
+                     record file created using convert_annotation.py, from
+                     which the diagrams are loaded one at a time.
     -i/--images: Path to the directory containing the original AI2D images.
     -s/--similar_to: An AI2D diagram ID (integer).
     -o/--only: An AI2D diagram ID (integer).
+    -l/--layout_engine: Layout engine for drawing graphs, either 'neato'
+                        (default) or 'stress', which does not call Graphviz.
+    -e/--export: Export DOT graphs and images for each diagram without showing
+                 the visualisations.
+    -j/--jobs: Number of processes used for exporting (default: number of CPUs).
+    -d/--output_dir: Directory for the exported files (default: current
+                     directory).
+    -t/--thumbnails: Path to a directory of resized images created using
+                     make_thumbnails.py.
+    -c/--cache: Path to a directory for storing images of the graphs, which are
+                reused when the same diagrams are shown again.
+    -g/--geometry: Path to a directory of element geometry created using
+                   ingest_geometry.py, which is used for drawing the layout
+                   segmentation.
 
 Returns:
     Visualises the annotation for all layers and prints rhetorical relations,
-    macro-groups and comments to standard output.
+    macro-groups and comments to standard output. If -e/--export is given,
+    writes DOT graphs and images for each diagram on disk instead.
 """
 
 # Import packages
 from core.draw import *
+from core.export import export_diagrams
+from core.geometry import GeometryStore
 from core.parse import *
 from core.interface import *
+from core.store import AnnotationIndex
 from pathlib import Path
 import argparse
 import cv2
@@ -29,7 +49,6 @@ import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
 import os
-import pandas as pd
 
 
 # Set up the argument parser
@@ -49,10 +68,35 @@ ap.add_argument("-o", "--only", required=False, type=int,
                      "Shows this diagram only.")
 ap.add_argument("-e", "--export", required=False, action='store_true',
                 help="Export DOT graphs and screenshots for each graph.")
+ap.add_argument("-j", "--jobs", required=False, type=int, default=None,
+                help="Number of processes used for exporting.")
+ap.add_argument("-d", "--output_dir", required=False, default='.',
+                help="Directory for the exported files.")
+ap.add_argument("-t", "--thumbnails", required=False,
+                help="Path to a directory of resized images created using "
+                     "make_thumbnails.py.")
+ap.add_argument("-c", "--cache", required=False,
+                help="Path to a directory for storing images of the graphs.")
+ap.add_argument("-g", "--geometry", required=False,
+                help="Path to a directory of element geometry created using "
+                     "ingest_geometry.py.")
+ap.add_argument("-l", "--layout_engine", required=False, default='neato',
+                choices=layout_engines,
+                help="Layout engine used for drawing the graphs.")
 
 # Parse arguments
 args = vars(ap.parse_args())
 
+# Use the resized images stored on disk if requested
+if args['thumbnails']:
+
+    image_cache.thumbnail_dir = args['thumbnails']
+
+# Store the images of graphs on disk if requested
+if args['cache']:
+
+    render_cache.cache_dir = args['cache']
+
 # Assign arguments to variables
 ann_path = args['annotation']
 images_path = args['images']
@@ -66,8 +110,24 @@ if not Path(images_path).exists():
 
     exit("[ERROR] Cannot find {}. Check the input to -i!".format(images_path))
 
-# Open the input file
-df = pd.read_pickle(ann_path)
+# Open the geometry of the diagram elements if requested
+geometry = None
+
+if args['geometry']:
+
+    if not Path(args['geometry']).exists():
+
+        exit("[ERROR] Cannot find {}. Check the input to -g!".format(
+            args['geometry']))
+
+    geometry = GeometryStore(args['geometry'])
+
+# Index the input file by image name. Record files are loaded lazily, keeping
+# only the diagram being visualised in memory.
+annotation_index = AnnotationIndex(ann_path, maxsize=1)
+
+# Get the names of the diagrams to visualise
+image_names = list(annotation_index)
 
 # Check if the user has requested limiting the results
 if args['similar_to']:
@@ -94,14 +154,12 @@ if args['similar_to']:
                 exit("[ERROR] {} is not a valid identifier.".format(
                     requested_id))
 
-            # Fetch the categories for diagrams in the DataFrame
-            df['category'] = df['image_name'].apply(lambda x: categories[x])
-
-            # Filter the DataFrame for requested diagram types
-            df = df.loc[df['category'] == requested_cat]
+            # Filter the diagrams for requested diagram types
+            image_names = [x for x in image_names
+                           if categories[x] == requested_cat]
 
             # If there are no results to display, exit with an error message
-            if len(df) == 0:
+            if len(image_names) == 0:
 
                 exit("[ERROR] No examples of category '{}' found.".format(
                     requested_cat))
@@ -112,33 +170,58 @@ if args['only']:
     # Assign the requested diagram ID to a variable
     requested_diagram = str(args['only']) + '.png'
 
-    # Check if the requested diagram is in the DataFrame
-    requested_df = df.loc[df['image_name'] == requested_diagram]
-
-    # If the search came up empty, exit
-    if requested_df.empty:
+    # Check if the requested diagram is among the diagrams, otherwise exit
+    if requested_diagram not in image_names:
 
         exit("[ERROR] Sorry, diagram {} was not found in this DataFrame."
              .format(requested_diagram))
 
-    # Otherwise limit the DataFrame to the requested diagram
+    # Otherwise limit the diagrams to the requested diagram
     else:
 
-        df = requested_df
+        image_names = [requested_diagram]
+
+# If export has been requested, export all diagrams in parallel and exit
+if args['export']:
+
+    # Skip diagrams without a Diagram object
+    image_names = [x for x in image_names
+                   if annotation_index.status(x) is not None]
 
-# Begin looping over the rows of the input DataFrame. Enumerate the result to
-# show annotation progress to the user.
-for i, (ix, row) in enumerate(df.iterrows(), start=1):
+    # Print status message
+    print("[INFO] Exporting {} diagrams into {} ...".format(
+        len(image_names), args['output_dir']))
+
+    # Load the Diagram objects on demand
+    diagrams = (annotation_index[x]['diagram'] for x in image_names)
+
+    # Export the diagrams
+    exported, errors = export_diagrams(diagrams, args['output_dir'],
+                                       jobs=args['jobs'],
+                                       total=len(image_names),
+                                       layout_engine=args['layout_engine'])
+
+    # Print any errors
+    for image_fname, error in errors:
+
+        print("[ERROR] Could not export {}: {}".format(image_fname, error))
+
+    exit("[DONE] Exported {} diagrams into {}.".format(exported,
+                                                       args['output_dir']))
+
+# Begin looping over the diagrams. Enumerate the result to show annotation
+# progress to the user.
+for i, image_fname in enumerate(image_names, start=1):
 
-    # Fetch the filename of current diagram image
-    image_fname = row['image_name']
+    # Load the row for the current diagram
+    row = annotation_index[image_fname]
 
     # Join with path to image directory with current filename
     image_path = os.path.join(images_path, row['image_name'])
 
     # Print status message
     print("[INFO] Now processing row {}/{} ({}) ...".format(i,
-                                                            len(df),
+                                                            len(image_names),
                                                             image_fname))
 
     # Assign diagram to variable
@@ -151,17 +234,22 @@ for i, (ix, row) in enumerate(df.iterrows(), start=1):
         segmentation = draw_layout(diagram.image_filename,
                                    diagram.annotation,
                                    height=720,
-                                   dpi=80)
+                                   dpi=80, backend='opencv',
+                                   geometry=geometry.get(image_fname)
+                                   if geometry is not None else None)
 
         # Visualize grouping annotation
-        grouping = draw_graph(diagram.layout_graph, dpi=80, mode='layout')
+        grouping = draw_graph(diagram.layout_graph, dpi=80, mode='layout',
+                              layout_engine=args['layout_engine'])
 
         # Visualize connectivity annotation
         connectivity = draw_graph(diagram.connectivity_graph, dpi=80,
-                                  mode='connectivity')
+                                  mode='connectivity',
+                                  layout_engine=args['layout_engine'])
 
         # Visualize RST annotation
-        rst = draw_graph(diagram.rst_graph, dpi=80, mode='rst')
+        rst = draw_graph(diagram.rst_graph, dpi=80, mode='rst',
+                         layout_engine=args['layout_engine'])
 
         # Stack segmentation and grouping annotation side by side
         seg_group = np.hstack([segmentation, grouping])
@@ -224,33 +312,6 @@ for i, (ix, row) in enumerate(df.iterrows(), start=1):
             # Print final linebreak
             print("---\n")
 
-        # If export has been requested, export all graphs:
-        if args['export']:
-
-            # Export DOT graph for grouping graph
-            process_command('export', 'layout', diagram,
-                            diagram.layout_graph.copy())
-
-            # Export DOT graph for connectivity graph
-            process_command('export', 'connectivity', diagram,
-                            diagram.connectivity_graph.copy())
-
-            # Export DOT graph for RST graph
-            process_command('export', 'rst', diagram,
-                            diagram.rst_graph.copy())
-
-            # Export screenshot for grouping graph
-            process_command('cap', 'layout', diagram, diagram.
-                            layout_graph)
-
-            # Export screenshot for connectivity graph
-            process_command('cap', 'connectivity', diagram,
-                            diagram.connectivity_graph)
-
-            # Export screenshot for RST graph
-            process_command('cap', 'rst', diagram,
-                            diagram.rst_graph)
-
         # Print instructions
         print("Print any key to continue or 'q' to exit.\n")
 